@@ -0,0 +1,304 @@
+# app/anomaly.py
+"""
+Online anomaly detection on batch start parameters and QC results: EWMA and
+CUSUM control charts against running baselines, writing Anomaly rows.
+
+Baselines live in each worker process's memory. They are rebuilt from the
+whole history at startup, but afterwards a worker only learns from the
+batches it handles itself, so under several workers each judges new values
+against a slightly different baseline and the EWMA/CUSUM statistics build
+up separately per worker. A restart brings them back in line. Run the
+production and QC endpoints on a single worker where charts must be exact.
+"""
+import math
+import os
+import threading
+import time
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.intelligence import Anomaly, SeverityLevel
+from app.models.production import ProductionBatch, BatchParameters
+from app.models.qc import QCRecord
+
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "on").lower() in ("1", "on", "true", "yes")
+# Baseline memory: each new value gets this weight in the running mean/variance
+ANOMALY_BASELINE_ALPHA = float(os.getenv("ANOMALY_BASELINE_ALPHA", "0.05"))
+# No alarms from a baseline until it has seen this many values
+ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "10"))
+# Single-value limits, in standard deviations from the baseline
+ANOMALY_Z_MEDIUM = float(os.getenv("ANOMALY_Z_MEDIUM", "3"))
+ANOMALY_Z_HIGH = float(os.getenv("ANOMALY_Z_HIGH", "4"))
+# EWMA chart smoothing and limit width; CUSUM slack and decision interval (in sigmas)
+EWMA_LAMBDA, EWMA_L = 0.2, 3.0
+CUSUM_K, CUSUM_H = 0.5, 5.0
+REBUILD_CHUNK_SIZE = 5000
+
+# Metrics watched at each hook, and the groupings each metric gets a baseline for
+START_METRICS = ("quantity_used", "drying_time", "milling_speed", "acid_ph")
+QC_METRICS = ("moisture", "purity")
+SCOPES = ("material", "shift")
+
+SEVERITY_RANK = {SeverityLevel.LOW: 0, SeverityLevel.MEDIUM: 1, SeverityLevel.HIGH: 2}
+EWMA_LIMIT = EWMA_L * math.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))
+
+
+class Baseline:
+    """
+    Exponentially weighted mean/variance of one metric within one group,
+    plus the EWMA and two-sided CUSUM statistics charted against it.
+    Weighted first and second moments (m1, m2 over total weight w) are linear
+    in the inputs, so history can be folded in with array sums.
+    """
+    __slots__ = ("n", "w", "m1", "m2", "ewma", "cusum_hi", "cusum_lo")
+
+    def __init__(self):
+        self.n, self.w, self.m1, self.m2 = 0, 0.0, 0.0, 0.0
+        self.ewma, self.cusum_hi, self.cusum_lo = 0.0, 0.0, 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.m1 / self.w if self.w else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.w:
+            return 0.0
+        mean = self.m1 / self.w
+        return math.sqrt(max(self.m2 / self.w - mean * mean, 0.0))
+
+    def check(self, x: float):
+        """Findings for x against this baseline, and the chart state to keep if it commits."""
+        std = self.std
+        if self.n < ANOMALY_MIN_SAMPLES or std <= 1e-9:
+            return [], None, True
+        z = (x - self.mean) / std
+        ewma = EWMA_LAMBDA * z + (1 - EWMA_LAMBDA) * self.ewma
+        hi = max(0.0, self.cusum_hi + z - CUSUM_K)
+        lo = max(0.0, self.cusum_lo - z - CUSUM_K)
+
+        findings = []
+        if abs(z) >= ANOMALY_Z_HIGH:
+            findings.append((SeverityLevel.HIGH, f"{abs(z):.1f} SD {'above' if z > 0 else 'below'}"))
+        elif abs(z) >= ANOMALY_Z_MEDIUM:
+            findings.append((SeverityLevel.MEDIUM, f"{abs(z):.1f} SD {'above' if z > 0 else 'below'}"))
+        if abs(ewma) > EWMA_LIMIT:
+            findings.append((SeverityLevel.MEDIUM, f"EWMA shift {'up' if ewma > 0 else 'down'}"))
+            ewma = 0.0
+        if hi > CUSUM_H or lo > CUSUM_H:
+            findings.append((SeverityLevel.LOW, f"CUSUM drift {'up' if hi > CUSUM_H else 'down'}"))
+            hi = lo = 0.0
+        # Outliers are reported but kept out of the baseline they were judged against
+        return findings, (ewma, hi, lo), abs(z) < ANOMALY_Z_MEDIUM
+
+    def update(self, x: float, chart, absorb: bool):
+        if chart is not None:
+            self.ewma, self.cusum_hi, self.cusum_lo = chart
+        if absorb:
+            decay = 1 - ANOMALY_BASELINE_ALPHA
+            self.n += 1
+            self.w = decay * self.w + ANOMALY_BASELINE_ALPHA
+            self.m1 = decay * self.m1 + ANOMALY_BASELINE_ALPHA * x
+            self.m2 = decay * self.m2 + ANOMALY_BASELINE_ALPHA * x * x
+
+
+# Session.info key holding baseline updates that wait for the commit
+PENDING_UPDATES = "pending_anomaly_updates"
+
+
+class AnomalyDetector:
+    """
+    Control charts per (metric, scope, group), e.g. (acid_ph, material,
+    "Cotton Linter") and (acid_ph, shift, "B"). observe() judges new values
+    in O(1) per baseline, adds Anomaly rows to the caller's session, and
+    moves the baselines only once that session commits.
+    """
+
+    def __init__(self):
+        self.baselines = {}   # (metric, scope, group) -> Baseline
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.flagged = 0
+        self.rebuilt_rows = 0
+        self.rebuild_seconds = 0.0
+
+    def _baseline(self, key) -> Baseline:
+        baseline = self.baselines.get(key)
+        if baseline is None:
+            baseline = self.baselines[key] = Baseline()
+        return baseline
+
+    def observe(self, db: Session, batch_id: int, material: str, shift: str, values: dict) -> list:
+        """Checks a batch's values; returns the Anomaly rows added to db (not yet committed)."""
+        if not ANOMALY_DETECTION:
+            return []
+        groups = {"material": material, "shift": shift}
+        anomalies, updates = [], []
+        with self._lock:
+            for metric, x in values.items():
+                if x is None:
+                    continue
+                x = float(x)
+                worst, reasons = None, []
+                for scope in SCOPES:
+                    if groups[scope] is None:
+                        continue
+                    key = (metric, scope, groups[scope])
+                    baseline = self._baseline(key)
+                    findings, chart, absorb = baseline.check(x)
+                    updates.append((key, x, chart, absorb))
+                    if not findings:
+                        continue
+                    for severity, _ in findings:
+                        if worst is None or SEVERITY_RANK[severity] > SEVERITY_RANK[worst]:
+                            worst = severity
+                    reasons.append(f"vs {scope} {groups[scope]} ({baseline.mean:.3g} +/- {baseline.std:.2g}): "
+                                   + ", ".join(reason for _, reason in findings))
+                if worst is not None:
+                    anomaly = Anomaly(
+                        batch_id=batch_id, severity=worst,
+                        description=f"{metric} = {x:g} {'; '.join(reasons)}"[:255],
+                    )
+                    db.add(anomaly)
+                    anomalies.append(anomaly)
+            self.observed += 1
+            self.flagged += len(anomalies)
+        if not db.in_transaction():
+            db.begin()   # so a rollback before any SQL still reaches _discard_rolled_back
+        db.info.setdefault(PENDING_UPDATES, []).extend(updates)
+        return anomalies
+
+    def apply(self, updates: list):
+        with self._lock:
+            for key, x, chart, absorb in updates:
+                self._baseline(key).update(x, chart, absorb)
+
+    # --- rebuild from history ---
+    def _absorb(self, metric: str, scope: str, groups, values):
+        """Folds one chunk of history into the baselines of one (metric, scope) with array sums."""
+        keep = np.array([g is not None for g in groups]) & ~np.isnan(values)
+        if not keep.any():
+            return
+        groups = np.asarray(groups, dtype=object)[keep].astype(str)
+        values = values[keep]
+        names, group_idx = np.unique(groups, return_inverse=True)
+        baselines = [self._baseline((metric, scope, str(name))) for name in names]
+        start = tuple(np.array([getattr(b, a) for b in baselines], dtype=float) for a in ("n", "w", "m1", "m2"))
+
+        # Fold the whole chunk in once, then again without the values that are
+        # outliers against that result (online, outliers never enter a baseline)
+        n, w, m1, m2 = _fold(start, group_idx, values, len(names))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = m1 / w
+            std = np.sqrt(np.maximum(m2 / w - mean ** 2, 0))
+            z = np.abs(values - mean[group_idx]) / std[group_idx]
+        warm = (n >= ANOMALY_MIN_SAMPLES) & (std > 1e-9)
+        inlier = ~(warm[group_idx] & (z >= ANOMALY_Z_MEDIUM))
+        if not inlier.all():
+            n, w, m1, m2 = _fold(start, group_idx[inlier], values[inlier], len(names))
+        for i, baseline in enumerate(baselines):
+            baseline.n = int(n[i])
+            baseline.w, baseline.m1, baseline.m2 = float(w[i]), float(m1[i]), float(m2[i])
+
+    def _replay(self, db: Session, query, id_column, metrics):
+        """Reads history in id order, chunk by chunk, folding each chunk in vectorized."""
+        last_id = 0
+        while True:
+            rows = db.execute(query.where(id_column > last_id).order_by(id_column).limit(REBUILD_CHUNK_SIZE)).all()
+            if not rows:
+                return
+            columns = list(zip(*rows))
+            groups = {"material": columns[1], "shift": columns[2]}
+            for i, metric in enumerate(metrics):
+                values = np.array([np.nan if v is None else v for v in columns[3 + i]], dtype=float)
+                for scope in SCOPES:
+                    self._absorb(metric, scope, groups[scope], values)
+            self.rebuilt_rows += len(rows)
+            last_id = rows[-1][0]
+
+    def rebuild(self):
+        """Recomputes every baseline from production and QC history (charts restart at zero)."""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            with self._lock:
+                self.baselines = {}
+                self.rebuilt_rows = 0
+                self._replay(db, select(
+                    ProductionBatch.id, ProductionBatch.material_used, ProductionBatch.shift,
+                    ProductionBatch.quantity_used, BatchParameters.drying_time,
+                    BatchParameters.milling_speed, BatchParameters.acid_ph,
+                ).outerjoin(BatchParameters, BatchParameters.batch_id == ProductionBatch.id),
+                    ProductionBatch.id, START_METRICS)
+                self._replay(db, select(
+                    QCRecord.id, ProductionBatch.material_used, ProductionBatch.shift,
+                    QCRecord.moisture, QCRecord.purity,
+                ).join(ProductionBatch, ProductionBatch.batch_number == QCRecord.batch_id),
+                    QCRecord.id, QC_METRICS)
+        finally:
+            db.close()
+        self.rebuild_seconds = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            warm = sum(1 for b in self.baselines.values() if b.n >= ANOMALY_MIN_SAMPLES)
+            return {
+                "enabled": ANOMALY_DETECTION,
+                "baselines": len(self.baselines),
+                "warm_baselines": warm,
+                "observed": self.observed,
+                "flagged": self.flagged,
+                "rebuilt_rows": self.rebuilt_rows,
+                "rebuild_ms": round(self.rebuild_seconds * 1000, 1),
+            }
+
+
+def _fold(start: tuple, group_idx, values, n_groups: int) -> tuple:
+    """
+    (n, w, m1, m2) per group after applying values in order to the start
+    state: the online update unrolled, each value weighted by the decay of
+    the values after it in its group.
+    """
+    n0, w0, m1_0, m2_0 = start
+    counts = np.bincount(group_idx, minlength=n_groups)
+    seen_after = counts[group_idx] - 1 - _position_in_group(group_idx)
+    decay = 1 - ANOMALY_BASELINE_ALPHA
+    weights = ANOMALY_BASELINE_ALPHA * decay ** seen_after
+    carry = decay ** counts
+    return (
+        n0 + counts,
+        carry * w0 + np.bincount(group_idx, weights, minlength=n_groups),
+        carry * m1_0 + np.bincount(group_idx, weights * values, minlength=n_groups),
+        carry * m2_0 + np.bincount(group_idx, weights * values * values, minlength=n_groups),
+    )
+
+
+def _position_in_group(group_idx):
+    """0-based position of each element among earlier elements of the same group."""
+    order = np.argsort(group_idx, kind="stable")
+    sorted_groups = group_idx[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    run_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order)) - run_start
+    return position
+
+
+anomaly_detector = AnomalyDetector()
+
+
+# Baselines only learn from values whose transaction actually committed
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    updates = session.info.pop(PENDING_UPDATES, None)
+    if updates:
+        anomaly_detector.apply(updates)
+
+
+# after_soft_rollback: also fires when the transaction never emitted SQL (observe()
+# itself writes nothing unless it flags a value), where after_rollback would not
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    if previous_transaction.parent is None:   # not a SAVEPOINT inside the transaction
+        session.info.pop(PENDING_UPDATES, None)
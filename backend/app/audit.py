@@ -0,0 +1,191 @@
+# app/audit.py
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app.cache import response_cache
+from app.database import SessionLocal
+from app.events import activity_broker, activity_event
+from app.models.activity import ActivityLog
+
+# "transaction" (default): the log row is written in the caller's session and
+# commits or rolls back with the business change. "buffered": rows are queued
+# in memory and written by a background thread as multi-row INSERTs.
+AUDIT_MODE = os.getenv("AUDIT_LOG_MODE", "transaction").lower()
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_FLUSH_ROWS = int(os.getenv("AUDIT_FLUSH_ROWS", "200"))
+AUDIT_FLUSH_INTERVAL_MS = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+# A queued event older than this when it reaches the DB counts as delayed
+AUDIT_MAX_DELAY_MS = float(os.getenv("AUDIT_MAX_DELAY_MS", "2000"))
+AUDIT_DRAIN_SECONDS = float(os.getenv("AUDIT_DRAIN_SECONDS", "10"))
+
+# Session.info key holding stream events for rows not yet committed
+PENDING_EVENTS = "pending_activity_events"
+
+
+def _publish(events: list):
+    if not events:
+        return
+    response_cache.invalidate("activity")
+    # Push to every open dashboard stream instead of waiting for them to poll
+    for e in events:
+        activity_broker.publish(e)
+
+
+# Stream subscribers only ever see rows that actually committed
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    _publish(session.info.pop(PENDING_EVENTS, None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(PENDING_EVENTS, None)
+
+
+def record_in_transaction(db: Session, message: str, user: str, log_type: str):
+    """Adds the log row to the caller's session; the caller commits."""
+    log = ActivityLog(message=message, user=user, type=log_type, created_at=datetime.now())
+    db.add(log)
+    db.flush()   # assigns the id the stream uses for Last-Event-ID
+    db.info.setdefault(PENDING_EVENTS, []).append(activity_event(log))
+
+
+class BufferedAuditWriter:
+    """
+    Queues audit rows in memory and writes them from one background thread,
+    as a multi-row INSERT whenever AUDIT_FLUSH_ROWS are waiting or
+    AUDIT_FLUSH_INTERVAL_MS has passed. Trades durability for throughput:
+    rows queued when the process dies are lost, and a full queue drops.
+    """
+
+    def __init__(self, max_queue: int = AUDIT_QUEUE_SIZE, flush_rows: int = AUDIT_FLUSH_ROWS,
+                 interval_ms: float = AUDIT_FLUSH_INTERVAL_MS):
+        self.flush_rows = flush_rows
+        self.interval = interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.delayed = 0
+        self.failed_flushes = 0
+        self.flushes = 0
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, message: str, user: str, log_type: str):
+        self.start()
+        row = {"message": message, "user": user, "type": log_type, "created_at": datetime.now()}
+        try:
+            self._queue.put_nowait((time.monotonic(), row))
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _take_batch(self, timeout: float) -> list:
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch(timeout=self.interval)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list):
+        now = time.monotonic()
+        for queued_at, _ in batch:
+            lag_ms = (now - queued_at) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms > AUDIT_MAX_DELAY_MS:
+                self.delayed += 1
+
+        rows = [row for _, row in batch]
+        db = SessionLocal()
+        try:
+            events = self._insert(db, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            self.dropped += len(rows)
+            print(f"⚠️ Audit flush failed, {len(rows)} events dropped: {e}")
+            return
+        finally:
+            db.close()
+        self.flushes += 1
+        self.written += len(rows)
+        _publish(events)
+
+    def _insert(self, db: Session, rows: list) -> list:
+        dialect = db.get_bind().dialect
+        if dialect.insert_executemany_returning:
+            # Batched into multi-row INSERT ... RETURNING by SQLAlchemy
+            result = db.execute(
+                insert(ActivityLog).returning(ActivityLog.id, sort_by_parameter_order=True), rows
+            )
+            ids = [r[0] for r in result]
+        else:
+            # One INSERT ... VALUES (...), (...); MySQL reports the first id and
+            # InnoDB hands a single multi-row insert consecutive ids
+            result = db.execute(insert(ActivityLog).values(rows))
+            first_id = result.lastrowid
+            ids = range(first_id, first_id + len(rows))
+        return [activity_event(ActivityLog(id=log_id, **r)) for log_id, r in zip(ids, rows)]
+
+    def shutdown(self, timeout: float = AUDIT_DRAIN_SECONDS):
+        """Writes whatever is still queued, waiting up to timeout seconds."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        left = self._queue.qsize()
+        if left:
+            print(f"⚠️ Audit writer stopped with {left} events still queued")
+
+    def stats(self) -> dict:
+        return {
+            "mode": AUDIT_MODE,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "delayed": self.delayed,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "avg_rows_per_flush": round(self.written / self.flushes, 1) if self.flushes else 0,
+        }
+
+
+audit_writer = BufferedAuditWriter()
+
+
+def record(db: Session, message: str, user: str, log_type: str = "info"):
+    if AUDIT_MODE == "buffered":
+        audit_writer.enqueue(message, user, log_type)
+    else:
+        record_in_transaction(db, message, user, log_type)
@@ -0,0 +1,184 @@
+# app/cache.py
+import asyncio
+import os
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import REPLICA_DATABASE_URL
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# Reads from a replica may not see a write for this long after its commit; results
+# read that soon after an invalidation are served but not cached
+CACHE_REPLICA_LAG_SECONDS = float(os.getenv("CACHE_REPLICA_LAG_SECONDS", "5" if REPLICA_DATABASE_URL else "0"))
+
+
+class TTLCache:
+    """
+    In-process LRU cache with per-entry expiry and tag based invalidation.
+    Each worker process has its own copy, so writes only invalidate locally;
+    the TTL bounds how stale other workers can get.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS,
+                 settle: float = CACHE_REPLICA_LAG_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.settle = settle
+        self._data = OrderedDict()   # key -> (expires_at, tags, value)
+        self._tags = {}              # tag -> set of keys
+        self._invalidated_at = {}    # tag -> monotonic time of its last invalidation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.unsettled_skips = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, tags=(), ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires_at, tuple(tags), value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def settled(self, tags, read_started: float) -> bool:
+        """
+        True when none of the tags was invalidated after read_started, nor
+        within the replica lag window before it. A read that fails this may
+        have missed the write behind the invalidation and must not be cached.
+        """
+        horizon = read_started - self.settle
+        with self._lock:
+            if any(self._invalidated_at.get(tag, horizon - 1) >= horizon for tag in tags):
+                self.unsettled_skips += 1
+                return False
+            return True
+
+    def invalidate(self, *tags):
+        """Drops every entry carrying any of the given tags."""
+        with self._lock:
+            now = time.monotonic()
+            for tag in tags:
+                self._invalidated_at[tag] = now
+                for key in self._tags.pop(tag, set()):
+                    if key in self._data:
+                        self._drop(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._invalidated_at.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "unsettled_skips": self.unsettled_skips,
+            }
+
+    def _drop(self, key):
+        # Caller holds the lock
+        _, tags, _ = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# Shared cache for read endpoints; write paths call response_cache.invalidate(...)
+response_cache = TTLCache()
+_MISSING = object()
+
+
+class uncached:
+    """Return uncached(value) from a @cached endpoint to serve value without storing it (fallbacks, errors)."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _store(key, value, tags, ttl, read_started):
+    if isinstance(value, uncached):
+        return value.value
+    if response_cache.settled(tags, read_started):
+        response_cache.set(key, value, tags=tags, ttl=ttl)
+    return value
+
+
+def cached(*tags, ttl: float = None):
+    """
+    Caches an endpoint's return value, keyed by endpoint and its
+    query/path parameters. DB sessions are left out of the key.
+    Works on both sync and async endpoints. A result whose tags were
+    invalidated while it was being read, or just before (see
+    CACHE_REPLICA_LAG_SECONDS), is returned but not cached.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+
+        def make_key(kwargs):
+            params = tuple(sorted(
+                (k, v) for k, v in kwargs.items() if not isinstance(v, (Session, AsyncSession))
+            ))
+            return (name, params)
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(kwargs)
+                value = response_cache.get(key, _MISSING)
+                if value is _MISSING:
+                    started = time.monotonic()
+                    value = _store(key, await func(*args, **kwargs), tags, ttl, started)
+                return value
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(kwargs)
+            value = response_cache.get(key, _MISSING)
+            if value is _MISSING:
+                started = time.monotonic()
+                value = _store(key, func(*args, **kwargs), tags, ttl, started)
+            return value
+        return wrapper
+    return decorator
+
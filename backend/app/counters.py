@@ -0,0 +1,319 @@
+# app/counters.py
+"""
+Maintained counter and rollup tables. They are resynced from the source
+tables at startup, or from the shell as a one-off deploy step:
+
+    cd backend && python -m app.counters
+"""
+import os
+from datetime import datetime
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from app import migrations
+from app.database import SessionLocal, upsert
+from app.models.dashboard import DashboardMetrics
+from app.models.production import ProductionBatch, ProductionRollup
+from app.models.qc import QCRecord
+from app.models.inventory import Inventory, InventoryRollup
+
+# When enabled, status counts live in the dashboard_metrics table and are bumped
+# inside the same transaction as every status change, so /dashboard/summary
+# reads a handful of rows instead of counting whole tables.
+COUNTERS_ENABLED = os.getenv("DASHBOARD_COUNTERS", "0").lower() in ("1", "true", "yes")
+# Same idea for warehouse totals: inventory_rollup holds kg/batch counts per
+# (location, status, product) so /inventory/summary never scans Inventory
+ROLLUP_ENABLED = os.getenv("INVENTORY_ROLLUP", "0").lower() in ("1", "true", "yes")
+# Resync the enabled tables on every boot; turn off where deploys run `python -m
+# app.counters` once instead, so no booting worker rewrites counters that the
+# serving workers are bumping
+REBUILD_ON_STARTUP = os.getenv("COUNTERS_REBUILD_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+# production_rollup is always maintained; these are its bucket sizes and the
+# dimensions analytics can group by
+PRODUCTION_GRANULARITIES = ("hour", "day", "month")
+PRODUCTION_DIMENSIONS = ("material", "shift", "phase")
+PRODUCTION_BACKFILL_CHUNK = int(os.getenv("PRODUCTION_BACKFILL_CHUNK", "10000"))
+
+# Inventory "active"/"waiting" buckets used by the dashboard tiles
+INVENTORY_HIGH_KG = 100
+INVENTORY_LOW_KG = 50
+
+# Which counter feeds which tile on the dashboard: (tile, slot) -> counter key
+SUMMARY_KEYS = {
+    ("production", "active"): "production:ACTIVE",
+    ("production", "waiting"): "production:SCHEDULED",
+    ("qc", "active"): "qc:IN_PROGRESS",
+    ("qc", "waiting"): "qc:PENDING",
+    ("inventory", "active"): "inventory:over_100",
+    ("inventory", "waiting"): "inventory:under_50",
+    ("dispatch", "active"): "production:SHIPPED",
+    ("dispatch", "waiting"): "production:COMPLETED",
+}
+
+
+def _inventory_bucket(quantity_kg):
+    if quantity_kg is None:
+        return None
+    if quantity_kg > INVENTORY_HIGH_KG:
+        return "inventory:over_100"
+    if quantity_kg < INVENTORY_LOW_KG:
+        return "inventory:under_50"
+    return None
+
+
+def bump(db: Session, key: str, delta: int = 1):
+    """Atomically adds delta to a counter row, creating it on first use."""
+    # One upsert: two first bumps of a key add up instead of colliding on the unique key
+    db.execute(upsert(
+        db.get_bind(), DashboardMetrics, ["key"],
+        lambda current, incoming: {"value": current["value"] + incoming["value"]}
+    ), {"key": key, "value": delta})
+
+
+def batch_status_changed(db: Session, old_status, new_status):
+    """Call alongside any ProductionBatch insert (old_status=None) or status change."""
+    if not COUNTERS_ENABLED or old_status == new_status:
+        return
+    if old_status:
+        bump(db, f"production:{old_status}", -1)
+    if new_status:
+        bump(db, f"production:{new_status}", 1)
+
+
+def qc_status_changed(db: Session, old_status, new_status):
+    """Call alongside any QCRecord insert (old_status=None) or status change."""
+    if not COUNTERS_ENABLED or old_status == new_status:
+        return
+    if old_status:
+        bump(db, f"qc:{old_status}", -1)
+    if new_status:
+        bump(db, f"qc:{new_status}", 1)
+
+
+def inventory_added(db: Session, item: Inventory):
+    """Call alongside any Inventory insert."""
+    if COUNTERS_ENABLED:
+        key = _inventory_bucket(item.quantity_kg)
+        if key:
+            bump(db, key, 1)
+    if ROLLUP_ENABLED:
+        _bump_rollup(db, item.storage_location, item.status, item.product_name, item.quantity_kg, 1)
+
+
+def inventory_status_changed(db: Session, item: Inventory, old_status, new_status):
+    """Call alongside any Inventory status change (move, dispatch)."""
+    if not ROLLUP_ENABLED or old_status == new_status:
+        return
+    _bump_rollup(db, item.storage_location, old_status, item.product_name, -item.quantity_kg, -1)
+    _bump_rollup(db, item.storage_location, new_status, item.product_name, item.quantity_kg, 1)
+
+
+def _bump_rollup(db: Session, location, status, product, kg_delta: float, count_delta: int):
+    # One upsert, like bump(): a group's first two items add up instead of colliding on the unique key
+    db.execute(upsert(
+        db.get_bind(), InventoryRollup, ["storage_location", "status", "product_name"],
+        lambda current, incoming: {
+            "total_kg": current["total_kg"] + incoming["total_kg"],
+            "batch_count": current["batch_count"] + incoming["batch_count"],
+        }
+    ), {
+        "storage_location": location or "", "status": status, "product_name": product or "",
+        "total_kg": kg_delta, "batch_count": count_delta,
+    })
+
+
+def inventory_groups(db: Session) -> list:
+    """(location, status, product, total_kg, batch_count) per group, from the
+    rollup table when enabled or from one GROUP BY over Inventory otherwise."""
+    if ROLLUP_ENABLED:
+        return db.query(
+            InventoryRollup.storage_location, InventoryRollup.status, InventoryRollup.product_name,
+            InventoryRollup.total_kg, InventoryRollup.batch_count
+        ).filter(InventoryRollup.batch_count != 0).all()
+    return db.query(
+        Inventory.storage_location, Inventory.status, Inventory.product_name,
+        func.sum(Inventory.quantity_kg), func.count(Inventory.id)
+    ).group_by(Inventory.storage_location, Inventory.status, Inventory.product_name).all()
+
+
+def rebuild_inventory_rollup(db: Session):
+    """Recomputes inventory_rollup from the Inventory table."""
+    db.query(InventoryRollup).delete(synchronize_session=False)
+    # NULL and "" are one group in the rollup, so they must be merged before grouping
+    location = func.coalesce(Inventory.storage_location, "")
+    product = func.coalesce(Inventory.product_name, "")
+    for location_value, status, product_value, total_kg, batch_count in db.query(
+        location, Inventory.status, product, func.sum(Inventory.quantity_kg), func.count(Inventory.id)
+    ).group_by(location, Inventory.status, product).all():
+        db.add(InventoryRollup(
+            storage_location=location_value, status=status, product_name=product_value,
+            total_kg=float(total_kg or 0), batch_count=batch_count
+        ))
+    db.commit()
+
+
+def compute_counts(db: Session) -> dict:
+    """Counts straight from the source tables: one grouped aggregate per table."""
+    counts = {}
+
+    for status, total in db.query(ProductionBatch.status, func.count(ProductionBatch.id))\
+            .group_by(ProductionBatch.status).all():
+        counts[f"production:{status}"] = total
+
+    for status, total in db.query(QCRecord.status, func.count(QCRecord.id))\
+            .group_by(QCRecord.status).all():
+        counts[f"qc:{status}"] = total
+
+    over, under = db.query(
+        func.sum(case((Inventory.quantity_kg > INVENTORY_HIGH_KG, 1), else_=0)),
+        func.sum(case((Inventory.quantity_kg < INVENTORY_LOW_KG, 1), else_=0))
+    ).one()
+    counts["inventory:over_100"] = int(over or 0)
+    counts["inventory:under_50"] = int(under or 0)
+    return counts
+
+
+def read_counts(db: Session) -> dict:
+    """Reads the maintained counters: a single indexed lookup on dashboard_metrics.key."""
+    rows = db.query(DashboardMetrics.key, DashboardMetrics.value).filter(
+        DashboardMetrics.key.in_(list(SUMMARY_KEYS.values()))
+    ).all()
+    return {key: value for key, value in rows}
+
+
+def rebuild(db: Session):
+    """Resynchronises every counter row from the source tables."""
+    counts = compute_counts(db)
+    keys = {key for key, in db.query(DashboardMetrics.key).all()} | set(counts)
+    if keys:
+        db.execute(upsert(
+            db.get_bind(), DashboardMetrics, ["key"],
+            lambda current, incoming: {"value": incoming["value"]}
+        ), [{"key": key, "value": counts.get(key, 0)} for key in keys])
+    db.commit()
+
+
+def rebuild_enabled(db: Session, production: bool = True):
+    """Rebuilds the counter and inventory rollup tables that are enabled, and production_rollup."""
+    if COUNTERS_ENABLED:
+        rebuild(db)
+    if ROLLUP_ENABLED:
+        rebuild_inventory_rollup(db)
+    if production:
+        rebuild_production_rollup(db)
+
+
+def summary(db: Session) -> dict:
+    """Dashboard tile counts, from the counter table or from grouped aggregates."""
+    counts = read_counts(db) if COUNTERS_ENABLED else compute_counts(db)
+    result = {}
+    for (tile, slot), key in SUMMARY_KEYS.items():
+        result.setdefault(tile, {})[slot] = int(counts.get(key, 0) or 0)
+    return result
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    ts = ts.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    if granularity == "hour":
+        return ts
+    ts = ts.replace(hour=0)
+    return ts if granularity == "day" else ts.replace(day=1)
+
+
+def production_started(db: Session, batch: ProductionBatch):
+    """Call after adding a ProductionBatch; adds it to every rollup bucket it falls in."""
+    if batch.created_at is None:
+        # Bucket by the timestamp the database assigns, exactly as rebuild_production_rollup will
+        db.flush()
+        db.refresh(batch, ["created_at"])
+    _bump_production_rollup(db, [
+        {
+            "granularity": granularity, "bucket": bucket_start(batch.created_at, granularity),
+            "material": batch.material_used or "", "shift": batch.shift or "", "phase": batch.phase or "",
+            "total_kg": batch.quantity_used or 0.0, "batch_count": 1,
+        }
+        for granularity in PRODUCTION_GRANULARITIES
+    ])
+
+
+def _bump_production_rollup(db: Session, rows: list):
+    # One upsert: concurrent first batches in a bucket add up instead of colliding on the unique key
+    db.execute(upsert(
+        db.get_bind(), ProductionRollup, ["granularity", "bucket", "material", "shift", "phase"],
+        lambda current, incoming: {
+            "total_kg": current["total_kg"] + incoming["total_kg"],
+            "batch_count": current["batch_count"] + incoming["batch_count"],
+        }
+    ), rows)
+
+
+def production_series(db: Session, start: datetime, end: datetime, granularity: str = "day", group_by=()) -> list:
+    """
+    (bucket, *group_by values, total_kg, batch_count) per bucket in [start, end),
+    read from production_rollup: the rows scanned grow with the range and
+    groups asked for, not with the number of batches.
+    """
+    dims = [getattr(ProductionRollup, d) for d in group_by]
+    return db.query(
+        ProductionRollup.bucket, *dims,
+        func.sum(ProductionRollup.total_kg), func.sum(ProductionRollup.batch_count)
+    ).filter(
+        ProductionRollup.granularity == granularity,
+        ProductionRollup.bucket >= bucket_start(start, granularity),
+        ProductionRollup.bucket < end,
+    ).group_by(ProductionRollup.bucket, *dims).order_by(ProductionRollup.bucket, *dims).all()
+
+
+def rebuild_production_rollup(db: Session, since: datetime = None, chunk_size: int = PRODUCTION_BACKFILL_CHUNK):
+    """
+    Recomputes production_rollup from ProductionBatch, everything or only
+    from the month containing since onwards. Batches are read in id-ordered
+    chunks; memory grows with the number of buckets, not batches.
+    """
+    since = bucket_start(since, "month") if since else None
+    totals = {}
+    last_id = 0
+    while True:
+        query = db.query(
+            ProductionBatch.id, ProductionBatch.created_at, ProductionBatch.material_used,
+            ProductionBatch.shift, ProductionBatch.phase, ProductionBatch.quantity_used
+        ).filter(ProductionBatch.id > last_id)
+        if since:
+            query = query.filter(ProductionBatch.created_at >= since)
+        rows = query.order_by(ProductionBatch.id).limit(chunk_size).all()
+        for _, created_at, material, shift, phase, kg in rows:
+            if created_at is None:
+                continue
+            for granularity in PRODUCTION_GRANULARITIES:
+                key = (granularity, bucket_start(created_at, granularity), material or "", shift or "", phase or "")
+                entry = totals.setdefault(key, [0.0, 0])
+                entry[0] += kg or 0.0
+                entry[1] += 1
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1].id
+
+    stale = db.query(ProductionRollup)
+    if since:
+        # A month bucket starts at or before every hour/day bucket inside it
+        stale = stale.filter(ProductionRollup.bucket >= since)
+    stale.delete(synchronize_session=False)
+    items = list(totals.items())
+    for i in range(0, len(items), chunk_size):
+        db.bulk_insert_mappings(ProductionRollup, [
+            {"granularity": g, "bucket": b, "material": m, "shift": s, "phase": p, "total_kg": kg, "batch_count": n}
+            for (g, b, m, s, p), (kg, n) in items[i:i + chunk_size]
+        ])
+    db.commit()
+    return len(items)
+
+
+if __name__ == "__main__":
+    # Under the migration lock, so it never overlaps a booting worker's rebuild
+    with migrations.locked():
+        db = SessionLocal()
+        try:
+            rebuild_enabled(db)
+        finally:
+            db.close()
+    print("Counters and rollups rebuilt")
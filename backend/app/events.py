@@ -0,0 +1,93 @@
+# app/events.py
+import asyncio
+import threading
+from collections import deque
+
+# How many recent events are kept for Last-Event-ID replay
+REPLAY_BUFFER_SIZE = 500
+# Per-client backlog; a client that falls further behind is disconnected and
+# catches up through replay when its EventSource reconnects
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        # Runs on the subscriber's own event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class ActivityBroker:
+    """
+    In-process fan-out for activity events. Publishers may be sync request
+    threads; each event is handed to every connected client's loop, so one
+    DB write turns into N in-memory pushes.
+    """
+
+    def __init__(self, history: int = REPLAY_BUFFER_SIZE):
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, event: dict):
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # Loop already closed; the stream's finally block will unsubscribe
+                pass
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def replay_since(self, last_id: int):
+        """
+        Buffered events newer than last_id, or None when the buffer no longer
+        reaches back that far and the caller has to read the gap from the DB.
+        """
+        with self._lock:
+            history = list(self._history)
+        if not history or history[0]["id"] > last_id + 1:
+            return None
+        return [e for e in history if e["id"] > last_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered": len(self._history),
+                "published": self.published,
+            }
+
+
+activity_broker = ActivityBroker()
+
+
+def activity_event(log) -> dict:
+    """Shape of an ActivityLog row on the wire (matches /dashboard/notifications)."""
+    return {
+        "id": log.id,
+        "message": log.message,
+        "user": log.user,
+        "type": log.type,
+        "created_at": log.created_at.isoformat() if log.created_at else None,
+    }
@@ -0,0 +1,113 @@
+# app/hashing.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from passlib.context import CryptContext
+
+# bcrypt work factor for new hashes; existing hashes with another cost are
+# upgraded on the user's next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes doing bcrypt; each one keeps a core busy for the whole hash
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+# Hash jobs allowed in flight (running + queued) before new ones are turned away
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Also imported by the worker processes, so this module stays free of app imports
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str):
+    # (matches, replacement hash when the stored one uses an outdated cost)
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class HasherBusy(Exception):
+    """The admission queue is full; the caller should retry shortly."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small process pool so login storms neither hold the
+    event loop nor eat the request threadpool. At most max_pending jobs are
+    admitted; beyond that callers get HasherBusy instead of queueing forever.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.busy_seconds = 0.0
+
+    def _process_pool(self):
+        if self._pool is None:
+            # spawn: never fork a process that is running server threads
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy()
+        pool = self._process_pool()
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except Exception as e:
+            self.failed += 1
+            if isinstance(e, BrokenProcessPool) and self._pool is pool:
+                # A worker died; reap the broken pool and start a fresh one for the next caller
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            self.busy_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed: str):
+        """Returns (matches, new_hash); new_hash is set when the stored cost is outdated."""
+        if not hashed:
+            return False, None
+        matches, new_hash = await self._run(_verify_and_update, password, hashed)
+        if new_hash:
+            self.rehashed += 1
+        return matches, new_hash
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        runs = self.completed + self.failed
+        return {
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.busy_seconds / runs * 1000, 1) if runs else 0,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,118 @@
+# app/inference.py
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import numpy as np
+
+# Gather window after the first queued request, and hard cap per batch
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+
+# Histogram bucket upper bounds for batch sizes
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one matrix. Callers
+    await submit(); a collector task drains the queue for up to the window
+    (or max batch), runs predict_fn once on a worker thread and hands each
+    caller its own row of the result. The event loop never runs the model.
+    If a coalesced batch fails, its rows are retried one by one so a bad row
+    only fails its own caller.
+    """
+
+    def __init__(self, predict_fn: Callable, window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH_SIZE):
+        # predict_fn(matrix) -> sequence with one result per row, same order
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.retried_rows = 0
+        self.histogram = {bound: 0 for bound in BATCH_SIZE_BUCKETS}
+        self.histogram["inf"] = 0
+        self.predict_seconds = 0.0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._collect())
+
+    async def submit(self, row):
+        self._ensure_started()
+        future = self._loop.create_future()
+        self.requests += 1
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._run(batch)
+
+    async def _run(self, batch):
+        matrix = np.array([row for row, _ in batch], dtype=float)
+        self._record(len(batch))
+        started = time.perf_counter()
+        try:
+            results = await self._loop.run_in_executor(self._executor, self.predict_fn, matrix)
+        except Exception as e:
+            self.errors += 1
+            if len(batch) > 1:
+                # Isolate the failure: every other caller still gets its own answer
+                self.retried_rows += len(batch)
+                for item in batch:
+                    await self._run([item])
+                return
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+        finally:
+            self.predict_seconds += time.perf_counter() - started
+        for (_, future), result in zip(batch, results):
+            if not future.done():   # caller may have gone away
+                future.set_result(result)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.rows += size
+        for bound in BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                self.histogram[bound] += 1
+                return
+        self.histogram["inf"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "retried_rows": self.retried_rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0,
+            "avg_predict_ms": round(self.predict_seconds / self.batches * 1000, 3) if self.batches else 0,
+            "batch_size_histogram": {f"le_{k}": v for k, v in self.histogram.items()},
+        }
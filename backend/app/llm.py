@@ -0,0 +1,82 @@
+# app/llm.py
+import abc
+import asyncio
+import os
+import re
+from typing import AsyncIterator, List
+
+# "groq" (needs GROQ_API_KEY) or "stub" for offline runs and load tests
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+# Stub timings, so the streaming path can be exercised with realistic pacing
+STUB_FIRST_TOKEN_MS = float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "150"))
+STUB_TOKEN_MS = float(os.getenv("LLM_STUB_TOKEN_MS", "15"))
+
+
+class LLMClient(abc.ABC):
+    """
+    What the assistant needs from a model: a token stream for a chat.
+    complete() is derived from stream() so every client gets both.
+    """
+    name = "base"
+
+    @abc.abstractmethod
+    def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        """Yields the reply's tokens as the model produces them."""
+
+    async def complete(self, messages: List[dict]) -> str:
+        return "".join([token async for token in self.stream(messages)])
+
+
+class GroqLLM(LLMClient):
+    name = "groq"
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL, temperature: float = LLM_TEMPERATURE):
+        from groq import AsyncGroq
+        self.client = AsyncGroq(api_key=api_key)
+        self.model = model
+        self.temperature = temperature
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            messages=messages, model=self.model, temperature=self.temperature, stream=True
+        )
+        async for chunk in response:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+
+class StubLLM(LLMClient):
+    """Deterministic offline model: echoes the question and the plant status it was given."""
+    name = "stub"
+
+    def __init__(self, first_token_ms: float = STUB_FIRST_TOKEN_MS, token_ms: float = STUB_TOKEN_MS):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        question = messages[-1]["content"]
+        status = " ".join(re.findall(r"- [^\n:]+: [^\n]+", messages[0]["content"]))
+        answer = f"[stub] You asked: {question.strip()} Plant status: {status or 'unknown'}."
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, word in enumerate(answer.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield word if i == 0 else " " + word
+
+
+def make_llm():
+    """The configured client, or None when no provider is usable."""
+    if LLM_PROVIDER == "stub":
+        return StubLLM()
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        print("⚠️ WARNING: GROQ_API_KEY not found in .env file")
+        return None
+    try:
+        return GroqLLM(api_key)
+    except Exception as e:
+        print(f"Groq Config Error: {e}")
+        return None
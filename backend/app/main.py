@@ -1,9 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
+from fastapi.responses import ORJSONResponse
+from app.database import SessionLocal, dispose_async_engines as _dispose_async_engines
+from app import counters, migrations
+from app.audit import audit_writer
+from app.hashing import password_hasher
+from app.telemetry import telemetry_store
+from app.risk import risk_engine
+from app.anomaly import anomaly_detector, ANOMALY_DETECTION
 
 # Import all models to ensure they are registered with Base
-from app.models import production, qc, inventory, materials, users, maintenance
+from app.models import production, qc, inventory, materials, users, maintenance, dashboard
+from app.models.production import ProductionBatch, ProductionRollup
 
 
 # Import routers 
@@ -12,7 +20,8 @@ from app.routers import (
     inventory, dashboard, ml, maintenance, ai
 )
 
-app = FastAPI(title="MCC Plant PDMS")
+# orjson renders every JSON response; far cheaper than the stdlib encoder on big lists
+app = FastAPI(title="MCC Plant PDMS", default_response_class=ORJSONResponse)
 
 # Standard CORS configuration for React (Port 5173)
 app.add_middleware(
@@ -21,15 +30,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # List endpoints hand out the next page's cursor in a header; the browser only lets the UI read it if exposed
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Table creation on startup
 @app.on_event("startup")
 def on_startup():
-    # This creates the MySQL tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # Versioned schema changes (tables, indexes) instead of create_all; see app/migrations.py
+    if migrations.DB_AUTO_MIGRATE:
+        migrations.upgrade()
+    # Under the migration lock, so booting workers take turns instead of rebuilding at once
+    with migrations.locked():
+        db = SessionLocal()
+        try:
+            if counters.REBUILD_ON_STARTUP:
+                # Counters may have drifted while the mode was off; resync once per boot
+                counters.rebuild_enabled(db, production=False)
+            # First boot with production_rollup: backfill it from existing batches
+            if db.query(ProductionRollup.id).first() is None \
+                    and db.query(ProductionBatch.id).first() is not None:
+                counters.rebuild_production_rollup(db)
+        finally:
+            db.close()
+    # Risk windows live in memory; refill them from stored telemetry
+    risk_engine.load_history()
+    if ANOMALY_DETECTION:
+        # Control-chart baselines live in memory; replay history into them
+        anomaly_detector.rebuild()
+    # Load the active quality model (training the seed version into an empty store)
+    # now, rather than inside whichever request happens to come first
+    ml.registry.get()
+    ml.retraining_job.start_scheduler()
     print("🚀 MySQL Database Connected and Tables Synchronized")
 
+@app.on_event("shutdown")
+def on_shutdown():
+    ml.retraining_job.shutdown()
+    # Buffered audit rows still in memory get written before the process exits
+    audit_writer.shutdown()
+    password_hasher.shutdown()
+    telemetry_store.shutdown()
+
+@app.on_event("shutdown")
+async def dispose_async_engines():
+    # aiosqlite keeps a thread per pooled connection; close them so the process can exit
+    await _dispose_async_engines()
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(materials.router)
@@ -0,0 +1,204 @@
+# app/migrations.py
+"""
+Versioned schema changes, applied in order at startup or from the shell:
+
+    cd backend && python -m app.migrations            # apply pending
+    cd backend && python -m app.migrations status     # list applied / pending
+
+schema_migrations records every version that ran, so each step runs once
+per database. Version 1 creates the fixed BASELINE_TABLES list; a model
+that adds a table needs its own step (create_tables) rather than an entry
+there. The baseline tables are created from the current models, so steps
+must tolerate columns and indexes a fresh database already has: add_columns
+and create_indexes skip anything present.
+"""
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from app.database import Base, engine
+# Every model module, so Base.metadata knows all tables
+from app.models import production, qc, inventory, materials, users, maintenance, dashboard, intelligence, activity  # noqa: F401
+
+# Apply pending migrations on startup; turn off where deploys run them as a separate step
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1").lower() in ("1", "true", "yes")
+# Seconds a booting worker waits while another one migrates (MySQL GET_LOCK)
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("DB_MIGRATION_LOCK_TIMEOUT", "120"))
+MIGRATION_LOCK = "mcc_pdms_schema_migrations"
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    def register(step):
+        MIGRATIONS.append((version, name, step))
+        return step
+    return register
+
+
+def _declared_index(table: str, name: str):
+    for index in Base.metadata.tables[table].indexes:
+        if index.name == name:
+            return index
+    raise KeyError(f"{table} declares no index {name}")
+
+
+def create_indexes(conn, *indexes):
+    """Creates the given (table, index name) pairs as declared on the models, skipping ones already present."""
+    inspector = inspect(conn)
+    existing = {}
+    for table, name in indexes:
+        if table not in existing:
+            existing[table] = {ix["name"] for ix in inspector.get_indexes(table)}
+        if name not in existing[table]:
+            _declared_index(table, name).create(conn)
+
+
+def add_columns(conn, *columns):
+    """Adds the given (table, column name) pairs as declared on the models, skipping ones already present."""
+    inspector = inspect(conn)
+    for table, name in columns:
+        if name in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        column = Base.metadata.tables[table].c[name]
+        # Added nullable and without a server default, which every dialect can ALTER in;
+        # model-side defaults fill it from then on
+        conn.execute(text(
+            f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table)} "
+            f"ADD COLUMN {conn.dialect.identifier_preparer.quote(name)} {column.type.compile(conn.dialect)} NULL"
+        ))
+
+
+def create_tables(conn, *tables):
+    """Creates the named tables as declared on the models, skipping ones already present."""
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in tables])
+
+
+# The tables startup's create_all had built when versioned migrations began; frozen
+BASELINE_TABLES = (
+    "users", "raw_material_batches", "material_history", "production_batches", "batch_parameters",
+    "qc_records", "Inventory", "inventory_rollup", "equipment", "maintenance_history",
+    "equipment_telemetry", "equipment_telemetry_rollup", "anomalies", "activity_logs",
+    "notifications", "dashboard_metrics", "production_rollup",
+)
+
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+    create_tables(conn, *BASELINE_TABLES)
+
+
+@migration(2, "status and time indexes")
+def _status_time_indexes(conn):
+    create_indexes(
+        conn,
+        ("production_batches", "ix_production_batches_status_created_at"),
+        ("Inventory", "ix_Inventory_status_created_at"),
+        ("Inventory", "ix_Inventory_status_dispatched_at"),
+        ("qc_records", "ix_qc_records_status"),
+        ("activity_logs", "ix_activity_logs_created_at"),
+        ("anomalies", "ix_anomalies_detected_at"),
+        ("notifications", "ix_notifications_user_id_is_read"),
+        ("equipment", "ix_equipment_created_at"),
+        ("maintenance_history", "ix_maintenance_history_equipment_id"),
+    )
+
+
+@migration(3, "unique maintenance record per asset and description")
+def _unique_maintenance_record(conn):
+    # Workers used to race to insert the risk record; keep the newest of each duplicate
+    # (the derived table is how MySQL lets a DELETE read the table it deletes from)
+    conn.execute(text(
+        "DELETE FROM maintenance_history WHERE equipment_id IS NOT NULL AND id NOT IN ("
+        " SELECT id FROM (SELECT MAX(id) AS id FROM maintenance_history"
+        " GROUP BY equipment_id, description) AS newest)"
+    ))
+    create_indexes(conn, ("maintenance_history", "uq_maintenance_history_equipment_description"))
+
+
+@migration(4, "material change timestamps")
+def _material_updated_at(conn):
+    add_columns(conn, ("raw_material_batches", "updated_at"))
+    create_indexes(conn, ("raw_material_batches", "ix_raw_material_batches_updated_at"))
+
+
+def _lock(conn):
+    if conn.dialect.name != "mysql":
+        return
+    acquired = conn.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT}
+    ).scalar()
+    if acquired != 1:
+        raise RuntimeError(f"Timed out after {MIGRATION_LOCK_TIMEOUT}s waiting for the migration lock")
+
+
+def _unlock(conn):
+    if conn.dialect.name == "mysql":
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+@contextmanager
+def locked(bind=engine):
+    """
+    Holds the migration lock for the block and yields the connection that
+    holds it. Also used by other one-per-deploy startup work (counter
+    rebuilds), so booting workers take turns instead of racing.
+    """
+    with bind.connect() as conn:
+        _lock(conn)
+        try:
+            yield conn
+        finally:
+            # A failed step leaves its transaction open; end it before releasing the lock
+            conn.rollback()
+            _unlock(conn)
+
+
+def applied_versions(conn) -> dict:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return {}
+    return {version: name for version, name in conn.execute(
+        select(schema_migrations.c.version, schema_migrations.c.name)
+    ).all()}
+
+
+def upgrade(bind=engine, target: int = None) -> list:
+    """Runs pending migrations up to target (default: all) in version order; returns the versions applied."""
+    ran = []
+    with locked(bind) as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        conn.commit()
+        # Read after taking the lock, so a worker that waited sees what the other applied
+        done = applied_versions(conn)
+        for version, name, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in done or (target is not None and version > target):
+                continue
+            step(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+            conn.commit()
+            ran.append(version)
+    return ran
+
+
+def status(bind=engine) -> list:
+    """(version, name, applied) for every known migration."""
+    with bind.connect() as conn:
+        done = applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in sorted(MIGRATIONS, key=lambda m: m[0])]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["status"]:
+        for version, name, applied in status():
+            print(f"{version:>4}  {'applied' if applied else 'pending':<8} {name}")
+    else:
+        applied = upgrade()
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
@@ -0,0 +1,159 @@
+# app/model_registry.py
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+import joblib
+import numpy as np
+
+# Artifacts live on local disk: <MODEL_DIR>/<version>/{model.joblib,metadata.json}
+# plus an ACTIVE file naming the version every worker should serve.
+MODEL_DIR = os.getenv("MODEL_DIR", str(Path(__file__).resolve().parent.parent / "model_store"))
+# How often a worker re-reads ACTIVE to pick up a version promoted elsewhere
+ACTIVE_CHECK_SECONDS = float(os.getenv("MODEL_ACTIVE_CHECK_SECONDS", "2"))
+
+
+@dataclass
+class ModelBundle:
+    version: str
+    scaler: object
+    model: object
+    metadata: dict = field(default_factory=dict)
+
+
+def data_hash(X: np.ndarray, y: np.ndarray) -> str:
+    """Fingerprint of the exact training matrix, stored with each version."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Versioned scaler + forest artifacts. The active version is loaded lazily
+    (memory-mapped) on first use and can be swapped at runtime with activate().
+    """
+
+    def __init__(self, root: str, features: list, bootstrap: Optional[Callable] = None):
+        self.root = Path(root)
+        self.features = list(features)
+        # Called as bootstrap(registry) when the store is empty, so a fresh
+        # install still has something to serve
+        self.bootstrap = bootstrap
+        self._bundle = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    # --- paths ---
+    def _version_dir(self, version: str) -> Path:
+        return self.root / version
+
+    def _active_file(self) -> Path:
+        return self.root / "ACTIVE"
+
+    # --- writing ---
+    def save(self, scaler, model, X, y, metrics: dict = None, extra: dict = None, activate: bool = True) -> str:
+        """Persists a trained scaler + model as the next version and returns its name."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        version, path = self._reserve_version()
+        # Uncompressed so the tree arrays can be memory-mapped on load
+        joblib.dump({"scaler": scaler, "model": model}, path / "model.joblib")
+        metadata = {
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            "features": self.features,
+            "n_samples": int(len(y)),
+            "data_hash": data_hash(X, y),
+            "model_type": type(model).__name__,
+            "params": {k: v for k, v in model.get_params().items() if isinstance(v, (int, float, str, bool, type(None)))},
+            "metrics": metrics or {},
+        }
+        metadata.update(extra or {})
+        (path / "metadata.json").write_text(json.dumps(metadata, indent=2))
+        if activate:
+            self.activate(version)
+        return version
+
+    def _reserve_version(self):
+        existing = [int(p.name[1:]) for p in self.root.glob("v[0-9]*") if p.name[1:].isdigit()]
+        number = max(existing, default=0) + 1
+        while True:
+            path = self._version_dir(f"v{number:04d}")
+            try:
+                path.mkdir()   # atomic; another worker may race us to the same number
+                return path.name, path
+            except FileExistsError:
+                number += 1
+
+    def activate(self, version: str):
+        """Points every worker at version; this worker swaps immediately."""
+        if not (self._version_dir(version) / "model.joblib").exists():
+            raise KeyError(version)
+        tmp = self.root / f".ACTIVE.{os.getpid()}"
+        tmp.write_text(version)
+        os.replace(tmp, self._active_file())
+        with self._lock:
+            self._bundle = self._load(version)
+            self._checked_at = time.monotonic()
+
+    # --- reading ---
+    def versions(self) -> list:
+        result = []
+        for path in sorted(self.root.glob("v[0-9]*")):
+            meta = path / "metadata.json"
+            if meta.exists():
+                result.append(json.loads(meta.read_text()))
+        return result
+
+    def active_version(self) -> Optional[str]:
+        try:
+            return self._active_file().read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def get(self) -> ModelBundle:
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() - self._checked_at < ACTIVE_CHECK_SECONDS:
+            return bundle
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = self.active_version()
+            if version is None:
+                self._run_bootstrap()
+                version = self.active_version()
+            if self._bundle is None or self._bundle.version != version:
+                self._bundle = self._load(version)
+            return self._bundle
+
+    def _load(self, version: str) -> ModelBundle:
+        path = self._version_dir(version)
+        artifacts = joblib.load(path / "model.joblib", mmap_mode="r")
+        metadata = json.loads((path / "metadata.json").read_text())
+        return ModelBundle(version, artifacts["scaler"], artifacts["model"], metadata)
+
+    def _run_bootstrap(self):
+        if self.bootstrap is None:
+            raise RuntimeError(f"No active model in {self.root}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock = self.root / ".bootstrap.lock"
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Another worker is training the seed model; wait for it
+            for _ in range(600):
+                if self.active_version():
+                    return
+                time.sleep(0.1)
+            raise RuntimeError("Timed out waiting for the seed model")
+        try:
+            os.close(fd)
+            if not self.active_version():
+                self.bootstrap(self)
+        finally:
+            lock.unlink(missing_ok=True)
@@ -2,7 +2,8 @@
 from .users import User, RoleType
 from .materials import RawMaterialBatch, MaterialHistory
 from .intelligence import Anomaly, Notification
-from .production import ProductionBatch
-from .inventory import Inventory
+from .production import ProductionBatch, BatchParameters, ProductionRollup
+from .inventory import Inventory, InventoryRollup
 from .qc import QCRecord
 from .activity import ActivityLog
+from .dashboard import DashboardMetrics
@@ -10,4 +10,4 @@ class ActivityLog(Base):
     message = Column(String(500))  # e.g., "User GANESH logged in"
     user = Column(String(255))     # The person who did it
     type = Column(String(50))      # info, success, warning, danger
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now, index=True)
\ No newline at end of file
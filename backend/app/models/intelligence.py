@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -16,12 +16,14 @@ class Anomaly(Base):
     batch_id = Column(Integer, ForeignKey("production_batches.id"))
     description = Column(String(255)) 
     severity = Column(Enum(SeverityLevel), default=SeverityLevel.MEDIUM)
-    detected_at = Column(DateTime, default=datetime.utcnow)
+    detected_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     batch = relationship("ProductionBatch")
 
 class Notification(Base):
     __tablename__ = "notifications"
+    # Unread notifications per user
+    __table_args__ = (Index("ix_notifications_user_id_is_read", "user_id", "is_read"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id")) 
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Inventory(Base):
     __tablename__ = "Inventory"
+    # Finished-goods and dispatch-history pages: status filter, then newest first
+    __table_args__ = (
+        Index("ix_Inventory_status_created_at", "status", "created_at"),
+        Index("ix_Inventory_status_dispatched_at", "status", "dispatched_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     batch_no = Column(String(255), unique=True, nullable=False) # Traceability ID [cite: 77]
@@ -12,4 +17,17 @@ class Inventory(Base):
     storage_location = Column(String(255)) # Warehouse location [cite: 78]
     status = Column(String(255), default="In Stock") # tracking status [cite: 76]
     dispatched_at = Column(DateTime, nullable=True) # Dispatch monitoring 
-    created_at = Column(DateTime, server_default=func.now()) # Auto-timestamp [cite: 47]
\ No newline at end of file
+    created_at = Column(DateTime, server_default=func.now()) # Auto-timestamp [cite: 47]
+
+class InventoryRollup(Base):
+    __tablename__ = "inventory_rollup"
+    __table_args__ = (UniqueConstraint("storage_location", "status", "product_name"),)
+
+    # Running totals per (location, status, product), maintained alongside
+    # every Inventory insert or status change when INVENTORY_ROLLUP is on
+    id = Column(Integer, primary_key=True, index=True)
+    storage_location = Column(String(255), nullable=False, default="")
+    status = Column(String(255), nullable=False)
+    product_name = Column(String(255), nullable=False, default="")
+    total_kg = Column(Float, nullable=False, default=0.0)
+    batch_count = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects import mysql
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -12,15 +13,52 @@ class Equipment(Base):
     status = Column(String(255), default="Operational") 
     last_vibration_reading = Column(Float, default=0.0) # For ML Risk [cite: 73]
     last_temp_reading = Column(Float, default=0.0)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
 
 class MaintenanceRecord(Base):
     __tablename__ = "maintenance_history"
+    # One row per asset and description, so the risk engine's per-asset record can be upserted
+    __table_args__ = (
+        Index("uq_maintenance_history_equipment_description", "equipment_id", "description", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    equipment_id = Column(Integer, ForeignKey("equipment.id"))
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), index=True)
     maintenance_date = Column(DateTime, server_default=func.now())
     description = Column(String(255), nullable=False)
     failure_risk_score = Column(Float, default=0.0) # XGBoost Predicted [cite: 73]
     
-    asset = relationship("Equipment")
\ No newline at end of file
+    asset = relationship("Equipment")
+
+# Sensors report several readings a second; MySQL DATETIME drops fractions unless asked
+PreciseDateTime = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+class TelemetryReading(Base):
+    __tablename__ = "equipment_telemetry"
+    __table_args__ = (Index("ix_equipment_telemetry_equipment_ts", "equipment_id", "ts"),)
+
+    # Raw readings (UTC), written in multi-row batches by app.telemetry and
+    # pruned after TELEMETRY_RAW_RETENTION_DAYS; the rollups keep the history
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False)
+    ts = Column(PreciseDateTime, nullable=False, index=True)
+    vibration = Column(Float, nullable=False)
+    temperature = Column(Float, nullable=False)
+
+class TelemetryRollup(Base):
+    __tablename__ = "equipment_telemetry_rollup"
+    __table_args__ = (UniqueConstraint("equipment_id", "resolution", "bucket"),)
+
+    # Per-asset aggregates over fixed buckets (resolution in seconds: 60 or 3600).
+    # Sums rather than means, so merging a later flush into a bucket is exact.
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False)
+    resolution = Column(Integer, nullable=False)
+    bucket = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    vibration_sum = Column(Float, nullable=False, default=0.0)
+    vibration_min = Column(Float, nullable=False)
+    vibration_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
@@ -13,6 +13,8 @@ class RawMaterialBatch(Base):
     # Specs for ML analysis as per documentation
     purity_spec = Column(Float, nullable=True) 
     moisture_spec = Column(Float, nullable=True)
+    # Set by the database on every insert and update; the search index refreshes from it
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
 
 class MaterialHistory(Base):
     __tablename__ = "material_history"
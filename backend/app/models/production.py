@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
 class ProductionBatch(Base):
     __tablename__ = "production_batches"
+    # Active / pending-QC lists filter on status and page newest first
+    __table_args__ = (Index("ix_production_batches_status_created_at", "status", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     batch_number = Column(String(255), unique=True, nullable=False)
@@ -13,4 +15,34 @@ class ProductionBatch(Base):
     shift = Column(String(50), nullable=False) # Added for Shift Tracking
     status = Column(String(255), default="ACTIVE")
     authorized_by = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BatchParameters(Base):
+    __tablename__ = "batch_parameters"
+
+    # Process settings recorded at batch start; joined with QC results they
+    # become training rows for the quality model
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(Integer, ForeignKey("production_batches.id"), unique=True, nullable=False)
+    drying_time = Column(Float, nullable=False)
+    milling_speed = Column(Float, nullable=False)
+    acid_ph = Column(Float, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+class ProductionRollup(Base):
+    __tablename__ = "production_rollup"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket", "material", "shift", "phase"),
+        Index("ix_production_rollup_granularity_bucket", "granularity", "bucket"),
+    )
+
+    # Started batches and kg per (hour/day/month bucket, material, shift, phase),
+    # bumped by start_batch so analytics never groups raw batches
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(8), nullable=False)
+    bucket = Column(DateTime, nullable=False)
+    material = Column(String(255), nullable=False, default="")
+    shift = Column(String(50), nullable=False, default="")
+    phase = Column(String(255), nullable=False, default="")
+    batch_count = Column(Integer, nullable=False, default=0)
+    total_kg = Column(Float, nullable=False, default=0.0)
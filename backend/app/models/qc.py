@@ -9,5 +9,5 @@ class QCRecord(Base):
     batch_id = Column(String(255), nullable=False)
     moisture = Column(Float, nullable=False)
     purity = Column(Float, nullable=False)
-    status = Column(String(255), nullable=False) # PASS or FAIL
+    status = Column(String(255), nullable=False, index=True) # PASS or FAIL
     created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
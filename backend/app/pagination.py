@@ -0,0 +1,134 @@
+# app/pagination.py
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_, select, DateTime
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+class PageParams:
+    """Query parameters shared by every paginated list endpoint."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="Value of the previous page's X-Next-Cursor header"),
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,batch_no"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+    def key(self) -> tuple:
+        return (self.limit, self.cursor, self.fields)
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+
+    def send(self, response: Response) -> list:
+        """Returns the items, advertising the next page through a header."""
+        if self.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        return self.items
+
+
+def _projection(model, fields: Optional[str], allowed: Optional[list]):
+    columns = {c.key: c for c in model.__table__.columns}
+    allowed = allowed or list(columns)
+    if not fields:
+        return allowed
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _keyset_select(model, params: PageParams, criteria, sort_column, allowed_fields):
+    id_column = model.id
+    sort_column = sort_column if sort_column is not None else id_column
+    names = _projection(model, params.fields, allowed_fields)
+
+    query = select(
+        *[getattr(model, name) for name in names],
+        sort_column.label("_sort_key"),
+        id_column.label("_id_key")
+    ).where(*criteria)
+
+    if params.cursor:
+        try:
+            last_sort, last_id = decode_cursor(params.cursor)
+            if isinstance(sort_column.type, DateTime) and last_sort is not None:
+                last_sort = datetime.fromisoformat(last_sort)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if sort_column is id_column:
+            query = query.where(id_column < last_id)
+        elif last_sort is None:
+            # Already into the NULL tail (NULLs sort last when descending on MySQL and SQLite)
+            query = query.where(sort_column.is_(None), id_column < last_id)
+        else:
+            after = [sort_column < last_sort, and_(sort_column == last_sort, id_column < last_id)]
+            if getattr(sort_column, "nullable", False):
+                # `< last_sort` is never true for NULL, so the NULL tail has to be let in explicitly
+                after.append(sort_column.is_(None))
+            query = query.where(or_(*after))
+
+    if sort_column is id_column:
+        query = query.order_by(id_column.desc())
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    return query.limit(params.limit + 1)
+
+
+def _to_page(rows: list, params: PageParams) -> Page:
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        last = rows[-1]._mapping
+        sort_value = last["_sort_key"]
+        if isinstance(sort_value, datetime):
+            sort_value = sort_value.isoformat()
+        next_cursor = encode_cursor([sort_value, last["_id_key"]])
+
+    # Row tuples go straight to the route's response_model; no ORM hydration
+    return Page(rows, next_cursor)
+
+
+def keyset_page(db: Session, model, params: PageParams, *criteria, sort_column=None, allowed_fields: list = None) -> Page:
+    """
+    Newest-first keyset pagination on (sort_column, id), selecting only the
+    requested columns. Cost depends on the page size, not the table size,
+    given an index that matches the filter and sort.
+    """
+    query = _keyset_select(model, params, criteria, sort_column, allowed_fields)
+    return _to_page(db.execute(query).all(), params)
+
+
+async def keyset_page_async(db: AsyncSession, model, params: PageParams, *criteria, sort_column=None,
+                            allowed_fields: list = None) -> Page:
+    """keyset_page for AsyncSession routes."""
+    query = _keyset_select(model, params, criteria, sort_column, allowed_fields)
+    return _to_page((await db.execute(query)).all(), params)
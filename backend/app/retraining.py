@@ -0,0 +1,287 @@
+# app/retraining.py
+import fcntl
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import text
+from app.database import SessionLocal, engine
+from app.models.production import ProductionBatch, BatchParameters
+from app.models.qc import QCRecord
+
+CHUNK_SIZE = int(os.getenv("RETRAIN_CHUNK_SIZE", "5000"))
+MIN_TRAINING_ROWS = int(os.getenv("RETRAIN_MIN_ROWS", "30"))
+# Extra trees grown on the new rows during an incremental run
+INCREMENTAL_TREES = int(os.getenv("RETRAIN_INCREMENTAL_TREES", "20"))
+# 0 disables the periodic incremental run
+RETRAIN_INTERVAL_MINUTES = float(os.getenv("RETRAIN_INTERVAL_MINUTES", "0"))
+HOLDOUT_FRACTION = 0.2
+SCHEDULER_LOCK = "mcc_pdms_retrain_scheduler"
+
+
+def stream_training_rows(after_qc_id: int = 0, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields (qc_ids, X, y) chunks of QC outcomes joined with the process
+    parameters of their batch, walking qc_records.id so memory stays flat.
+    Label is the lab purity, on the same scale as the quality score.
+    """
+    db = SessionLocal()
+    try:
+        last_id = after_qc_id
+        while True:
+            rows = db.query(
+                QCRecord.id,
+                BatchParameters.drying_time,
+                BatchParameters.milling_speed,
+                BatchParameters.acid_ph,
+                QCRecord.purity
+            ).join(ProductionBatch, ProductionBatch.batch_number == QCRecord.batch_id)\
+             .join(BatchParameters, BatchParameters.batch_id == ProductionBatch.id)\
+             .filter(QCRecord.id > last_id)\
+             .order_by(QCRecord.id)\
+             .limit(chunk_size).all()
+            if not rows:
+                return
+            chunk = np.array(rows, dtype=float)
+            last_id = int(chunk[-1, 0])
+            yield chunk[:, 0].astype(int), chunk[:, 1:4], chunk[:, 4]
+            if len(rows) < chunk_size:
+                return
+    finally:
+        db.close()
+
+
+def load_training_matrix(after_qc_id: int = 0):
+    """Concatenates the streamed chunks; returns (X, y, watermark)."""
+    xs, ys, watermark = [], [], after_qc_id
+    for ids, X, y in stream_training_rows(after_qc_id):
+        xs.append(X)
+        ys.append(y)
+        watermark = int(ids[-1])
+    if not xs:
+        return np.empty((0, 3)), np.empty(0), watermark
+    return np.concatenate(xs), np.concatenate(ys), watermark
+
+
+def fit_candidate(X, y, current_path: str = None, incremental: bool = False, seed: int = 42) -> dict:
+    """
+    Runs in a worker process. Fits a candidate on a train split and scores
+    both it and the current model on the same holdout rows.
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(y))
+    n_holdout = max(1, int(len(y) * HOLDOUT_FRACTION))
+    test_idx, train_idx = order[:n_holdout], order[n_holdout:]
+
+    current = joblib.load(current_path) if current_path else None
+
+    if incremental and current is not None:
+        # Keep the existing trees and scaler; grow extra trees on the new rows only
+        scaler = current["scaler"]
+        model = current["model"]
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + INCREMENTAL_TREES)
+        model.fit(scaler.transform(X[train_idx]), y[train_idx])
+        model.set_params(warm_start=False)
+        # The in-place fit above mutated our copy; reload the untouched current model
+        current = joblib.load(current_path)
+    else:
+        scaler = StandardScaler().fit(X[train_idx])
+        model = RandomForestRegressor(n_estimators=100, random_state=seed)
+        model.fit(scaler.transform(X[train_idx]), y[train_idx])
+
+    def evaluate(s, m):
+        predictions = m.predict(s.transform(X[test_idx]))
+        return {
+            "mae": round(float(mean_absolute_error(y[test_idx], predictions)), 4),
+            "r2": round(float(r2_score(y[test_idx], predictions)), 4) if n_holdout > 1 else None,
+        }
+
+    return {
+        "scaler": scaler,
+        "model": model,
+        "candidate": evaluate(scaler, model),
+        "current": evaluate(current["scaler"], current["model"]) if current else None,
+        "train_rows": int(len(train_idx)),
+        "holdout_rows": int(n_holdout),
+    }
+
+
+class SchedulerLease:
+    """
+    Elects one retraining scheduler among all API workers: a MySQL GET_LOCK
+    held on a dedicated connection, or elsewhere an flock on a file in the
+    model store. The server or the OS drops either when the holder dies, so
+    a standby worker takes over on its next tick.
+    """
+
+    def __init__(self, path, bind=engine):
+        self.path = path
+        self.bind = bind
+        self._conn = None
+        self._fd = None
+
+    def held(self) -> bool:
+        """Takes the lease if it is free; True while this process holds it."""
+        if self.bind.dialect.name == "mysql":
+            return self._held_mysql()
+        return self._held_file()
+
+    def _held_mysql(self) -> bool:
+        try:
+            if self._conn is None:
+                self._conn = self.bind.connect()
+            # GET_LOCK nests per connection; only ask for it when not already ours
+            held = self._conn.execute(
+                text("SELECT IF(IS_USED_LOCK(:name) = CONNECTION_ID(), 1, GET_LOCK(:name, 0))"),
+                {"name": SCHEDULER_LOCK}
+            ).scalar() == 1
+            self._conn.commit()
+            return held
+        except Exception:
+            # Dropped connection: the server released the lock with it; retry next tick
+            self.release()
+            return False
+
+    def _held_file(self) -> bool:
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_CREAT | os.O_WRONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class RetrainingJob:
+    """
+    Orchestrates retraining off the request path: DB streaming on a helper
+    thread, fitting in a separate process so API workers never block.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrain")
+        self._pool = None
+        self._lock = threading.Lock()
+        self.running = False
+        self.last_result = None
+        self.lease = SchedulerLease(str(registry.root / ".scheduler.lock"))
+        self.scheduler = "off"
+
+    def _process_pool(self):
+        if self._pool is None:
+            # spawn: never fork a process that is running server threads
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def start(self, incremental: bool = False) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+        self._runner.submit(self._run, incremental)
+        return True
+
+    def _run(self, incremental: bool):
+        started = time.perf_counter()
+        result = {"started_at": datetime.now().isoformat(), "incremental": incremental}
+        try:
+            result.update(self.run_once(incremental))
+        except Exception as e:
+            result.update({"outcome": "error", "detail": str(e)})
+        finally:
+            result["seconds"] = round(time.perf_counter() - started, 2)
+            self.last_result = result
+            with self._lock:
+                self.running = False
+
+    def run_once(self, incremental: bool = False) -> dict:
+        current = self.registry.get()
+        watermark = int(current.metadata.get("qc_watermark", 0)) if incremental else 0
+        X, y, new_watermark = load_training_matrix(watermark)
+        if len(y) < MIN_TRAINING_ROWS:
+            return {"outcome": "skipped", "detail": f"{len(y)} new rows; need {MIN_TRAINING_ROWS}"}
+
+        current_path = str(self.registry.root / current.version / "model.joblib")
+        try:
+            fitted = self._process_pool().submit(fit_candidate, X, y, current_path, incremental).result()
+        except BrokenProcessPool:
+            # Worker died (e.g. OOM); start a fresh pool next run
+            self._pool = None
+            raise
+
+        candidate, baseline = fitted["candidate"], fitted["current"]
+        summary = {
+            "rows": int(len(y)),
+            "candidate": candidate,
+            "current": baseline,
+            "current_version": current.version,
+        }
+        if baseline is not None and candidate["mae"] >= baseline["mae"]:
+            return {"outcome": "rejected", **summary}
+
+        version = self.registry.save(
+            fitted["scaler"], fitted["model"], X, y,
+            metrics={"holdout_mae": candidate["mae"], "holdout_r2": candidate["r2"]},
+            extra={
+                "source": "incremental" if incremental else "full",
+                "parent_version": current.version,
+                "qc_watermark": new_watermark,
+                "train_rows": fitted["train_rows"],
+                "holdout_rows": fitted["holdout_rows"],
+            }
+        )
+        return {"outcome": "promoted", "version": version, **summary}
+
+    def status(self) -> dict:
+        return {"running": self.running, "scheduler": self.scheduler, "last_result": self.last_result}
+
+    def start_scheduler(self):
+        """
+        Periodic incremental retraining when RETRAIN_INTERVAL_MINUTES is set.
+        Every worker runs the timer, but only the one holding the lease
+        retrains; the others stand by in case it exits.
+        """
+        if RETRAIN_INTERVAL_MINUTES <= 0:
+            return
+
+        def loop():
+            while True:
+                time.sleep(RETRAIN_INTERVAL_MINUTES * 60)
+                leader = self.lease.held()
+                self.scheduler = "leader" if leader else "standby"
+                if leader:
+                    self.start(incremental=True)
+
+        self.scheduler = "leader" if self.lease.held() else "standby"
+
+        threading.Thread(target=loop, name="retrain-scheduler", daemon=True).start()
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self.lease.release()
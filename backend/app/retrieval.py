@@ -0,0 +1,321 @@
+# app/retrieval.py
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from app.database import ReadSessionLocal
+from app.models.activity import ActivityLog
+from app.models.inventory import Inventory
+from app.models.materials import RawMaterialBatch
+from app.models.production import ProductionBatch
+from app.models.qc import QCRecord
+
+# Incremental refresh runs at most this often (on the next question)
+RETRIEVAL_REFRESH_SECONDS = float(os.getenv("RETRIEVAL_REFRESH_SECONDS", "5"))
+# Full rebuild backstop for changes no timestamp or ORM event reveals (e.g. Core bulk upserts)
+RETRIEVAL_REBUILD_SECONDS = float(os.getenv("RETRIEVAL_REBUILD_SECONDS", "3600"))
+# Only recent activity logs are worth prompt space
+RETRIEVAL_ACTIVITY_DAYS = int(os.getenv("RETRIEVAL_ACTIVITY_DAYS", "30"))
+LOAD_CHUNK_SIZE = 5000
+
+# BM25 parameters (the usual defaults)
+K1, B = 1.2, 0.75
+# Terms in more than this share of documents only rescore existing candidates
+COMMON_TERM_FRACTION = 0.05
+# Hits scoring under this share of the best one are noise, not context
+MIN_RELATIVE_SCORE = 0.3
+
+_WORD = re.compile(r"[a-z0-9]+(?:[-_/.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    """Words plus the parts of compound IDs, so 'P-102' matches 'p-102', 'p' and '102'."""
+    tokens = []
+    for word in _WORD.findall((text or "").lower()):
+        tokens.append(word)
+        parts = re.split(r"[-_/.]", word)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; close enough for budgeting
+    return max(1, len(text) // 4)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+@dataclass
+class Source:
+    name: str
+    model: type
+    # Columns whose latest value marks "changed since"; rows at or past the watermark are re-read
+    change_columns: tuple
+    render: Callable
+    window: Optional[Callable] = None   # extra filter, e.g. recent rows only
+
+
+SOURCES = [
+    Source(
+        "batch", ProductionBatch, (ProductionBatch.created_at,),
+        lambda r: (f"Production batch {r.batch_number}: phase {r.phase}, material {r.material_used}, "
+                   f"{_fmt(r.quantity_used)} kg, shift {r.shift}, status {r.status}, "
+                   f"authorized by {r.authorized_by}, started {_fmt(r.created_at)}"),
+    ),
+    Source(
+        "qc", QCRecord, (QCRecord.created_at,),
+        lambda r: (f"QC record for batch {r.batch_id}: moisture {_fmt(r.moisture)}%, purity {_fmt(r.purity)}%, "
+                   f"result {r.status}, tested {_fmt(r.created_at)}"),
+    ),
+    Source(
+        "inventory", Inventory, (Inventory.created_at, Inventory.dispatched_at),
+        lambda r: (f"Inventory batch {r.batch_no}: {r.product_name}, {_fmt(r.quantity_kg)} kg at "
+                   f"{r.storage_location}, status {r.status}, stored {_fmt(r.created_at)}, "
+                   f"dispatched {_fmt(r.dispatched_at)}"),
+    ),
+    Source(
+        "material", RawMaterialBatch, (RawMaterialBatch.received_date,),
+        lambda r: (f"Raw material {r.material_id} {r.material_name}: {_fmt(r.quantity_kg)} kg in stock, "
+                   f"supplier {r.supplier_name}, received {_fmt(r.received_date)}"),
+    ),
+    Source(
+        "activity", ActivityLog, (ActivityLog.created_at,),
+        lambda r: f"Activity at {_fmt(r.created_at)} by {r.user}: {r.message}",
+        window=lambda: ActivityLog.created_at >= datetime.now() - timedelta(days=RETRIEVAL_ACTIVITY_DAYS),
+    ),
+]
+SOURCES_BY_MODEL = {s.model: s for s in SOURCES}
+
+
+class RetrievalIndex:
+    """
+    In-memory BM25 inverted index over plant records, one document per row.
+    Kept current by incremental refreshes: rows at or past each source's
+    change-timestamp watermark, plus rows this process changed through the
+    ORM (status updates leave no timestamp behind).
+    """
+
+    def __init__(self, sources=SOURCES):
+        self.sources = sources
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._postings = {}     # term -> {doc_key: term frequency}
+        self._doc_terms = {}    # doc_key -> Counter of terms
+        self._doc_len = {}      # doc_key -> token count
+        self._text = {}         # doc_key -> rendered text
+        self._total_len = 0
+        self._watermarks = {}   # source name -> latest change timestamp seen
+        self._dirty = set()     # (source name, id) changed in this process, not yet re-read
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self.last_refresh_ms = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    # --- maintenance ---
+    def _put(self, key, text: str):
+        self._drop(key)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[key] = tf
+        length = sum(terms.values())
+        self._doc_terms[key] = terms
+        self._doc_len[key] = length
+        self._text[key] = text
+        self._total_len += length
+
+    def _drop(self, key):
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(key)
+        self._text.pop(key, None)
+
+    def _load(self, db: Session, source: Source, *criteria):
+        """Indexes matching rows in id order, chunk by chunk; returns the newest change timestamp."""
+        newest, last_id = None, 0
+        while True:
+            query = db.query(source.model).filter(source.model.id > last_id, *criteria)
+            if source.window is not None:
+                query = query.filter(source.window())
+            rows = query.order_by(source.model.id).limit(LOAD_CHUNK_SIZE).all()
+            with self._lock:
+                for row in rows:
+                    self._put((source.name, row.id), source.render(row))
+            for row in rows:
+                for column in source.change_columns:
+                    value = getattr(row, column.key)
+                    if value is not None and (newest is None or value > newest):
+                        newest = value
+            if len(rows) < LOAD_CHUNK_SIZE:
+                return newest
+            last_id = rows[-1].id
+
+    def rebuild(self):
+        db = ReadSessionLocal()
+        try:
+            with self._lock:
+                self._postings, self._doc_terms, self._doc_len, self._text = {}, {}, {}, {}
+                self._total_len = 0
+                self._dirty.clear()
+            for source in self.sources:
+                self._watermarks[source.name] = self._load(db, source)
+        finally:
+            db.close()
+        self._rebuilt_at = self._refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """Re-reads rows changed since the last refresh instead of everything."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        db = ReadSessionLocal()
+        try:
+            for source in self.sources:
+                watermark = self._watermarks.get(source.name)
+                if watermark is not None:
+                    # >= so rows sharing the watermark's second are not missed
+                    newest = self._load(db, source, or_(*[c >= watermark for c in source.change_columns]))
+                    if newest is not None and newest > watermark:
+                        self._watermarks[source.name] = newest
+                else:
+                    self._watermarks[source.name] = self._load(db, source)
+
+                ids = [row_id for name, row_id in dirty if name == source.name]
+                if ids:
+                    rows = {r.id: r for r in db.query(source.model).filter(source.model.id.in_(ids)).all()}
+                    with self._lock:
+                        for row_id in ids:
+                            if row_id in rows:
+                                self._put((source.name, row_id), source.render(rows[row_id]))
+                            else:
+                                self._drop((source.name, row_id))
+        finally:
+            db.close()
+        self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Called before a query; cheap when nothing is due."""
+        now = time.monotonic()
+        if self._rebuilt_at is not None and now - self._refreshed_at < RETRIEVAL_REFRESH_SECONDS:
+            return
+        # One refresher at a time; concurrent callers use the index as it is
+        if not self._refresh_lock.acquire(blocking=self._rebuilt_at is None):
+            return
+        try:
+            started = time.perf_counter()
+            if self._rebuilt_at is None or now - self._rebuilt_at > RETRIEVAL_REBUILD_SECONDS:
+                self.rebuild()
+            else:
+                self.refresh()
+            self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        finally:
+            self._refresh_lock.release()
+
+    def mark_dirty(self, keys):
+        with self._lock:
+            self._dirty.update(keys)
+
+    # --- queries ---
+    def search(self, query: str, k: int = 8) -> list:
+        """Top-k (score, source, id, text) by BM25."""
+        started = time.perf_counter()
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_len / n_docs
+            scores = Counter()
+            # Rarest terms first. Once they have found candidates, common terms
+            # ("batch", "status") only rescore those instead of walking postings
+            # that cover much of the index.
+            for term in sorted((t for t in terms if t in self._postings), key=lambda t: len(self._postings[t])):
+                docs = self._postings[term]
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                if scores and len(docs) > COMMON_TERM_FRACTION * n_docs:
+                    keys = [key for key in scores if key in docs]
+                else:
+                    keys = docs
+                for key in keys:
+                    tf = docs[key]
+                    norm = K1 * (1 - B + B * self._doc_len[key] / avgdl)
+                    scores[key] += idf * tf * (K1 + 1) / (tf + norm)
+            ranked = scores.most_common(k)
+            floor = ranked[0][1] * MIN_RELATIVE_SCORE if ranked else 0
+            top = [(round(score, 4), key[0], key[1], self._text[key]) for key, score in ranked if score >= floor]
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return top
+
+    def context(self, question: str, token_budget: int, k: int = 8) -> list:
+        """Best records for the prompt, in rank order, until the token budget is spent."""
+        chosen, used = [], 0
+        for score, source, row_id, text in self.search(question, k):
+            cost = estimate_tokens(text) + 2
+            if used + cost > token_budget:
+                continue
+            chosen.append(text)
+            used += cost
+        return chosen
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._doc_len),
+                "terms": len(self._postings),
+                "pending_changes": len(self._dirty),
+                "last_refresh_ms": round(self.last_refresh_ms, 2),
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0,
+                "age_seconds": round(time.monotonic() - self._rebuilt_at, 1) if self._rebuilt_at else None,
+            }
+
+
+retrieval_index = RetrievalIndex()
+
+
+# Rows this process inserts, updates or deletes through the ORM are re-read on
+# the next refresh. Collected at flush, applied only once the commit lands.
+PENDING_RETRIEVAL = "pending_retrieval_changes"
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    keys = session.info.setdefault(PENDING_RETRIEVAL, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = SOURCES_BY_MODEL.get(type(obj))
+        if source is not None and obj.id is not None:
+            keys.add((source.name, obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    keys = session.info.pop(PENDING_RETRIEVAL, None)
+    if keys:
+        retrieval_index.mark_dirty(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(PENDING_RETRIEVAL, None)
@@ -0,0 +1,313 @@
+# app/risk.py
+import os
+import threading
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, upsert
+from app.models.maintenance import MaintenanceRecord
+from app.telemetry import telemetry_store
+
+# Feature windows, in most recent readings per asset; each is scored and the worst wins,
+# so a short spike and a slow drift both show up. Must fit in TELEMETRY_RING_SIZE.
+RISK_WINDOWS = tuple(int(w) for w in os.getenv("RISK_WINDOWS", "120,1024").split(","))
+RISK_MIN_READINGS = int(os.getenv("RISK_MIN_READINGS", "8"))
+RISK_VIBRATION_LIMIT = float(os.getenv("RISK_VIBRATION_LIMIT", "1.2"))
+RISK_TEMPERATURE_LIMIT = float(os.getenv("RISK_TEMPERATURE_LIMIT", "90"))
+# A rising trend is charged for where it would be this far ahead
+RISK_TREND_HORIZON_MIN = float(os.getenv("RISK_TREND_HORIZON_MIN", "60"))
+# Scores reach MaintenanceRecord at most this often, and only when they moved
+RISK_PERSIST_SECONDS = float(os.getenv("RISK_PERSIST_SECONDS", "30"))
+RISK_PERSIST_MIN_CHANGE = 0.5
+# Running sums are rebuilt from the ring after this many readings, before float drift matters
+RISK_RESYNC_READINGS = 100_000
+CRITICAL_RISK = 75
+
+# One maintenance_history row per asset carries the engine's score
+RISK_RECORD_DESCRIPTION = "Automated risk assessment (telemetry)"
+
+# Sufficient statistics per (window, asset): count, sums of t, v (vibration),
+# c (temperature), their squares and cross products with t, and limit exceedances
+SUMS = ("n", "t", "tt", "v", "vv", "tv", "c", "cc", "tc", "x")
+FEATURES = ("readings", "vibration_mean", "vibration_std", "vibration_slope",
+            "temperature_mean", "temperature_std", "temperature_slope", "exceedances")
+REPORT_FEATURES = FEATURES + ("window",)
+
+
+def legacy_score(vibration, temperature) -> float:
+    """The single-reading formula, for assets with no telemetry history yet."""
+    return (vibration or 0.1) * 50 + (temperature or 25) * 0.2
+
+
+def _terms(minutes, vibration, temperature) -> dict:
+    exceeded = (vibration > RISK_VIBRATION_LIMIT) | (temperature > RISK_TEMPERATURE_LIMIT)
+    return {
+        "n": np.ones_like(minutes), "t": minutes, "tt": minutes * minutes,
+        "v": vibration, "vv": vibration * vibration, "tv": minutes * vibration,
+        "c": temperature, "cc": temperature * temperature, "tc": minutes * temperature,
+        "x": exceeded.astype(float),
+    }
+
+
+def features_from_sums(s: dict) -> dict:
+    """Rolling mean/std, least-squares slope (per minute) and its r² for every asset at once."""
+    n = np.maximum(s["n"], 1)
+    mean_t = s["t"] / n
+    s_tt = np.maximum(s["tt"] - n * mean_t ** 2, 0)
+    out = {"readings": s["n"], "exceedances": s["x"]}
+    for name, y, yy, ty in (("vibration", "v", "vv", "tv"), ("temperature", "c", "cc", "tc")):
+        mean = s[y] / n
+        s_yy = np.maximum(s[yy] - n * mean ** 2, 0)
+        s_ty = s[ty] - n * mean_t * mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = np.where(s_tt > 0, s_ty / s_tt, 0.0)
+            r2 = np.where((s_tt > 0) & (s_yy > 0), s_ty ** 2 / (s_tt * s_yy), 0.0)
+        out[f"{name}_mean"] = mean
+        out[f"{name}_std"] = np.sqrt(s_yy / n)
+        out[f"{name}_slope"] = slope
+        out[f"{name}_r2"] = r2
+    return out
+
+
+def score(f: dict) -> np.ndarray:
+    """
+    Level (the legacy formula on window means) + instability + projected
+    rise over the trend horizon, weighted by how well a line fits (so noise
+    does not extrapolate) + share of readings past the limits; 0-100.
+    """
+    level = f["vibration_mean"] * 50 + f["temperature_mean"] * 0.2
+    instability = f["vibration_std"] * 25 + f["temperature_std"] * 0.5
+    rise = (np.maximum(f["vibration_slope"], 0) * f["vibration_r2"] * 50
+            + np.maximum(f["temperature_slope"], 0) * f["temperature_r2"] * 0.2) * RISK_TREND_HORIZON_MIN
+    exceeded = f["exceedances"] / np.maximum(f["readings"], 1) * 30
+    return np.clip(level + instability + rise + exceeded, 0, 100)
+
+
+class RiskEngine:
+    """
+    Keeps running window sums per asset in fleet-wide arrays. New readings
+    are added and readings leaving each window subtracted (both read from the
+    telemetry ring buffers), so a refresh costs O(new readings); features and
+    scores are then computed for the whole fleet with array arithmetic.
+
+    The sums cover the stored history loaded at startup (load_history) plus
+    readings ingested by this worker process since, so scores
+    are consistent only when one process receives an asset's telemetry:
+    run telemetry ingest on a single worker (or pin each asset to one).
+    Written-back scores are upserted, so several writers cannot duplicate
+    an asset's risk record, but the last one to write wins.
+    """
+
+    def __init__(self, store=telemetry_store, windows=RISK_WINDOWS):
+        self.store = store
+        self.windows = windows
+        self._lock = threading.Lock()
+        self._slots = {}        # equipment_id -> row in the arrays below
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._sums = np.zeros((len(windows), len(SUMS), 0))
+        self._end = np.zeros(0, dtype=np.int64)       # buffer position the sums cover up to
+        self._synced = np.zeros(0, dtype=np.int64)    # position of the last full rebuild
+        self._origin = np.zeros(0)                    # epoch seconds that t is measured from
+        self._scores = np.zeros(0)
+        self._best = {}                               # feature -> array, for the worst window
+        self._persisted = {}    # equipment_id -> score last written
+        self._persisted_at = 0.0
+        self.readings_applied = 0
+        self.resyncs = 0
+        self.passes = 0
+        self.pass_seconds = 0.0
+
+    def _slot(self, equipment_id: int) -> int:
+        slot = self._slots.get(equipment_id)
+        if slot is None:
+            slot = self._slots[equipment_id] = len(self._slots)
+            if slot >= len(self._ids):
+                grow = max(64, len(self._ids))
+                self._ids = np.r_[self._ids, np.zeros(grow, dtype=np.int64)]
+                self._sums = np.concatenate((self._sums, np.zeros(self._sums.shape[:2] + (grow,))), axis=2)
+                self._end = np.r_[self._end, np.zeros(grow, dtype=np.int64)]
+                self._synced = np.r_[self._synced, np.zeros(grow, dtype=np.int64)]
+                self._origin = np.r_[self._origin, np.zeros(grow)]
+            self._ids[slot] = equipment_id
+        return slot
+
+    def _collect(self):
+        """Per window: (slot, sign, length, ts, vib, temp) pieces to apply, and slots to zero first."""
+        pieces = [[] for _ in self.windows]
+        resets = []
+        widest = max(self.windows)
+        for equipment_id, buffer in self.store.buffers.items():
+            slot = self._slot(equipment_id)
+            old, new = int(self._end[slot]), buffer.end
+            if old == new:
+                continue
+            # Rebuild from the ring when the sums are fresh, drifting, or the
+            # readings they would have to subtract have been overwritten
+            oldest_held = new - len(buffer)
+            full = (old == 0 or new - self._synced[slot] > RISK_RESYNC_READINGS
+                    or max(old - widest, 0) < oldest_held)
+            # One copy out of the ring covering every window's old and new span
+            base = max(new - widest, oldest_held) if full else max(old - widest, 0)
+            arrays = buffer.window(base, new)
+            if full:
+                resets.append(slot)
+                self._synced[slot] = new
+                self._origin[slot] = arrays[0][0]
+            for w, window in enumerate(self.windows):
+                if full:
+                    spans = ((max(new - window, base), new, 1.0),)
+                else:
+                    # Readings entering the window, and those pushed out of it
+                    spans = ((max(old, new - window), new, 1.0), (max(old - window, 0), min(old, new - window), -1.0))
+                for lo, hi, sign in spans:
+                    if hi > lo:
+                        pieces[w].append((slot, sign, hi - lo, *(a[lo - base:hi - base] for a in arrays)))
+            self._end[slot] = new
+        return pieces, resets
+
+    def refresh(self):
+        """Applies readings that arrived since the last refresh, then rescores the fleet."""
+        with self._lock:
+            with self.store._lock:
+                pieces, resets = self._collect()
+            if not any(pieces) and self.passes:
+                return
+            started = time.perf_counter()
+            n_slots = len(self._slots)
+            if resets:
+                self._sums[:, :, resets] = 0
+            for w, window_pieces in enumerate(pieces):
+                if not window_pieces:
+                    continue
+                slot_ids, signs, lengths = (np.array([p[k] for p in window_pieces]) for k in (0, 1, 2))
+                slots, signs = np.repeat(slot_ids, lengths), np.repeat(signs, lengths)
+                ts, vib, temp = (np.concatenate([p[k] for p in window_pieces]) for k in (3, 4, 5))
+                minutes = (ts - self._origin[slots]) / 60
+                for i, values in enumerate(_terms(minutes, vib, temp).values()):
+                    self._sums[w, i, :n_slots] += np.bincount(slots, weights=signs * values, minlength=n_slots)
+                self.readings_applied += len(ts)
+            self.resyncs += len(resets)
+
+            best_score, best = None, None
+            for w in range(len(self.windows)):
+                features = features_from_sums({name: self._sums[w, i, :n_slots] for i, name in enumerate(SUMS)})
+                scores = score(features)
+                if best is None:
+                    best_score, best = scores, {k: features[k] for k in FEATURES}
+                    best["window"] = np.full(n_slots, self.windows[w])
+                    continue
+                worse = scores > best_score
+                best_score = np.where(worse, scores, best_score)
+                for k in FEATURES:
+                    best[k] = np.where(worse, features[k], best[k])
+                best["window"] = np.where(worse, self.windows[w], best["window"])
+            self._scores, self._best = best_score, best
+            self.passes += 1
+            self.pass_seconds += time.perf_counter() - started
+
+    def scores(self) -> dict:
+        """{equipment_id: score} for assets with enough buffered readings."""
+        self.refresh()
+        with self._lock:
+            n_slots = len(self._slots)
+            ready = self._best["readings"] >= RISK_MIN_READINGS if n_slots else np.zeros(0, dtype=bool)
+            return dict(zip(self._ids[:n_slots][ready].tolist(), self._scores[ready].tolist()))
+
+    def report(self, assets) -> list:
+        """
+        Risk rows for (id, name, last_vibration, last_temp, persisted_score)
+        tuples. Assets without enough buffered readings keep their last
+        persisted engine score, or the legacy formula if they never had one.
+        """
+        self.refresh()
+        with self._lock:
+            n_slots = len(self._slots)
+            if n_slots:
+                ready = (self._best["readings"] >= RISK_MIN_READINGS).tolist()
+                scores = self._scores.tolist()
+                # Feature columns rounded once for the fleet, then transposed to rows
+                features = list(zip(*(
+                    np.round(self._best[k], 4).tolist() if k in FEATURES[1:-1] else self._best[k].astype(int).tolist()
+                    for k in REPORT_FEATURES
+                )))
+            slots = self._slots
+        results = []
+        for equipment_id, name, vibration, temperature, persisted in assets:
+            slot = slots.get(equipment_id)
+            if slot is not None and slot < n_slots and ready[slot]:
+                risk = scores[slot]
+                row = {"id": equipment_id, "name": name, "risk_score": round(risk, 1), "source": "telemetry",
+                       **dict(zip(REPORT_FEATURES, features[slot]))}
+            elif persisted is not None:
+                risk = persisted
+                row = {"id": equipment_id, "name": name, "risk_score": round(min(risk, 100), 1), "source": "persisted"}
+            else:
+                risk = legacy_score(vibration, temperature)
+                row = {"id": equipment_id, "name": name, "risk_score": round(min(risk, 100), 1), "source": "last_reading"}
+            row["status"] = "Critical" if risk > CRITICAL_RISK else "Stable"
+            results.append(row)
+        return results
+
+    def load_history(self) -> int:
+        """
+        Seeds the telemetry rings with each asset's stored readings, as many
+        as the widest window needs. Run at startup: without it a restarted
+        worker scores an asset from the few readings it has seen since, and
+        persist() would overwrite the stored score with that.
+        """
+        return self.store.load_history(max(self.windows))
+
+    def on_flush(self):
+        """Telemetry writer hook: fold in the new readings, write scores back when due."""
+        self.refresh()
+        self.persist()
+
+    def persist(self, force: bool = False):
+        """Writes scores that moved since the last write to each asset's risk record."""
+        if not force and time.monotonic() - self._persisted_at < RISK_PERSIST_SECONDS:
+            return
+        self._persisted_at = time.monotonic()
+        changed = {
+            equipment_id: round(risk, 2) for equipment_id, risk in self.scores().items()
+            if abs(risk - self._persisted.get(equipment_id, -100)) >= RISK_PERSIST_MIN_CHANGE
+        }
+        if not changed:
+            return
+        db = SessionLocal()
+        try:
+            self._write(db, changed)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Risk score write-back failed: {e}")
+            return
+        finally:
+            db.close()
+        self._persisted.update(changed)
+
+    def _write(self, db: Session, changed: dict):
+        # Keyed on (equipment_id, description), so the first write for an asset inserts and later ones update
+        db.execute(upsert(
+            db.get_bind(), MaintenanceRecord, ["equipment_id", "description"],
+            lambda current, incoming: {"failure_risk_score": incoming["failure_risk_score"]}
+        ), [
+            {"equipment_id": e, "description": RISK_RECORD_DESCRIPTION, "failure_risk_score": s}
+            for e, s in changed.items()
+        ])
+
+    def stats(self) -> dict:
+        return {
+            "windows": list(self.windows),
+            "assets": len(self._slots),
+            "readings_applied": self.readings_applied,
+            "resyncs": self.resyncs,
+            "passes": self.passes,
+            "avg_pass_ms": round(self.pass_seconds / self.passes * 1000, 3) if self.passes else 0,
+            "persisted": len(self._persisted),
+        }
+
+
+risk_engine = RiskEngine()
+# Sums are kept current and scores written back from the telemetry writer
+# thread, right after new readings land, so reports seldom have work to do
+telemetry_store.after_flush.append(risk_engine.on_flush)
@@ -1,10 +1,18 @@
+import json
 import os
+import re
+import time
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from groq import Groq
 from dotenv import load_dotenv
 from app import database, models
+from app.cache import TTLCache, cached
+from app.llm import make_llm
+from app.retrieval import retrieval_index
 
 # Load environment variables
 load_dotenv()
@@ -17,58 +25,162 @@ router = APIRouter(
 class AIQuery(BaseModel):
     question: str
 
-# Configure Groq
-API_KEY = os.getenv("GROQ_API_KEY")
-client = None
-if API_KEY:
-    try:
-        client = Groq(api_key=API_KEY)
-    except Exception as e:
-        print(f"Groq Config Error: {e}")
-else:
-    print("⚠️ WARNING: GROQ_API_KEY not found in .env file")
+# Configure the model client (Groq, or the offline stub with LLM_PROVIDER=stub)
+client = make_llm()
 
-@router.post("/ask")
-def ask_ai(query: AIQuery, db: Session = Depends(database.get_db)):
-    if not client:
-        raise HTTPException(status_code=500, detail="Groq API Key is missing or invalid.")
+# Plant records retrieved for the prompt: at most this many, within this many tokens
+AI_CONTEXT_TOP_K = int(os.getenv("AI_CONTEXT_TOP_K", "8"))
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "600"))
 
-    try:
-        # 1. FETCH PLANT CONTEXT (Make the AI smart about YOUR data)
-        active_batches = db.query(models.production.ProductionBatch).filter(
-            models.production.ProductionBatch.status == "ACTIVE"
-        ).count()
-        
-        pending_qc = db.query(models.production.ProductionBatch).filter(
-            models.production.ProductionBatch.status == "PENDING_QC"
-        ).count()
+# Answers keyed on (normalised question, plant status snapshot, retrieved records, provider)
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "300"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+answer_cache = TTLCache(max_entries=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL_SECONDS)
 
-        # 2. DEFINE SYSTEM PROMPT
-        system_content = f"""
+# Time-to-first-token and cache counters for /ai/stats
+ai_stats = {"requests": 0, "cache_hits": 0, "streams": 0, "errors": 0, "ttft_samples": 0, "ttft_ms_total": 0.0, "ttft_ms_max": 0.0}
+
+ProductionBatch = models.production.ProductionBatch
+
+@cached("production")
+async def _plant_status(db: AsyncSession) -> tuple:
+    """(active, pending_qc) from one grouped count, cached until the next production write."""
+    rows = (await db.execute(
+        select(ProductionBatch.status, func.count(ProductionBatch.id))
+        .where(ProductionBatch.status.in_(("ACTIVE", "PENDING_QC")))
+        .group_by(ProductionBatch.status)
+    )).all()
+    counts = dict(rows)
+    return counts.get("ACTIVE", 0), counts.get("PENDING_QC", 0)
+
+def _normalize(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+async def _records(question: str) -> tuple:
+    """Best-matching plant records for the question, after any due index refresh."""
+    # The refresh reads from the database, so it runs off the event loop
+    await run_in_threadpool(retrieval_index.ensure_fresh)
+    return tuple(retrieval_index.context(question, AI_CONTEXT_TOKEN_BUDGET, k=AI_CONTEXT_TOP_K))
+
+def _messages(question: str, status: tuple, records: tuple = ()) -> list:
+    active_batches, pending_qc = status
+    records_text = "\n".join(f"[{i}] {text}" for i, text in enumerate(records, 1)) or "(none matched)"
+    # 2. DEFINE SYSTEM PROMPT
+    system_content = f"""
         You are the 'MCC Intelligent Assistant'. 
         You have access to the Plant Data Management System (PDMS).
         Current Plant Status:
         - Active Production Batches: {active_batches}
         - Batches Waiting for QC: {pending_qc}
+
+        Relevant Plant Records (retrieved for this question; cite them when you use them):
+{records_text}
         
         Technical Knowledge: 
         MCC manufacturing involves Pre-treatment, Acid Hydrolysis, Washing, Spray Drying, and Milling.
         Standard pH for hydrolysis is usually 1.5 - 2.5. 
         Answer professionally and prioritize plant safety and quality standards.
         """
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": question}
+    ]
 
-        # 3. CALL GROQ (Llama 3.3)
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": query.question}
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.7,
-        )
+def _require_client():
+    if not client:
+        raise HTTPException(status_code=500, detail="Groq API Key is missing or invalid.")
 
-        return {"answer": chat_completion.choices[0].message.content}
+@router.post("/ask")
+async def ask_ai(query: AIQuery, db: AsyncSession = Depends(database.get_async_read_db)):
+    _require_client()
+    ai_stats["requests"] += 1
+
+    try:
+        # 1. FETCH PLANT CONTEXT (Make the AI smart about YOUR data)
+        status = await _plant_status(db=db)
+        records = await _records(query.question)
+        key = (_normalize(query.question), status, records, client.name)
+        answer = answer_cache.get(key)
+        if answer is not None:
+            ai_stats["cache_hits"] += 1
+            return {"answer": answer, "cached": True}
+
+        # 3. CALL THE MODEL (awaited; the event loop keeps serving other requests)
+        answer = await client.complete(_messages(query.question, status, records))
+        answer_cache.set(key, answer)
+        return {"answer": answer, "cached": False}
 
     except Exception as e:
+        ai_stats["errors"] += 1
         print(f"AI Router Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/ask/stream")
+async def ask_ai_stream(query: AIQuery, db: AsyncSession = Depends(database.get_async_read_db)):
+    """
+    Same answer as /ask, relayed as Server-Sent Events while the model
+    generates: 'token' events carry text, then one 'done' (or 'error').
+    """
+    _require_client()
+    ai_stats["requests"] += 1
+    ai_stats["streams"] += 1
+
+    status = await _plant_status(db=db)
+    records = await _records(query.question)
+    key = (_normalize(query.question), status, records, client.name)
+    cached_answer = answer_cache.get(key)
+    messages = _messages(query.question, status, records)
+
+    async def event_stream():
+        started = time.perf_counter()
+        if cached_answer is not None:
+            ai_stats["cache_hits"] += 1
+            yield _sse("token", {"text": cached_answer})
+            yield _sse("done", {"cached": True})
+            return
+
+        parts, ttft_ms = [], None
+        try:
+            async for token in client.stream(messages):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    ai_stats["ttft_samples"] += 1
+                    ai_stats["ttft_ms_total"] += ttft_ms
+                    ai_stats["ttft_ms_max"] = max(ai_stats["ttft_ms_max"], ttft_ms)
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            ai_stats["errors"] += 1
+            print(f"AI Stream Error: {e}")
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        # Only complete answers are cached; a client that disconnects mid-stream caches nothing
+        answer_cache.set(key, "".join(parts))
+        yield _sse("done", {
+            "cached": False,
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stats")
+def get_ai_stats():
+    """Provider, answer-cache hit rate, time to first token and retrieval index health"""
+    samples = ai_stats["ttft_samples"]
+    return {
+        "provider": client.name if client else None,
+        **{k: v for k, v in ai_stats.items() if k not in ("ttft_ms_total", "ttft_ms_max")},
+        "ttft_ms_max": round(ai_stats["ttft_ms_max"], 1),
+        "ttft_ms_avg": round(ai_stats["ttft_ms_total"] / samples, 1) if samples else None,
+        "answer_cache": answer_cache.stats(),
+        "retrieval": retrieval_index.stats(),
+    }
@@ -1,20 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from .. import models, schemas, database, security
 from ..security import get_current_user
+from ..hashing import password_hasher, HasherBusy
+from ..pagination import PageParams, keyset_page_async
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # ✅ FIXED IMPORT NAME
 from .utils import log_activity 
 
 router = APIRouter(prefix="/auth", tags=["Phase 2: Authentication"])
 
+def _hasher_busy():
+    # Admission queue of the bcrypt pool is full (e.g. a shift-change login storm)
+    return HTTPException(status_code=503, detail="Authentication busy, please retry", headers={"Retry-After": "1"})
+
 @router.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    if db.query(models.User).filter(models.User.email == user.email).first():
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    if (await db.execute(select(models.User.id).where(models.User.email == user.email))).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_pw = security.get_password_hash(user.password)
+    try:
+        hashed_pw = await password_hasher.hash(user.password)
+    except HasherBusy:
+        raise _hasher_busy()
     new_user = models.User(
         username=user.username,
         email=user.email, 
@@ -25,23 +36,32 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db.add(new_user)
     
     # ✅ FIXED FUNCTION CALL
-    log_activity(db, f"New User Registered: {user.username}", "Admin", "info")
+    await db.run_sync(log_activity, f"New User Registered: {user.username}", "Admin", "info")
     
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return new_user
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = (await db.execute(select(models.User).where(models.User.email == form_data.username))).scalars().first()
     
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    matches, new_hash = False, None
+    if user:
+        try:
+            matches, new_hash = await password_hasher.verify(form_data.password, user.hashed_password)
+        except HasherBusy:
+            raise _hasher_busy()
+    if not matches:
         raise HTTPException(status_code=403, detail="Invalid Credentials")
+    if new_hash:
+        # Stored hash used an older BCRYPT_ROUNDS; upgrade it while we have the password
+        user.hashed_password = new_hash
     
     access_token = security.create_access_token(data={"sub": user.email, "role": user.role})
     
     # ✅ FIXED FUNCTION CALL
-    log_activity(db, "User Session Started (Login)", user.username, "success")
+    await db.run_sync(log_activity, "User Session Started (Login)", user.username, "success")
+    await db.commit()
     
     return {
         "access_token": access_token, 
@@ -50,9 +70,12 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         "username": user.username
     }
 
-@router.get("/users", response_model=list[schemas.UserResponse])
-def get_all_users(db: Session = Depends(database.get_db)):
-    return db.query(models.User).all()
+# Columns a client may see; hashed_password is never selectable
+USER_FIELDS = ["id", "username", "email", "role", "shift", "is_active"]
+
+@router.get("/users", response_model=list[schemas.UserOut], response_model_exclude_unset=True)
+async def get_all_users(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(database.get_async_read_db)):
+    return (await keyset_page_async(db, models.User, page, allowed_fields=USER_FIELDS)).send(response)
 
 @router.delete("/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(database.get_db), current_user = Depends(get_current_user)):
@@ -65,4 +88,14 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db), current_us
     
     db.delete(user_to_delete)
     db.commit()
-    return {"message": "User deleted"}
\ No newline at end of file
+    return {"message": "User deleted"}
+
+@router.get("/principal-cache-stats")
+def get_principal_cache_stats():
+    """Hit/miss counters for the token subject -> user cache behind get_current_user"""
+    return security.principal_cache.stats()
+
+@router.get("/hash-stats")
+def get_hash_stats():
+    """bcrypt pool load: in-flight jobs, admission rejects, rehashes and average hash time"""
+    return password_hasher.stats()
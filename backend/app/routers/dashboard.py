@@ -1,73 +1,215 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
+import asyncio
+import json
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from app.database import get_async_read_db, AsyncReadSessionLocal, pool_stats
+from app import schemas
+from typing import List
 from app.models.production import ProductionBatch
-from app.models.qc import QCRecord
-from app.models.inventory import Inventory
-from app import models # Ensure ActivityLog is defined in your models
+from app import models, counters # Ensure ActivityLog is defined in your models
+from app.cache import cached, response_cache, uncached
+from app.events import activity_broker, activity_event
+from app.audit import audit_writer
+from app.anomaly import anomaly_detector
+from app.pagination import PageParams, keyset_page_async
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 @router.get("/summary")
-def dashboard_summary(db: Session = Depends(get_db)):
+@cached("production", "qc", "inventory")
+async def dashboard_summary(db: AsyncSession = Depends(get_async_read_db)):
     try:
-        # 1. Production Triage
-        prod_active = db.query(ProductionBatch).filter(ProductionBatch.status == "ACTIVE").count()
-        prod_waiting = db.query(ProductionBatch).filter(ProductionBatch.status == "SCHEDULED").count()
-
-        # 2. QC Triage
-        qc_active = db.query(QCRecord).filter(QCRecord.status == "IN_PROGRESS").count()
-        qc_waiting = db.query(QCRecord).filter(QCRecord.status == "PENDING").count()
-
-        # 3. Inventory Triage
-        inv_active = db.query(Inventory).filter(Inventory.quantity_kg > 100).count()
-        inv_waiting = db.query(Inventory).filter(Inventory.quantity_kg < 50).count()
-
-        # 4. Dispatch Triage
-        disp_active = db.query(ProductionBatch).filter(ProductionBatch.status == "SHIPPED").count()
-        disp_waiting = db.query(ProductionBatch).filter(ProductionBatch.status == "COMPLETED").count()
-
-        return {
-            "production": {"active": prod_active, "waiting": prod_waiting},
-            "qc": {"active": qc_active, "waiting": qc_waiting},
-            "inventory": {"active": inv_active, "waiting": inv_waiting},
-            "dispatch": {"active": disp_active, "waiting": disp_waiting},
-        }
+        # One grouped aggregate per table, or the maintained counter rows
+        # when DASHBOARD_COUNTERS is enabled (see app/counters.py)
+        return await db.run_sync(counters.summary)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Upper bound on points per analytics response
+ANALYTICS_MAX_BUCKETS = 5000
+BUCKET_SPAN = {"hour": timedelta(hours=1), "day": timedelta(days=1), "month": timedelta(days=31)}
+BUCKET_LABEL = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def _local_naive(ts: datetime) -> datetime:
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
 @router.get("/analytics")
-def get_analytics(db: Session = Depends(get_db)):
+@cached("production")
+async def get_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: Literal["hour", "day", "month"] = "day",
+    group_by: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Output (kg) and batch counts per hour/day/month over [start, end),
+    optionally split by material, shift and/or phase (comma-separated
+    group_by). Defaults to the last 7 days, daily. Served from
+    production_rollup, so cost follows the range, not the batch volume.
+    """
+    # Buckets are naive server-local time; an offset-aware bound is converted to match
+    end = _local_naive(end) if end else datetime.now()
+    start = _local_naive(start) if start else end - timedelta(days=7)
+    dims = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    unknown = [d for d in dims if d not in counters.PRODUCTION_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / BUCKET_SPAN[granularity] > ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range is over {ANALYTICS_MAX_BUCKETS} {granularity} buckets; use a coarser granularity")
+
     try:
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        trend_data = db.query(
-            func.date(ProductionBatch.created_at).label('date'),
-            func.sum(ProductionBatch.quantity_used).label('total_kg')
-        ).filter(ProductionBatch.created_at >= seven_days_ago)\
-         .group_by(func.date(ProductionBatch.created_at)).all()
-
-        return [{"date": str(d.date), "output": float(d.total_kg or 0)} for d in trend_data]
+        rows = await db.run_sync(counters.production_series, start, end, granularity, dims)
+        return [
+            {
+                "date": bucket.strftime(BUCKET_LABEL[granularity]),
+                **dict(zip(dims, values)),
+                "output": float(total_kg or 0),
+                "batches": int(batches or 0),
+            }
+            for bucket, *values, total_kg, batches in rows
+        ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # THIS IS THE ENDPOINT YOUR DASHBOARD IS CALLING
-@router.get("/notifications")
-def get_notifications(db: Session = Depends(get_db)):
+@router.get("/notifications", response_model=List[schemas.ActivityLogOut])
+@cached("activity")
+async def get_notifications(db: AsyncSession = Depends(get_async_read_db)):
     try:
         # Try to get real logs from database
-        logs = db.query(models.ActivityLog).order_by(models.ActivityLog.created_at.desc()).limit(15).all()
+        logs = (await db.execute(
+            select(*models.ActivityLog.__table__.columns)
+            .order_by(models.ActivityLog.created_at.desc()).limit(15)
+        )).all()
         
         if not logs:
-            # Fallback mock data so your dashboard isn't empty during testing
-            return [
+            # Fallback mock data so your dashboard isn't empty during testing; never cached
+            return uncached([
                 {"message": "Batch P-102 moved to Quality Control", "user": "System", "type": "info", "created_at": datetime.now()},
                 {"message": "Inventory Alert: Low Raw Materials", "user": "Sensor", "type": "alert", "created_at": datetime.now() - timedelta(minutes=15)},
                 {"message": "Batch P-101 Dispatch Completed", "user": "Ganesh", "type": "success", "created_at": datetime.now() - timedelta(hours=1)},
-            ]
+            ])
         
         return logs
     except Exception:
-        # Return fallback if the table doesn't exist yet
-        return [{"message": "Real-time logging active", "user": "Admin", "type": "info", "created_at": datetime.now()}]
\ No newline at end of file
+        # Return fallback if the table doesn't exist yet; not cached, so the next call retries
+        return uncached([{"message": "Real-time logging active", "user": "Admin", "type": "info", "created_at": datetime.now()}])
+
+async def _with_read_session(endpoint):
+    # One session per query: an AsyncSession can only run one statement at a time
+    async with AsyncReadSessionLocal() as db:
+        return await endpoint(db=db)
+
+@router.get("/overview", response_model=schemas.DashboardOverview)
+async def get_overview():
+    """Summary, analytics and notifications in one round trip, queried concurrently"""
+    summary, analytics, notifications = await asyncio.gather(
+        _with_read_session(dashboard_summary),
+        _with_read_session(get_analytics),
+        _with_read_session(get_notifications),
+    )
+    return {"summary": summary, "analytics": analytics, "notifications": notifications}
+
+# Server-push replacement for polling /notifications
+STREAM_HEARTBEAT_SECONDS = 15
+REPLAY_LIMIT = 500
+
+async def _load_activity_since(last_id: int):
+    async with AsyncReadSessionLocal() as db:
+        logs = (await db.execute(
+            select(models.ActivityLog).where(models.ActivityLog.id > last_id)
+            .order_by(models.ActivityLog.id).limit(REPLAY_LIMIT)
+        )).scalars().all()
+        return [activity_event(log) for log in logs]
+
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: activity\ndata: {json.dumps(event)}\n\n"
+
+@router.get("/stream")
+async def stream_activity(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events feed of new activity logs. EventSource resends the
+    Last-Event-ID header on reconnect; missed events are replayed from the
+    in-memory buffer, or from the DB when the gap is older than the buffer.
+    """
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    # Subscribe before replaying so nothing published in between is lost
+    sub = activity_broker.subscribe()
+    backlog = []
+    if last_event_id is not None:
+        backlog = activity_broker.replay_since(last_event_id)
+        if backlog is None:
+            backlog = await _load_activity_since(last_event_id)
+
+    async def event_stream():
+        # Only events already replayed are duplicates. Ids are not a high-water mark:
+        # transactions commit (and publish) out of id order all the time.
+        replayed = {event["id"] for event in backlog}
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield _sse(event)
+            while not sub.overflowed:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["id"] in replayed:
+                    continue
+                yield _sse(event)
+        finally:
+            activity_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stream-stats")
+def get_stream_stats():
+    """Connected stream clients and events published by this worker"""
+    return activity_broker.stats()
+
+@router.get("/audit-stats")
+def get_audit_stats():
+    """Queue depth plus dropped/delayed counts for the buffered audit writer"""
+    return audit_writer.stats()
+
+@router.get("/pool-stats")
+def get_pool_stats():
+    """Connection pool checkout wait and saturation, per engine"""
+    return pool_stats()
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    """Hit/miss counters for the in-process response cache"""
+    return response_cache.stats()
+
+@router.get("/anomalies", response_model=List[schemas.AnomalyOut], response_model_exclude_unset=True)
+async def get_anomalies(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """Control-chart alarms raised at batch start and QC approval, newest first"""
+    return (await keyset_page_async(
+        db, models.Anomaly, page, sort_column=models.Anomaly.detected_at
+    )).send(response)
+
+@router.get("/anomaly-stats")
+def get_anomaly_stats():
+    """Baselines held in memory and values checked / flagged by this worker"""
+    return anomaly_detector.stats()
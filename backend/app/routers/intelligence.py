@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app import models, schemas, database
 
@@ -25,8 +27,8 @@ def predict_quality(data: schemas.MLPredictionInput):
     }
 
 @router.get("/notifications/{user_id}", response_model=List[schemas.NotificationOut])
-def get_notifications(user_id: int, db: Session = Depends(database.get_db)):
-    return db.query(models.Notification).filter(
+async def get_notifications(user_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return (await db.execute(select(models.Notification).where(
         models.Notification.user_id == user_id, 
         models.Notification.is_read == False
-    ).all()
\ No newline at end of file
+    ))).scalars().all()
\ No newline at end of file
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.inventory import Inventory
+from app import schemas, counters
+from typing import List, Optional
+from app.cache import cached, response_cache
+from app.pagination import PageParams, keyset_page_async
 from datetime import datetime
 
 # ✅ FIXED IMPORT: Matches the log_activity name in utils.py
@@ -9,17 +14,63 @@ from .utils import log_activity
 
 router = APIRouter(prefix="/inventory", tags=["Inventory & Logistics"])
 
-@router.get("/finished-goods")
-def get_inventory(db: Session = Depends(get_db)):
-    """Returns all items currently in the building (In Stock or Staging)"""
-    return db.query(Inventory).filter(Inventory.status != "Dispatched").all()
+# Everything not yet shipped; an IN list lets the status index skip dispatched history
+IN_BUILDING_STATUSES = ("In Stock", "In Dispatch Area")
+
+@router.get("/finished-goods", response_model=List[schemas.InventoryOut], response_model_exclude_unset=True)
+async def get_inventory(
+    response: Response,
+    page: PageParams = Depends(),
+    status: Optional[str] = Query(None, description="Only this one of the in-building statuses"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Returns items currently in the building (In Stock or In Dispatch Area), newest first"""
+    if status is not None and status not in IN_BUILDING_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of: {', '.join(IN_BUILDING_STATUSES)}")
+    return (await keyset_page_async(
+        db, Inventory, page, Inventory.status.in_([status] if status else IN_BUILDING_STATUSES),
+        sort_column=Inventory.created_at
+    )).send(response)
 
 @router.get("/summary")
-def get_inventory_summary(db: Session = Depends(get_db)):
-    """Only counts items actually sitting on the warehouse shelves"""
-    items = db.query(Inventory).filter(Inventory.status == "In Stock").all()
-    total_weight = sum(item.quantity_kg for item in items)
-    return {"total_kg": total_weight, "batch_count": len(items)}
+@cached("inventory")
+async def get_inventory_summary(db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Shelf totals (In Stock only) plus kg / batch breakdowns by location,
+    status and product. One grouped aggregate, or the maintained rollup
+    table when INVENTORY_ROLLUP is enabled; no Inventory rows are loaded.
+    """
+    by_location, by_status, by_product = {}, {}, {}
+    total_kg, batch_count = 0.0, 0
+
+    def add(bucket, key, kg, count):
+        entry = bucket.setdefault(key, {"total_kg": 0.0, "batch_count": 0})
+        entry["total_kg"] += kg
+        entry["batch_count"] += count
+
+    for location, status, product, kg, count in await db.run_sync(counters.inventory_groups):
+        kg = float(kg or 0)
+        add(by_status, status, kg, count)
+        if status == "In Stock":
+            total_kg += kg
+            batch_count += count
+            add(by_location, location or "Unassigned", kg, count)
+            add(by_product, product or "Unspecified", kg, count)
+
+    def as_list(bucket, label):
+        return [
+            {label: key, "total_kg": round(v["total_kg"], 3), "batch_count": v["batch_count"]}
+            for key, v in sorted(bucket.items())
+        ]
+
+    return {
+        "total_kg": round(total_kg, 3),
+        "batch_count": batch_count,
+        # Location and product splits cover shelf stock; the status split covers everything
+        "by_location": as_list(by_location, "storage_location"),
+        "by_product": as_list(by_product, "product_name"),
+        "by_status": as_list(by_status, "status"),
+    }
 
 @router.post("/move-to-dispatch/{batch_no}")
 def move_to_dispatch(batch_no: str, db: Session = Depends(get_db)):
@@ -28,12 +79,14 @@ def move_to_dispatch(batch_no: str, db: Session = Depends(get_db)):
     if not item:
         raise HTTPException(status_code=404, detail="Batch not found")
     
+    counters.inventory_status_changed(db, item, item.status, "In Dispatch Area")
     item.status = "In Dispatch Area" 
     
     # ✅ REAL LOG: Tracking Internal Movement
     log_activity(db, f"LOGISTICS: Batch {batch_no} moved to Dispatch Area", "Logistics_Staff", "info")
     
     db.commit()
+    response_cache.invalidate("inventory")
     return {"message": f"Batch {batch_no} moved to Dispatch Area for staging"}
 
 @router.post("/final-dispatch/{batch_no}")
@@ -43,6 +96,7 @@ def final_dispatch(batch_no: str, db: Session = Depends(get_db)):
     if not item:
         raise HTTPException(status_code=404, detail="Batch not found")
     
+    counters.inventory_status_changed(db, item, item.status, "Dispatched")
     item.status = "Dispatched"
     item.dispatched_at = datetime.now() 
     
@@ -50,9 +104,13 @@ def final_dispatch(batch_no: str, db: Session = Depends(get_db)):
     log_activity(db, f"DISPATCHED: Batch {batch_no} shipped to customer", "Dispatch_Head", "success")
     
     db.commit()
+    response_cache.invalidate("inventory")
     return {"message": f"Batch {batch_no} successfully sent to customer"}
 
-@router.get("/dispatch-history")
-def get_dispatch_history(db: Session = Depends(get_db)):
-    """Fetches all batches that have been officially shipped"""
-    return db.query(Inventory).filter(Inventory.status == "Dispatched").order_by(Inventory.dispatched_at.desc()).all()
\ No newline at end of file
+@router.get("/dispatch-history", response_model=List[schemas.InventoryOut], response_model_exclude_unset=True)
+async def get_dispatch_history(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """Fetches batches that have been officially shipped, most recent first"""
+    return (await keyset_page_async(
+        db, Inventory, page, Inventory.status == "Dispatched",
+        sort_column=Inventory.dispatched_at
+    )).send(response)
\ No newline at end of file
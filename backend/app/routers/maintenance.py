@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends
+import json
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.maintenance import Equipment
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db, get_read_db, get_async_read_db
+from app.models.maintenance import Equipment, MaintenanceRecord
+from app.pagination import PageParams, keyset_page_async
+from app.telemetry import telemetry_store, series
+from app.risk import risk_engine, RISK_RECORD_DESCRIPTION
 from pydantic import BaseModel
+from typing import List, Literal, Optional
+from app import schemas
 
 router = APIRouter(prefix="/maintenance", tags=["Predictive Maintenance"])
 
@@ -10,9 +20,20 @@ class EquipmentCreate(BaseModel):
     name: str
     type: str
 
-@router.get("/assets")
-def get_assets(db: Session = Depends(get_db)):
-    return db.query(Equipment).all()
+# Largest telemetry batch accepted in one request
+MAX_TELEMETRY_BATCH = 200_000
+TELEMETRY_FIELDS = ["equipment_id", "ts", "vibration", "temperature"]
+
+class TelemetryColumns(BaseModel):
+    """Columnar batch: parallel lists, ts in epoch seconds (UTC)"""
+    equipment_id: List[int]
+    ts: List[float]
+    vibration: List[float]
+    temperature: List[float]
+
+@router.get("/assets", response_model=List[schemas.EquipmentOut], response_model_exclude_unset=True)
+async def get_assets(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    return (await keyset_page_async(db, Equipment, page, sort_column=Equipment.created_at)).send(response)
 
 @router.post("/register")
 def register_asset(data: EquipmentCreate, db: Session = Depends(get_db)):
@@ -24,24 +45,94 @@ def register_asset(data: EquipmentCreate, db: Session = Depends(get_db)):
 
 @router.get(
     "/risk-report",
-    operation_id="get_maintenance_risk_report"
+    operation_id="get_maintenance_risk_report",
+    response_model=List[schemas.RiskReportItem],
+    response_model_exclude_unset=True
 )
-def get_maintenance_risk_report(db: Session = Depends(get_db)):
-    assets = db.query(Equipment).all()
-    results = []
+async def get_maintenance_risk_report(db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Fleet risk from rolling telemetry features (mean/std, trend, limit
+    exceedances), scored for all assets in one vectorized pass. Assets
+    without recent telemetry fall back to their stored score or last reading.
+    """
+    assets = (await db.execute(
+        select(
+            Equipment.id, Equipment.name, Equipment.last_vibration_reading, Equipment.last_temp_reading,
+            MaintenanceRecord.failure_risk_score
+        ).outerjoin(MaintenanceRecord, and_(
+            MaintenanceRecord.equipment_id == Equipment.id,
+            MaintenanceRecord.description == RISK_RECORD_DESCRIPTION
+        ))
+    )).all()
+    # Takes the engine's and the telemetry store's thread locks and does numpy work; keep it off the event loop
+    return await run_in_threadpool(risk_engine.report, assets)
+
+@router.get("/risk-stats")
+def get_risk_stats():
+    """Risk engine cache and recompute counters"""
+    return risk_engine.stats()
+
+# --- Telemetry ---
+def _ingest(columns):
+    if len(columns[0]) > MAX_TELEMETRY_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(columns[0])} readings; limit is {MAX_TELEMETRY_BATCH}")
+    return telemetry_store.ingest(*columns)
+
+@router.post("/telemetry/columnar")
+def ingest_telemetry_columnar(columns: TelemetryColumns):
+    """Buffers readings sent as {"equipment_id": [...], "ts": [...], "vibration": [...], "temperature": [...]}"""
+    values = [getattr(columns, f) for f in TELEMETRY_FIELDS]
+    if len({len(v) for v in values}) != 1:
+        raise HTTPException(status_code=422, detail="All telemetry columns must have the same length")
+    return _ingest(values)
+
+def _parse_telemetry_ndjson(body: bytes) -> list:
+    columns = [[] for _ in TELEMETRY_FIELDS]
+    for line_no, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                record = [record[f] for f in TELEMETRY_FIELDS]
+            if len(record) != len(TELEMETRY_FIELDS):
+                raise ValueError("expected 4 values")
+            columns[0].append(int(record[0]))
+            for column, value in zip(columns[1:], record[1:]):
+                column.append(float(value))
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Line {line_no}: {e}")
+    return columns
 
-    for asset in assets:
-        # Safe defaults for new machines
-        vibration = asset.last_vibration_reading or 0.1
-        temperature = asset.last_temp_reading or 25
+@router.post("/telemetry/ndjson")
+async def ingest_telemetry_ndjson(request: Request):
+    """
+    Buffers newline-delimited readings: one object with equipment_id, ts,
+    vibration and temperature, or an array in that order, per line.
+    """
+    body = await request.body()
+    return await run_in_threadpool(lambda: _ingest(_parse_telemetry_ndjson(body)))
 
-        risk = (vibration * 50) + (temperature * 0.2)
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    # Readings are stored as naive UTC; an offset-aware bound is converted to match
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts is not None and ts.tzinfo else ts
 
-        results.append({
-            "id": asset.id,
-            "name": asset.name,
-            "risk_score": min(round(risk, 1), 100),
-            "status": "Critical" if risk > 75 else "Stable"
-        })
+@router.get("/telemetry/{equipment_id}")
+def get_telemetry(
+    equipment_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Literal["auto", "raw", "1m", "1h"] = "auto",
+    hours: float = Query(24, gt=0, description="Range length when start is omitted"),
+    db: Session = Depends(get_read_db),
+):
+    """Readings (UTC) for one asset; longer ranges come from the 1-minute / 1-hour rollups"""
+    start, end = _naive_utc(start), _naive_utc(end)
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(hours=hours)
+    return series(db, equipment_id, start, end, resolution)
 
-    return results
+@router.get("/telemetry-stats")
+def get_telemetry_stats():
+    """Ring buffer and writer counters for telemetry ingestion"""
+    return telemetry_store.stats()
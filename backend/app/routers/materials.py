@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List
-from pydantic import BaseModel
-from app.database import get_db
+from typing import List, Optional
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db, get_async_read_db, SessionLocal, upsert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.materials import RawMaterialBatch
+from app.cache import response_cache
+from app import schemas
+from app.search_index import MaterialSearchIndex
 
 router = APIRouter(prefix="/materials", tags=["Material Master"])
 
@@ -13,17 +21,54 @@ class MaterialEntry(BaseModel):
     kg: float
     supplier: str
 
-@router.get("/search")
-def search_materials(query: str = "", db: Session = Depends(get_db)):
-    """Search by ID or Name. Returns all if query is empty."""
-    # Fix: Ensure empty search returns all data
-    if not query.strip():
-        return db.query(RawMaterialBatch).all()
-        
-    return db.query(RawMaterialBatch).filter(
-        (RawMaterialBatch.material_name.ilike(f"%{query}%")) | 
-        (RawMaterialBatch.material_id.ilike(f"%{query}%"))
-    ).all()
+def _load_index_keys(since=None):
+    db = SessionLocal()
+    try:
+        query = db.query(RawMaterialBatch.material_id, RawMaterialBatch.material_name, RawMaterialBatch.updated_at)
+        if since is not None:
+            query = query.filter(RawMaterialBatch.updated_at >= since)
+        return query.all()
+    finally:
+        db.close()
+
+# Trigram/prefix index over IDs and names; replaces ilike '%q%' table scans
+material_index = MaterialSearchIndex(_load_index_keys)
+
+@router.get("/search", response_model=List[schemas.MaterialOut])
+async def search_materials(
+    response: Response,
+    query: str = "",
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Ranked search by ID or Name (exact, prefix, word prefix, substring, fuzzy).
+    An empty query lists materials by name. Pages are capped by limit; pass
+    the X-Next-Cursor response header back as cursor for the next page.
+    """
+    try:
+        # Loading or refreshing the index is a blocking query; keep it off the event loop
+        page, next_cursor = await run_in_threadpool(material_index.page, query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Only the page's rows are read, by the unique material_id index, as plain Row tuples
+    ids = [material_id for _, _, material_id in page]
+    rows = {
+        row.material_id: row for row in (await db.execute(
+            select(*RawMaterialBatch.__table__.columns).where(RawMaterialBatch.material_id.in_(ids))
+        )).all()
+    } if ids else {}
+    return [rows[m] for m in ids if m in rows]
+
+@router.get("/autocomplete", response_model=List[schemas.MaterialSuggestion])
+def autocomplete_materials(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """Type-ahead suggestions served from the in-memory index (no DB query)."""
+    page, _ = material_index.page(q, limit)
+    return [{"material_id": m, "material_name": name} for _, name, m in page]
 
 @router.post("/add")
 def add_material(data: MaterialEntry, db: Session = Depends(get_db)):
@@ -39,29 +84,157 @@ def add_material(data: MaterialEntry, db: Session = Depends(get_db)):
             supplier_name=data.supplier
         ))
     db.commit()
+    response_cache.invalidate("materials")
+    if not item:
+        material_index.upsert(data.material_id, data.name)
     return {"message": "Material Processed"}
 
+# --- BULK IMPORT PIPELINE ---
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+CSV_COLUMNS = ["material_id", "name", "kg", "supplier"]
+
+def _upsert_chunk(db: Session, entries: List[MaterialEntry]) -> int:
+    """
+    Set-based upsert of one chunk: a single INSERT that adds the quantity to
+    materials that already exist. Returns the number of distinct materials.
+    """
+    # Repeated IDs inside a chunk add up, exactly like sequential upserts would
+    merged = {}
+    for entry in entries:
+        row = merged.get(entry.material_id)
+        if row:
+            row["quantity_kg"] += entry.kg
+        else:
+            merged[entry.material_id] = {
+                "material_id": entry.material_id,
+                "material_name": entry.name,
+                "quantity_kg": entry.kg,
+                "supplier_name": entry.supplier,
+            }
+    db.execute(upsert(
+        db.get_bind(), RawMaterialBatch, ["material_id"],
+        # updated_at by hand: onupdate only fires for UPDATE statements
+        lambda current, incoming: {
+            "quantity_kg": current["quantity_kg"] + incoming["quantity_kg"],
+            "updated_at": func.now(),
+        }
+    ), list(merged.values()))
+    return len(merged)
+
 @router.post("/import-bulk")
 def import_bulk(data: List[MaterialEntry], db: Session = Depends(get_db)):
-    """Fixed: Iterates through the entire list to add all data."""
+    """Imports the whole list in one transaction, upserting chunk by chunk."""
     try:
-        for entry in data:
-            item = db.query(RawMaterialBatch).filter(RawMaterialBatch.material_id == entry.material_id).first()
-            if item:
-                item.quantity_kg += entry.kg
-            else:
-                db.add(RawMaterialBatch(
-                    material_id=entry.material_id,
-                    material_name=entry.name,
-                    quantity_kg=entry.kg,
-                    supplier_name=entry.supplier
-                ))
+        imported = 0
+        for start in range(0, len(data), IMPORT_CHUNK_SIZE):
+            imported += _upsert_chunk(db, data[start:start + IMPORT_CHUNK_SIZE])
         db.commit()
-        return {"message": f"Successfully imported {len(data)} items"}
+        response_cache.invalidate("materials")
+        # New materials reach the index through its updated_at refresh
+        material_index.refresh()
+        return {
+            "message": f"Successfully imported {len(data)} items",
+            "imported": imported
+        }
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_csv(stream):
+    """Yields (line_no, dict) per row; header row optional, columns as in CSV_COLUMNS."""
+    for line_no, cells in enumerate(csv.reader(stream), start=1):
+        if not cells or not any(c.strip() for c in cells):
+            continue
+        if line_no == 1 and cells[0].strip().lower() == "material_id":
+            continue
+        row = dict(zip(CSV_COLUMNS, (c.strip() for c in cells)))
+        if not row.get("supplier"):
+            row["supplier"] = "General"
+        yield line_no, row
+
+def _parse_ndjson(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if line.strip():
+            yield line_no, line
+
+class _ImportReport:
+    def __init__(self):
+        self.processed = self.imported = self.failed = 0
+        self.errors = []
+
+    def error(self, line_no: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+def _flush_chunk(db: Session, chunk, report: _ImportReport):
+    """Commits one chunk; if it fails, retries row by row to pin down the bad lines."""
+    def apply(entries):
+        imported = _upsert_chunk(db, entries)
+        db.commit()
+        report.imported += imported
+
+    try:
+        apply([entry for _, entry in chunk])
+        return
+    except Exception:
+        db.rollback()
+    for line_no, entry in chunk:
+        try:
+            apply([entry])
+        except Exception as e:
+            db.rollback()
+            report.error(line_no, str(getattr(e, "orig", e)))
+
+@router.post("/import-stream")
+def import_stream(file: UploadFile = File(...), format: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Streams a CSV (material_id,name,kg,supplier) or NDJSON manifest in
+    constant memory. Bad rows are reported by line number; the rest of the
+    file is still imported, committed chunk by chunk.
+    """
+    fmt = (format or "").lower()
+    if not fmt:
+        name = (file.filename or "").lower()
+        fmt = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = _parse_csv(stream) if fmt == "csv" else _parse_ndjson(stream)
+
+    report = _ImportReport()
+    chunk = []
+    for line_no, raw in rows:
+        report.processed += 1
+        try:
+            entry = MaterialEntry.model_validate_json(raw) if fmt == "ndjson" else MaterialEntry.model_validate(raw)
+        except ValidationError as e:
+            err = e.errors()[0]
+            field = ".".join(str(p) for p in err["loc"])
+            report.error(line_no, f"{field}: {err['msg']}" if field else err["msg"])
+            continue
+        chunk.append((line_no, entry))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _flush_chunk(db, chunk, report)
+            chunk = []
+    if chunk:
+        _flush_chunk(db, chunk, report)
+
+    response_cache.invalidate("materials")
+    material_index.refresh()
+    return report.as_dict()
+
 @router.put("/update/{m_id}")
 def update_material(m_id: str, data: MaterialEntry, db: Session = Depends(get_db)):
     item = db.query(RawMaterialBatch).filter(RawMaterialBatch.material_id == m_id).first()
@@ -71,6 +244,8 @@ def update_material(m_id: str, data: MaterialEntry, db: Session = Depends(get_db
     item.quantity_kg = data.kg
     item.supplier_name = data.supplier
     db.commit()
+    response_cache.invalidate("materials")
+    material_index.upsert(m_id, data.name)
     return {"message": "Update Successful"}
 
 @router.delete("/delete/{m_id}")
@@ -80,4 +255,6 @@ def delete_material(m_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Material not found")
     db.delete(item)
     db.commit()
+    response_cache.invalidate("materials")
+    material_index.remove(m_id)
     return {"message": "Deleted"}
\ No newline at end of file
@@ -1,35 +1,54 @@
+import json
+import os
 import pandas as pd
 import numpy as np
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
+from app.model_registry import ModelRegistry, MODEL_DIR
+from app.retraining import RetrainingJob
+from app.inference import MicroBatcher
+from app.cache import TTLCache
 
 router = APIRouter(prefix="/ml", tags=["Intelligence"])
 
 # --- 1. HISTORICAL TRAINING DATASET (Updated for MCC) ---
-# Training the model on Drying Time, Milling Speed, and pH
-data = {
+# Seed data for the very first model version; after that the model comes from
+# the registry on disk, so importing this module never trains anything.
+FEATURES = ['drying_time', 'milling_speed', 'acid_ph']
+SEED_DATA = {
     'drying_time':   [30, 45, 60, 75, 90, 100, 35, 50, 65, 80] * 10,
     'milling_speed': [1000, 1200, 1500, 1800, 2000, 2200, 1100, 1300, 1600, 1900] * 10,
     'acid_ph':       [4.5, 4.0, 3.5, 3.0, 2.5, 2.0, 4.2, 3.8, 3.2, 2.8] * 10,
     'quality':       [99, 97, 95, 88, 75, 60, 98, 96, 92, 84] * 10
 }
-df = pd.DataFrame(data)
 
-# --- 2. TRAIN THE MODEL ---
-X = df[['drying_time', 'milling_speed', 'acid_ph']]
-y = df['quality']
+# --- 2. TRAIN / LOAD THE MODEL ---
+def train_seed_model(registry: ModelRegistry):
+    """Trains the Drying/Milling/pH forest on the seed data and saves it as a version."""
+    df = pd.DataFrame(SEED_DATA)
+    X = df[FEATURES].to_numpy(dtype=float)
+    y = df['quality'].to_numpy(dtype=float)
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
 
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X_scaled, y)
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(X_scaled, y)
 
-print("✅ MCC Intelligence: Random Forest Model Trained on Drying/Milling/pH logic.")
+    version = registry.save(
+        scaler, model, X, y,
+        metrics={"train_r2": round(float(model.score(X_scaled, y)), 4)},
+        extra={"source": "seed"}
+    )
+    print(f"✅ MCC Intelligence: Random Forest seed model trained and saved as {version}.")
+
+registry = ModelRegistry(MODEL_DIR, FEATURES, bootstrap=train_seed_model)
+retraining_job = RetrainingJob(registry)
 
 # --- 3. UPDATED SCHEMAS (Must match Intelligence.jsx) ---
 class QualityInput(BaseModel):
@@ -37,38 +56,274 @@ class QualityInput(BaseModel):
     milling_speed: float
     acid_ph: float
 
+class QualityColumns(BaseModel):
+    """Columnar batch: one list per feature, all the same length"""
+    drying_time: List[float]
+    milling_speed: List[float]
+    acid_ph: List[float]
+
+class AxisRange(BaseModel):
+    min: float
+    max: float
+    steps: int = Field(ge=1, le=500)
+
+class WhatIfGrid(BaseModel):
+    """Parameter sweep for the what-if surface, e.g. 50 x 50 x 20 points"""
+    drying_time: AxisRange
+    milling_speed: AxisRange
+    acid_ph: AxisRange
+    # Points within this many score units of the best one form the optimal region
+    optimal_tolerance: float = Field(default=1.0, ge=0)
+
+# --- SCORING (shared by the single-row and batch endpoints) ---
+PASS_THRESHOLD = 85
+MAX_BATCH_ROWS = int(os.getenv("ML_MAX_BATCH_ROWS", "100000"))
+
+OPTIMAL_MSG = "Optimal parameters maintained."
+ACID_MSG = "High acidity detected. Risk of cellulose degradation. Adjust buffer."
+MILLING_MSG = "Milling speed excessive. Check particle size distribution (PSD)."
+DRYING_MSG = "Extended drying time may affect moisture content stability."
+
+def score_matrix(features: np.ndarray, bundle=None) -> np.ndarray:
+    """Scores an (n, 3) matrix in one scaler + forest pass."""
+    bundle = bundle or registry.get()
+    predictions = bundle.model.predict(bundle.scaler.transform(features))
+    return np.minimum(np.round(predictions, 1), 100.0)
+
+def recommend_matrix(features: np.ndarray) -> np.ndarray:
+    """Vectorised form of the pharma rules; first matching rule wins."""
+    drying, milling, ph = features[:, 0], features[:, 1], features[:, 2]
+    return np.select(
+        [ph < 3.0, milling > 1900, drying > 80],
+        [ACID_MSG, MILLING_MSG, DRYING_MSG],
+        default=OPTIMAL_MSG
+    )
+
+def score_rows(features: np.ndarray) -> list:
+    """Micro-batch predict_fn: (score, model_version) per row."""
+    bundle = registry.get()
+    return [(score, bundle.version) for score in score_matrix(features, bundle).tolist()]
+
+# Concurrent /predict-quality calls are coalesced into one forest pass on a
+# worker thread instead of each running sklearn on the event loop
+batcher = MicroBatcher(score_rows)
+
+def batch_response(features: np.ndarray) -> dict:
+    if features.shape[0] == 0:
+        return {"count": 0, "results": []}
+    if features.shape[0] > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ROWS} rows")
+    if not np.isfinite(features).all():
+        raise HTTPException(status_code=422, detail="All parameters must be finite numbers")
+
+    scores = score_matrix(features)
+    statuses = np.where(scores >= PASS_THRESHOLD, "PASS", "FAIL")
+    recommendations = recommend_matrix(features)
+    results = [
+        {"quality_score": score, "status": status, "recommendation": rec}
+        for score, status, rec in zip(scores.tolist(), statuses.tolist(), recommendations.tolist())
+    ]
+    return {"count": len(results), "results": results}
+
 # --- 4. ENDPOINT ---
 @router.post("/predict-quality")
 async def predict_quality(data: QualityInput):
-    try:
-        # Prepare and Scale Input using the NEW feature names
-        input_df = pd.DataFrame([[data.drying_time, data.milling_speed, data.acid_ph]], 
-                                columns=['drying_time', 'milling_speed', 'acid_ph'])
-        
-        input_scaled = scaler.transform(input_df)
+    # Prepare and Scale Input using the NEW feature names
+    row = [data.drying_time, data.milling_speed, data.acid_ph]
+    features = np.array([row], dtype=float)
+    # Same rule as batch_response; a NaN would score as noise, an inf fails the forest
+    if not np.isfinite(features).all():
+        raise HTTPException(status_code=422, detail="All parameters must be finite numbers")
 
-        # Predict
-        prediction = model.predict(input_scaled)[0]
-        final_score = min(round(float(prediction), 1), 100.0)
+    try:
+        # Predict (queued with any other in-flight requests)
+        final_score, model_version = await batcher.submit(row)
 
         # PHARMA LOGIC: Status and Recommendations
-        status = "PASS" if final_score >= 85 else "FAIL"
-        recommendation = "Optimal parameters maintained."
-        
-        if data.acid_ph < 3.0:
-            recommendation = "High acidity detected. Risk of cellulose degradation. Adjust buffer."
-        elif data.milling_speed > 1900:
-            recommendation = "Milling speed excessive. Check particle size distribution (PSD)."
-        elif data.drying_time > 80:
-            recommendation = "Extended drying time may affect moisture content stability."
+        status = "PASS" if final_score >= PASS_THRESHOLD else "FAIL"
+        recommendation = str(recommend_matrix(features)[0])
 
         return {
             "quality_score": final_score,
             "status": status,
             "recommendation": recommendation,
             "confidence": "97.8%",
+            "model_version": model_version,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         print(f"Prediction Error: {e}")
-        raise HTTPException(status_code=500, detail="Intelligence Engine Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Intelligence Engine Error")
+
+@router.get("/inference-stats")
+def inference_stats():
+    """Queue depth and batch-size histogram of the micro-batching executor"""
+    return batcher.stats()
+
+# --- 5. MODEL REGISTRY ---
+@router.get("/models")
+def list_models():
+    """All saved model versions with their metadata, and which one is live"""
+    return {"active": registry.active_version(), "versions": registry.versions()}
+
+@router.post("/models/{version}/activate")
+def activate_model(version: str):
+    """Hot-swaps the served model without restarting the API"""
+    try:
+        registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    return {"message": f"Model {version} is now active"}
+
+@router.post("/retrain")
+def retrain_model(incremental: bool = False):
+    """
+    Retrains on real QC outcomes in the background. The candidate is promoted
+    only if it beats the live model on a holdout; incremental=true trains on
+    rows added since the live version was built.
+    """
+    if not retraining_job.start(incremental=incremental):
+        raise HTTPException(status_code=409, detail="A retraining run is already in progress")
+    return {"message": "Retraining started", "incremental": incremental}
+
+@router.get("/retrain/status")
+def retrain_status():
+    return retraining_job.status()
+
+# --- 7. WHAT-IF SURFACE ---
+MAX_SURFACE_POINTS = int(os.getenv("ML_MAX_SURFACE_POINTS", "250000"))
+SURFACE_CHUNK_ROWS = 20000
+MAX_BOUNDARY_POINTS = 5000
+
+# Keyed by (model version, grid spec): a re-activated or retrained model never
+# serves a stale surface, and repeated views of the same grid are free
+surface_cache = TTLCache(max_entries=64, ttl=3600)
+
+def compute_surface(grid: WhatIfGrid, bundle) -> dict:
+    axes = [
+        np.linspace(axis.min, axis.max, axis.steps)
+        for axis in (grid.drying_time, grid.milling_speed, grid.acid_ph)
+    ]
+    shape = tuple(len(a) for a in axes)
+    total = int(np.prod(shape))
+
+    # Evaluate the flattened grid in fixed-size chunks to bound peak memory
+    scores = np.empty(total, dtype=float)
+    for start in range(0, total, SURFACE_CHUNK_ROWS):
+        idx = np.unravel_index(np.arange(start, min(start + SURFACE_CHUNK_ROWS, total)), shape)
+        chunk = np.column_stack([axes[i][idx[i]] for i in range(3)])
+        scores[start:start + len(chunk)] = score_matrix(chunk, bundle)
+    scores = scores.reshape(shape)
+
+    best = np.unravel_index(int(np.argmax(scores)), shape)
+    best_score = float(scores[best])
+    region = np.argwhere(scores >= best_score - grid.optimal_tolerance)
+
+    # A grid point is on the PASS/FAIL boundary when any neighbour along an
+    # axis lands on the other side of the threshold
+    passing = scores >= PASS_THRESHOLD
+    boundary = np.zeros(shape, dtype=bool)
+    for axis in range(3):
+        flips = np.diff(passing, axis=axis)
+        lower = [slice(None)] * 3
+        upper = [slice(None)] * 3
+        lower[axis] = slice(None, -1)
+        upper[axis] = slice(1, None)
+        boundary[tuple(lower)] |= flips
+        boundary[tuple(upper)] |= flips
+    boundary_idx = np.argwhere(boundary)
+
+    def params(indices):
+        return {name: round(float(axes[i][indices[i]]), 4) for i, name in enumerate(FEATURES)}
+
+    return {
+        "model_version": bundle.version,
+        "axes": {name: np.round(axes[i], 4).tolist() for i, name in enumerate(FEATURES)},
+        "shape": list(shape),
+        "surface": np.round(scores, 1).tolist(),
+        "optimum": {"quality_score": best_score, **params(best)},
+        "optimal_region": {
+            "points": int(len(region)),
+            "min_score": round(best_score - grid.optimal_tolerance, 1),
+            **{
+                name: {"min": round(float(axes[i][region[:, i].min()]), 4),
+                       "max": round(float(axes[i][region[:, i].max()]), 4)}
+                for i, name in enumerate(FEATURES)
+            },
+        },
+        "pass_threshold": PASS_THRESHOLD,
+        "pass_fraction": round(float(passing.mean()), 4),
+        "boundary": {
+            "points": int(len(boundary_idx)),
+            "truncated": len(boundary_idx) > MAX_BOUNDARY_POINTS,
+            "samples": [params(i) for i in boundary_idx[:MAX_BOUNDARY_POINTS]],
+        },
+    }
+
+@router.post("/what-if")
+def what_if_surface(grid: WhatIfGrid):
+    """
+    Evaluates the quality model over a parameter grid and returns the score
+    surface, the optimal operating region and the PASS/FAIL boundary.
+    """
+    total = grid.drying_time.steps * grid.milling_speed.steps * grid.acid_ph.steps
+    if total > MAX_SURFACE_POINTS:
+        raise HTTPException(status_code=413, detail=f"Grid has {total} points; limit is {MAX_SURFACE_POINTS}")
+
+    bundle = registry.get()
+    key = (bundle.version, grid.model_dump_json())
+    # The encoded body is cached, so a repeat view skips scoring and serialization
+    body = surface_cache.get(key)
+    cache_status = "HIT" if body is not None else "MISS"
+    if body is None:
+        body = json.dumps(compute_surface(grid, bundle))
+        surface_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": cache_status})
+
+# --- 6. BATCH ENDPOINTS (whole shift plans / historical batches in one call) ---
+@router.post("/predict-quality/batch")
+def predict_quality_batch(rows: List[QualityInput]):
+    """Scores a JSON array of parameter rows; results come back in input order."""
+    features = np.array(
+        [[r.drying_time, r.milling_speed, r.acid_ph] for r in rows], dtype=float
+    ).reshape(-1, len(FEATURES))
+    return batch_response(features)
+
+@router.post("/predict-quality/columnar")
+def predict_quality_columnar(columns: QualityColumns):
+    """Scores a columnar batch: {"drying_time": [...], "milling_speed": [...], "acid_ph": [...]}"""
+    lengths = {len(columns.drying_time), len(columns.milling_speed), len(columns.acid_ph)}
+    if len(lengths) != 1:
+        raise HTTPException(status_code=422, detail="All feature columns must have the same length")
+    features = np.column_stack([
+        np.asarray(columns.drying_time, dtype=float),
+        np.asarray(columns.milling_speed, dtype=float),
+        np.asarray(columns.acid_ph, dtype=float),
+    ])
+    return batch_response(features)
+
+def _parse_ndjson(body: bytes) -> np.ndarray:
+    rows = []
+    for line_no, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                record = [record[f] for f in FEATURES]
+            if len(record) != len(FEATURES):
+                raise ValueError("expected 3 values")
+            rows.append([float(v) for v in record])
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Line {line_no}: {e}")
+    return np.array(rows, dtype=float).reshape(-1, len(FEATURES))
+
+@router.post("/predict-quality/ndjson")
+async def predict_quality_ndjson(request: Request):
+    """
+    Scores newline-delimited JSON: one object with the three parameters,
+    or a [drying_time, milling_speed, acid_ph] array, per line.
+    """
+    body = await request.body()
+    # Parsing and the forest are CPU bound; keep them off the event loop
+    return await run_in_threadpool(lambda: batch_response(_parse_ndjson(body)))
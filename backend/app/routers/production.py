@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.production import ProductionBatch
+from app.database import get_db, get_async_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import counters, schemas
+from app.anomaly import anomaly_detector
+from app.cache import cached, response_cache
+from app.pagination import PageParams, keyset_page_async
+from app.models.production import ProductionBatch, BatchParameters
 from app.models.materials import RawMaterialBatch 
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional, List
 
 # ✅ FIXED IMPORT: Using relative import to find utils.py in the same folder
 from .utils import log_activity 
@@ -18,10 +24,22 @@ class ProductionStart(BaseModel):
     quantity_to_use: float
     authorized_by: str
     shift: str
+    # Optional process settings; recorded so QC outcomes can retrain the quality model
+    drying_time: Optional[float] = None
+    milling_speed: Optional[float] = None
+    acid_ph: Optional[float] = None
 
-@router.get("/active-batches")
-def get_active_batches(db: Session = Depends(get_db)):
-    return db.query(ProductionBatch).filter(ProductionBatch.status == "ACTIVE").all()
+@cached("production")
+async def _active_batches_page(limit: int, cursor, fields, db: AsyncSession):
+    page = PageParams(limit=limit, cursor=cursor, fields=fields)
+    return await keyset_page_async(
+        db, ProductionBatch, page, ProductionBatch.status == "ACTIVE",
+        sort_column=ProductionBatch.created_at
+    )
+
+@router.get("/active-batches", response_model=List[schemas.ProductionBatchOut], response_model_exclude_unset=True)
+async def get_active_batches(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    return (await _active_batches_page(limit=page.limit, cursor=page.cursor, fields=page.fields, db=db)).send(response)
 
 @router.post("/start-batch")
 def start_batch(data: ProductionStart, db: Session = Depends(get_db)):
@@ -44,11 +62,33 @@ def start_batch(data: ProductionStart, db: Session = Depends(get_db)):
         created_at=datetime.now()
     )
     db.add(new_batch)
+    counters.batch_status_changed(db, None, "ACTIVE")
+    counters.production_started(db, new_batch)
+
+    db.flush()
+    if None not in (data.drying_time, data.milling_speed, data.acid_ph):
+        db.add(BatchParameters(
+            batch_id=new_batch.id,
+            drying_time=data.drying_time,
+            milling_speed=data.milling_speed,
+            acid_ph=data.acid_ph
+        ))
     
     # ✅ REAL LOG: Tracking Start Activity
     log_activity(db, f"Production Started: Batch {data.batch_number} ({data.phase})", data.authorized_by, "info")
+
+    # Charted against this material's and this shift's history; rows commit with the batch
+    anomalies = anomaly_detector.observe(db, new_batch.id, data.raw_material_name, data.shift, {
+        "quantity_used": data.quantity_to_use,
+        "drying_time": data.drying_time,
+        "milling_speed": data.milling_speed,
+        "acid_ph": data.acid_ph,
+    })
+    for anomaly in anomalies:
+        log_activity(db, f"ANOMALY ({anomaly.severity.value}): Batch {data.batch_number} {anomaly.description}", "Anomaly Detector", "warning")
     
     db.commit()
+    response_cache.invalidate("production", "materials")
     return {"message": "Started"}
 
 @router.post("/end-batch/{batch_id}")
@@ -57,10 +97,12 @@ def end_batch(batch_id: int, db: Session = Depends(get_db)):
     if not batch:
         raise HTTPException(status_code=404, detail="Not found")
     
+    counters.batch_status_changed(db, batch.status, "PENDING_QC")
     batch.status = "PENDING_QC" 
     
     # ✅ REAL LOG: Tracking Phase Completion
     log_activity(db, f"Batch {batch.batch_number} completed production and moved to QC", batch.authorized_by, "success")
     
     db.commit()
+    response_cache.invalidate("production")
     return {"message": "Moved to QC Lab"}
\ No newline at end of file
@@ -1,22 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_read_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import counters, schemas
+from app.anomaly import anomaly_detector
+from typing import List
+from app.cache import response_cache
+from app.pagination import PageParams, keyset_page_async
 from app.models.production import ProductionBatch
 from app.models.inventory import Inventory 
+from app.models.qc import QCRecord
 from pydantic import BaseModel
 # ✅ Fixed Import
 from .utils import log_activity 
 
 router = APIRouter(prefix="/qc", tags=["Quality Control"])
 
+# Release limits for finished MCC; a result outside either one is recorded as FAIL
+QC_MOISTURE_MAX = float(os.getenv("QC_MOISTURE_MAX", "7.0"))
+QC_PURITY_MIN = float(os.getenv("QC_PURITY_MIN", "97.0"))
+
+def qc_status(moisture: float, purity: float) -> str:
+    return "PASS" if moisture <= QC_MOISTURE_MAX and purity >= QC_PURITY_MIN else "FAIL"
+
 class QCApproval(BaseModel):
     moisture: float
     purity: float
     particle_size: float
 
-@router.get("/pending-approval")
-def get_pending_batches(db: Session = Depends(get_db)):
-    return db.query(ProductionBatch).filter(ProductionBatch.status == "PENDING_QC").all()
+@router.get("/pending-approval", response_model=List[schemas.ProductionBatchOut], response_model_exclude_unset=True)
+async def get_pending_batches(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    return (await keyset_page_async(
+        db, ProductionBatch, page, ProductionBatch.status == "PENDING_QC",
+        sort_column=ProductionBatch.created_at
+    )).send(response)
 
 @router.post("/approve-batch/{batch_id}")
 def approve_batch(batch_id: int, results: QCApproval, db: Session = Depends(get_db)):
@@ -25,6 +43,7 @@ def approve_batch(batch_id: int, results: QCApproval, db: Session = Depends(get_
         raise HTTPException(status_code=404, detail="Batch not found")
 
     try:
+        counters.batch_status_changed(db, batch.status, "APPROVED")
         batch.status = "APPROVED"
         # Move to Finished Goods Inventory
         finished_good = Inventory(
@@ -35,17 +54,37 @@ def approve_batch(batch_id: int, results: QCApproval, db: Session = Depends(get_
             status="In Stock"
         )
         db.add(finished_good)
+        counters.inventory_added(db, finished_good)
+
+        # Keep the lab result; it is the ground truth the quality model retrains on
+        status = qc_status(results.moisture, results.purity)
+        db.add(QCRecord(
+            batch_id=batch.batch_number,
+            moisture=results.moisture,
+            purity=results.purity,
+            status=status
+        ))
+        counters.qc_status_changed(db, None, status)
+
+        anomalies = anomaly_detector.observe(db, batch.id, batch.material_used, batch.shift, {
+            "moisture": results.moisture,
+            "purity": results.purity,
+        })
+        for anomaly in anomalies:
+            log_activity(db, f"ANOMALY ({anomaly.severity.value}): Batch {batch.batch_number} {anomaly.description}", "Anomaly Detector", "warning")
         
         # ✅ REAL LOG: Tracking Lab Approval
         log_activity(
             db, 
-            message=f"QC APPROVED: Batch {batch.batch_number} passed with {results.purity}% purity", 
+            message=f"QC APPROVED: Batch {batch.batch_number} {'passed' if status == 'PASS' else 'FAILED spec'} "
+                    f"with {results.purity}% purity, {results.moisture}% moisture",
             user="QC_Analyst", 
-            log_type="success"
+            log_type="success" if status == "PASS" else "warning"
         )
         
         db.commit()
-        return {"message": "Approved"}
+        response_cache.invalidate("production", "qc", "inventory")
+        return {"message": "Approved", "qc_status": status}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,14 +1,11 @@
 # app/routers/utils.py
 from sqlalchemy.orm import Session
-from .. import models 
-from datetime import datetime
+from ..audit import record
 
 def log_activity(db: Session, message: str, user: str, log_type: str = "info"):
-    new_log = models.ActivityLog(
-        message=message,
-        user=user,
-        type=log_type,
-        created_at=datetime.now()
-    )
-    db.add(new_log)
-    db.commit()
\ No newline at end of file
+    """
+    Records an audit entry. It joins the caller's transaction, so the caller
+    commits it together with the change it describes (or AUDIT_LOG_MODE=buffered
+    hands it to the background writer instead).
+    """
+    record(db, message, user, log_type)
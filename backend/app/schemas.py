@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional, List
 from datetime import datetime
 
@@ -13,6 +13,7 @@ class UserBase(BaseModel):
 
 class UserCreate(UserBase):
     password: str
+    shift: Optional[str] = None
 
 class UserResponse(UserBase):
     id: int
@@ -75,4 +76,114 @@ class DashboardSummary(BaseModel):
     plant_health: float
     production_rate: float 
     status: str
-    recent_batches: List[dict]
\ No newline at end of file
+    recent_batches: List[dict]
+
+
+# ==========================================
+# --- LIST RESPONSE SCHEMAS ---
+# ==========================================
+# Validated straight from SQLAlchemy Row tuples (column-level queries), never
+# from hydrated ORM entities. Every field is optional so a `fields=`
+# projection can omit columns; routes use response_model_exclude_unset=True.
+
+class RowSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductionBatchOut(RowSchema):
+    id: Optional[int] = None
+    batch_number: Optional[str] = None
+    phase: Optional[str] = None
+    material_used: Optional[str] = None
+    quantity_used: Optional[float] = None
+    shift: Optional[str] = None
+    status: Optional[str] = None
+    authorized_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class InventoryOut(RowSchema):
+    id: Optional[int] = None
+    batch_no: Optional[str] = None
+    product_name: Optional[str] = None
+    quantity_kg: Optional[float] = None
+    storage_location: Optional[str] = None
+    status: Optional[str] = None
+    dispatched_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+
+class EquipmentOut(RowSchema):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[str] = None
+    last_vibration_reading: Optional[float] = None
+    last_temp_reading: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+
+class UserOut(RowSchema):
+    id: Optional[int] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    shift: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class MaterialOut(RowSchema):
+    id: Optional[int] = None
+    material_id: Optional[str] = None
+    material_name: Optional[str] = None
+    quantity_kg: Optional[float] = None
+    supplier_name: Optional[str] = None
+    received_date: Optional[datetime] = None
+    purity_spec: Optional[float] = None
+    moisture_spec: Optional[float] = None
+
+
+class MaterialSuggestion(RowSchema):
+    material_id: str
+    material_name: str
+
+
+class ActivityLogOut(RowSchema):
+    id: Optional[int] = None
+    message: Optional[str] = None
+    user: Optional[str] = None
+    type: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class AnomalyOut(RowSchema):
+    id: Optional[int] = None
+    batch_id: Optional[int] = None
+    description: Optional[str] = None
+    severity: Optional[str] = None
+    detected_at: Optional[datetime] = None
+
+
+class DashboardOverview(BaseModel):
+    summary: dict
+    analytics: List[dict]
+    notifications: List[ActivityLogOut]
+
+
+class RiskReportItem(BaseModel):
+    id: int
+    name: str
+    risk_score: float
+    status: str
+    # Where the score came from: telemetry, persisted or last_reading
+    source: Optional[str] = None
+    # Rolling features of the window that produced the score (telemetry only)
+    window: Optional[int] = None
+    readings: Optional[int] = None
+    vibration_mean: Optional[float] = None
+    vibration_std: Optional[float] = None
+    vibration_slope: Optional[float] = None
+    temperature_mean: Optional[float] = None
+    temperature_std: Optional[float] = None
+    temperature_slope: Optional[float] = None
+    exceedances: Optional[int] = None
@@ -0,0 +1,257 @@
+# app/search_index.py
+import bisect
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from app.pagination import encode_cursor, decode_cursor
+
+# Other workers' inserts and renames reach this process's index by polling the
+# change timestamps this often; a query between polls serves the index as is
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "2"))
+# Rows changed this shortly before the newest one seen are read again, for
+# transactions that committed after a later timestamp was already visible
+SEARCH_INDEX_REFRESH_OVERLAP = timedelta(seconds=60)
+# Deletes leave no timestamp behind; a full reload this often drops them
+# (search results are re-read from the DB, so deleted rows never show there)
+SEARCH_INDEX_MAX_AGE = float(os.getenv("SEARCH_INDEX_MAX_AGE", "300"))
+# Ranked result lists kept per query, so paging through one costs no re-sort
+SEARCH_RANKED_CACHE = int(os.getenv("SEARCH_RANKED_CACHE", "64"))
+# Below this trigram overlap a non-substring candidate is not a match
+MIN_FUZZY_OVERLAP = 0.5
+
+# Rank tiers, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = 100, 80, 60, 40
+
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MaterialSearchIndex:
+    """
+    In-memory trigram + sorted-prefix index over material IDs and names.
+    Holds only (material_id, name); callers fetch full rows for the page
+    they return. Kept in sync by this worker's materials write paths and
+    by polling updated_at for other workers' changes. Loading is blocking
+    DB work: async callers run queries through a threadpool.
+    """
+
+    def __init__(self, loader: Callable):
+        # loader(since) -> iterable of (material_id, material_name, updated_at),
+        # every row when since is None, else rows with updated_at >= since
+        self.loader = loader
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()   # one loader query at a time
+        self._docs = {}        # material_id -> normalised name
+        self._names = {}       # material_id -> display name
+        self._postings = {}    # trigram -> set of material_ids
+        self._prefixes = []    # sorted (term, material_id)
+        self._ranked = OrderedDict()   # normalised query -> (results, sort keys)
+        self._built_at = None
+        self._checked_at = 0.0
+        self._watermark = None  # newest updated_at loaded
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.refreshed_rows = 0
+
+    # --- maintenance ---
+    def rebuild(self):
+        rows = list(self.loader(None))
+        with self._lock:
+            self._docs, self._names, self._postings, self._prefixes = {}, {}, {}, []
+            self._ranked.clear()
+            for material_id, name, _ in rows:
+                self._add(material_id, name)
+            self._prefixes.sort()
+            self._watermark = max((ts for *_, ts in rows if ts is not None), default=None)
+            self._built_at = self._checked_at = time.monotonic()
+            self.rebuilds += 1
+
+    def refresh(self):
+        """Folds in rows inserted or renamed since the last load, by updated_at."""
+        if self._built_at is None:
+            return   # first query will load everything anyway
+        since = self._watermark - SEARCH_INDEX_REFRESH_OVERLAP if self._watermark else datetime.min
+        rows = list(self.loader(since))
+        self.upsert_many((material_id, name) for material_id, name, _ in rows)
+        with self._lock:
+            stamps = [ts for *_, ts in rows if ts is not None]
+            if stamps:
+                self._watermark = max(stamps + [self._watermark] if self._watermark else stamps)
+            self._checked_at = time.monotonic()
+            self.refreshes += 1
+            self.refreshed_rows += len(rows)
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._built_at is not None and now - self._checked_at < SEARCH_INDEX_REFRESH_SECONDS:
+            return
+        # The first load is waited for; a later one is skipped while another
+        # request is already running it, and the current index served meanwhile
+        if not self._load_lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            now = time.monotonic()
+            if self._built_at is None or now - self._built_at > SEARCH_INDEX_MAX_AGE:
+                self.rebuild()
+            elif now - self._checked_at >= SEARCH_INDEX_REFRESH_SECONDS:
+                self.refresh()
+        finally:
+            self._load_lock.release()
+
+    def _terms(self, material_id: str, norm_name: str):
+        terms = {material_id.lower(), norm_name}
+        terms.update(norm_name.split())
+        return terms
+
+    def _add(self, material_id: str, name: str, keep_sorted: bool = False):
+        self._ranked.clear()
+        norm_name = _norm(name)
+        self._docs[material_id] = norm_name
+        self._names[material_id] = name
+        for gram in _trigrams(material_id.lower()) | _trigrams(norm_name):
+            self._postings.setdefault(gram, set()).add(material_id)
+        for term in self._terms(material_id, norm_name):
+            if keep_sorted:
+                bisect.insort(self._prefixes, (term, material_id))
+            else:
+                self._prefixes.append((term, material_id))
+
+    def _remove(self, material_id: str):
+        self._ranked.clear()
+        norm_name = self._docs.pop(material_id, None)
+        self._names.pop(material_id, None)
+        if norm_name is None:
+            return
+        for gram in _trigrams(material_id.lower()) | _trigrams(norm_name):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(material_id)
+                if not ids:
+                    del self._postings[gram]
+        for term in self._terms(material_id, norm_name):
+            i = bisect.bisect_left(self._prefixes, (term, material_id))
+            if i < len(self._prefixes) and self._prefixes[i] == (term, material_id):
+                del self._prefixes[i]
+
+    def upsert(self, material_id: str, name: str):
+        self.upsert_many([(material_id, name)])
+
+    def upsert_many(self, items):
+        with self._lock:
+            if self._built_at is None:
+                return   # first query will load everything anyway
+            for material_id, name in items:
+                if self._names.get(material_id) == name:
+                    continue
+                self._remove(material_id)
+                self._add(material_id, name, keep_sorted=True)
+
+    def remove(self, material_id: str):
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(material_id)
+
+    # --- queries ---
+    def _prefix_matches(self, q: str) -> set:
+        start = bisect.bisect_left(self._prefixes, (q, ""))
+        found = set()
+        for term, material_id in self._prefixes[start:]:
+            if not term.startswith(q):
+                break
+            found.add(material_id)
+        return found
+
+    def _score(self, material_id: str, q: str, overlap: float) -> float:
+        mid, name = material_id.lower(), self._docs[material_id]
+        if q in (mid, name):
+            return EXACT
+        if mid.startswith(q) or name.startswith(q):
+            return PREFIX
+        if any(word.startswith(q) for word in name.split()):
+            return WORD_PREFIX
+        if q in mid or q in name:
+            return SUBSTRING
+        return round(SUBSTRING * overlap / 2, 3)   # fuzzy, always below substring
+
+    def ranked(self, query: str) -> list:
+        """All matches as (score, name, material_id), best first."""
+        return self._ranked_with_keys(query)[0]
+
+    def _ranked_with_keys(self, query: str):
+        self._ensure_fresh()
+        q = _norm(query)
+        with self._lock:
+            hit = self._ranked.get(q)
+            if hit is not None:
+                self._ranked.move_to_end(q)
+                return hit
+            if not q:
+                results = sorted((0, self._names[m], m) for m in self._docs)
+            else:
+                results = self._rank(q)
+                results.sort(key=lambda r: (-r[0], r[1], r[2]))
+            # Pages bisect on these, so a cursor lands after its own row
+            entry = (results, [(-score, name, mid) for score, name, mid in results])
+            self._ranked[q] = entry
+            while len(self._ranked) > SEARCH_RANKED_CACHE:
+                self._ranked.popitem(last=False)
+            return entry
+
+    def _rank(self, q: str) -> list:
+        # Caller holds the lock
+        candidates = {m: 1.0 for m in self._prefix_matches(q)}
+        # One and two character queries are prefix-only; longer ones also
+        # get substring and fuzzy matches through the trigram postings
+        if len(q) >= 3:
+            # Unpadded grams: any document containing q holds every one of them
+            grams = {q[i:i + 3] for i in range(len(q) - 2)}
+            counts = Counter()
+            for gram in grams:
+                counts.update(self._postings.get(gram, ()))
+            for material_id, hits in counts.items():
+                overlap = hits / len(grams)
+                if overlap >= MIN_FUZZY_OVERLAP:
+                    candidates.setdefault(material_id, overlap)
+        return [
+            (self._score(m, q, overlap), self._names[m], m)
+            for m, overlap in candidates.items()
+        ]
+
+    def page(self, query: str, limit: int, cursor: Optional[str] = None):
+        """One page of ranked matches plus the cursor for the next page."""
+        results, keys = self._ranked_with_keys(query)
+        start = 0
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if not (isinstance(decoded, list) and len(decoded) == 3
+                    and isinstance(decoded[0], (int, float)) and not isinstance(decoded[0], bool)
+                    and isinstance(decoded[1], str) and isinstance(decoded[2], str)):
+                raise ValueError("Invalid cursor")
+            score, name, mid = decoded
+            start = bisect.bisect_right(keys, (-score, name, mid))
+        page = results[start:start + limit]
+        next_cursor = None
+        if start + limit < len(results) and page:
+            next_cursor = encode_cursor(list(page[-1]))
+        return page, next_cursor
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "trigrams": len(self._postings),
+                "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+                "rebuilds": self.rebuilds,
+                "refreshes": self.refreshes,
+                "refreshed_rows": self.refreshed_rows,
+                "cached_queries": len(self._ranked),
+            }
@@ -1,14 +1,19 @@
+import os
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from . import database, models
+from .cache import TTLCache
+from .hashing import pwd_context
 
-# 1. Setup Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 1. Password Hashing: pwd_context lives in app/hashing.py (cost from BCRYPT_ROUNDS).
+# Request handlers use hashing.password_hasher, which runs bcrypt off the event loop.
 
 # 2. JWT Configuration
 SECRET_KEY = "YOUR_SUPER_SECRET_KEY"  # Change this to a random string
@@ -17,6 +22,13 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# 3. Principal cache: token subject -> user row, so authenticated calls skip the users query.
+# User changes invalidate it in the worker that made them only; every other worker keeps
+# a deleted, deactivated or demoted user's principal for up to the TTL, so keep it short.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "5"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+principal_cache = TTLCache(max_entries=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
 # --- PASSWORD FUNCTIONS ---
 
 def verify_password(plain_password, hashed_password):
@@ -42,22 +54,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 # --- AUTH DEPENDENCY ---
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    """Decodes the token and fetches the current user from MySQL."""
-    credentials_exception = HTTPException(
+@dataclass
+class Principal:
+    """Detached snapshot of the authenticated user plus the token's claims."""
+    id: int
+    username: Optional[str]
+    email: str
+    role: Optional[str]
+    shift: Optional[str] = None
+    is_active: bool = True
+    claims: dict = field(default_factory=dict)
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str) -> dict:
+    """Verifies the signature and expiry; returns the claims."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    """Decodes the token and fetches the current user, from the principal cache when possible."""
+    claims = decode_token(token)
+    email: str = claims["sub"]
+
+    cached_user = principal_cache.get(email)
+    if cached_user is None:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None:
+            raise _credentials_exception()
+        cached_user = Principal(
+            id=user.id, username=user.username, email=user.email,
+            role=user.role.value if isinstance(user.role, models.RoleType) else user.role,
+            shift=user.shift, is_active=user.is_active is not False
+        )
+        # Never cache past the token's own expiry
+        ttl = min(PRINCIPAL_CACHE_TTL_SECONDS, max(claims.get("exp", 0) - time.time(), 0))
+        if ttl > 0:
+            principal_cache.set(email, cached_user, tags=(f"user:{user.id}",), ttl=ttl)
+
+    if not cached_user.is_active:
+        raise _credentials_exception()
+    return Principal(**{**cached_user.__dict__, "claims": claims})
+
+
+def forget_principal(user_id: int):
+    principal_cache.invalidate(f"user:{user_id}")
+
+
+# Drop cached principals whenever a user row changes or goes away, however it
+# happens (delete endpoint, deactivation, role edits). Once at flush time and
+# again after commit, so a request racing the commit cannot re-cache the old row.
+# This worker only; the short TTL bounds the others.
+PRINCIPAL_INVALIDATIONS = "principal_invalidations"
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    forget_principal(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(PRINCIPAL_INVALIDATIONS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed(session):
+    for user_id in session.info.pop(PRINCIPAL_INVALIDATIONS, ()):
+        forget_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop(PRINCIPAL_INVALIDATIONS, None)
\ No newline at end of file
@@ -0,0 +1,448 @@
+# app/telemetry.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, upsert, least, greatest
+from app.models.maintenance import Equipment, TelemetryReading, TelemetryRollup
+
+# Readings kept in memory per asset (also the window the risk features see)
+TELEMETRY_RING_SIZE = int(os.getenv("TELEMETRY_RING_SIZE", "4096"))
+TELEMETRY_FLUSH_INTERVAL_MS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_MS", "1000"))
+# Rows per multi-row INSERT
+TELEMETRY_INSERT_CHUNK = int(os.getenv("TELEMETRY_INSERT_CHUNK", "1000"))
+# Raw rows and 1-minute buckets age out; hourly buckets are kept for good
+TELEMETRY_RAW_RETENTION_DAYS = float(os.getenv("TELEMETRY_RAW_RETENTION_DAYS", "7"))
+TELEMETRY_MINUTE_RETENTION_DAYS = float(os.getenv("TELEMETRY_MINUTE_RETENTION_DAYS", "90"))
+PRUNE_INTERVAL_SECONDS = 3600
+# Accepted ts window around now; outside it is almost always a unit mix-up
+# (epoch milliseconds) or a sensor clock that was never set
+TELEMETRY_MAX_AGE_DAYS = float(os.getenv("TELEMETRY_MAX_AGE_DAYS", "30"))
+TELEMETRY_MAX_FUTURE_SECONDS = float(os.getenv("TELEMETRY_MAX_FUTURE_SECONDS", "300"))
+
+ROLLUP_RESOLUTIONS = (60, 3600)
+RESOLUTION_NAMES = {"1m": 60, "1h": 3600}
+
+
+class RingBuffer:
+    """
+    Fixed-size circular arrays (ts as epoch seconds UTC, vibration,
+    temperature) for one asset. Positions are counted over everything ever
+    appended, so "written to the DB up to here" is a single integer.
+    """
+
+    def __init__(self, capacity: int = TELEMETRY_RING_SIZE):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity)
+        self.vibration = np.zeros(capacity)
+        self.temperature = np.zeros(capacity)
+        self.end = 0       # readings ever appended
+        self.flushed = 0   # readings up to here are stored (or were overwritten unstored)
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    def extend(self, ts, vibration, temperature) -> int:
+        """Appends readings in order; returns how many unflushed ones were overwritten."""
+        n = len(ts)
+        if n > self.capacity:
+            # Only the newest capacity readings can be held anyway
+            skipped = n - self.capacity
+            ts, vibration, temperature = ts[skipped:], vibration[skipped:], temperature[skipped:]
+            self.end += skipped
+            n = self.capacity
+        pos = (self.end + np.arange(n)) % self.capacity
+        self.ts[pos] = ts
+        self.vibration[pos] = vibration
+        self.temperature[pos] = temperature
+        self.end += n
+        lost = max(0, self.end - self.capacity - self.flushed)
+        self.flushed += lost
+        return lost
+
+    def _slice(self, start: int, stop: int):
+        """Readings at positions [start, stop), which must still be held; copies."""
+        lo, hi = start % self.capacity, (stop - 1) % self.capacity + 1
+        if stop <= start:
+            return np.empty(0), np.empty(0), np.empty(0)
+        if lo < hi:
+            return self.ts[lo:hi].copy(), self.vibration[lo:hi].copy(), self.temperature[lo:hi].copy()
+        # Wraps past the end of the arrays
+        return tuple(np.concatenate((a[lo:], a[:hi])) for a in (self.ts, self.vibration, self.temperature))
+
+    def window(self, start: int, stop: int):
+        """Readings at positions [start, stop), clipped to what is still held, oldest first."""
+        return self._slice(max(start, self.end - len(self)), min(stop, self.end))
+
+    def latest(self, n: int = None):
+        """The newest n readings (all held ones by default), oldest first."""
+        held = len(self)
+        n = held if n is None else min(n, held)
+        return self._slice(self.end - n, self.end)
+
+    def unflushed(self):
+        """Copies of the readings not yet stored, and the position to pass to mark_flushed once they are."""
+        return self._slice(self.flushed, self.end), self.end
+
+    def mark_flushed(self, stop: int):
+        # extend() may already have moved past stop by overwriting unstored readings
+        self.flushed = max(self.flushed, stop)
+
+
+def _aggregate(equipment_ids, ts, vibration, temperature, resolution: int):
+    """Count/sum/min/max per (asset, bucket) for one resolution, without a Python loop over readings."""
+    buckets = np.floor(ts / resolution).astype(np.int64) * resolution
+    order = np.lexsort((buckets, equipment_ids))
+    eq, bk = equipment_ids[order], buckets[order]
+    starts = np.flatnonzero(np.r_[True, (eq[1:] != eq[:-1]) | (bk[1:] != bk[:-1])])
+    vib, temp = vibration[order], temperature[order]
+    return {
+        "equipment_id": eq[starts],
+        "bucket": bk[starts],
+        "count": np.diff(np.r_[starts, len(order)]),
+        "vibration_sum": np.add.reduceat(vib, starts),
+        "vibration_min": np.minimum.reduceat(vib, starts),
+        "vibration_max": np.maximum.reduceat(vib, starts),
+        "temperature_sum": np.add.reduceat(temp, starts),
+        "temperature_min": np.minimum.reduceat(temp, starts),
+        "temperature_max": np.maximum.reduceat(temp, starts),
+    }
+
+
+def _utc(epoch_seconds) -> datetime:
+    return datetime.utcfromtimestamp(float(epoch_seconds))
+
+
+def _epoch(utc: datetime) -> float:
+    return utc.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TelemetryStore:
+    """
+    Holds a ring buffer per asset and writes them out from one background
+    thread: raw readings as multi-row INSERTs, then 1-minute and 1-hour
+    rollups merged into equipment_telemetry_rollup, then the asset's last
+    readings on Equipment, all in one transaction. A failed flush leaves its
+    readings buffered for the next one. Readings not yet flushed are lost if
+    the process dies or the ring wraps; ingest returns once readings are
+    buffered, not once they are stored.
+    """
+
+    def __init__(self, capacity: int = TELEMETRY_RING_SIZE, interval_ms: float = TELEMETRY_FLUSH_INTERVAL_MS):
+        self.capacity = capacity
+        self.interval = interval_ms / 1000
+        self.buffers = {}
+        self._known = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pruned_at = 0.0
+        # Called on the writer thread after each flush (e.g. risk score write-back)
+        self.after_flush = []
+        self.ingested = 0
+        self.rejected = 0
+        self.overwritten = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flush_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.flush()
+            for hook in self.after_flush:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"⚠️ Telemetry after-flush hook failed: {e}")
+            if time.monotonic() - self._pruned_at > PRUNE_INTERVAL_SECONDS:
+                self.prune()
+
+    def _known_equipment(self, ids) -> set:
+        missing = set(ids) - self._known
+        if missing:
+            # New assets get registered at runtime; look again before rejecting
+            db = SessionLocal()
+            try:
+                found = {i for (i,) in db.query(Equipment.id).filter(Equipment.id.in_(missing)).all()}
+            finally:
+                db.close()
+            # Rebound rather than mutated, so concurrent readers keep a stable set
+            self._known = self._known | found
+        return self._known
+
+    def ingest(self, equipment_ids, ts, vibration, temperature) -> dict:
+        """Buffers a batch of readings given as parallel arrays; ts is epoch seconds UTC."""
+        equipment_ids = np.asarray(equipment_ids, dtype=np.int64)
+        ts = np.asarray(ts, dtype=float)
+        vibration = np.asarray(vibration, dtype=float)
+        temperature = np.asarray(temperature, dtype=float)
+
+        now = time.time()
+        valid = np.isfinite(ts) & np.isfinite(vibration) & np.isfinite(temperature)
+        valid &= (ts >= now - TELEMETRY_MAX_AGE_DAYS * 86400) & (ts <= now + TELEMETRY_MAX_FUTURE_SECONDS)
+        ids = np.unique(equipment_ids[valid])
+        known = self._known_equipment(ids.tolist())
+        valid &= np.isin(equipment_ids, np.fromiter(known, dtype=np.int64, count=len(known)))
+        rejected = int(len(ts) - valid.sum())
+
+        equipment_ids, ts = equipment_ids[valid], ts[valid]
+        vibration, temperature = vibration[valid], temperature[valid]
+        # Group by asset, keeping each asset's readings in time order
+        order = np.lexsort((ts, equipment_ids))
+        equipment_ids, ts = equipment_ids[order], ts[order]
+        vibration, temperature = vibration[order], temperature[order]
+        ids, starts = np.unique(equipment_ids, return_index=True)
+        bounds = np.r_[starts, len(equipment_ids)]
+
+        overwritten = 0
+        with self._lock:
+            for i, equipment_id in enumerate(ids.tolist()):
+                buffer = self.buffers.get(equipment_id)
+                if buffer is None:
+                    buffer = self.buffers[equipment_id] = RingBuffer(self.capacity)
+                lo, hi = bounds[i], bounds[i + 1]
+                overwritten += buffer.extend(ts[lo:hi], vibration[lo:hi], temperature[lo:hi])
+            self.ingested += len(ts)
+            self.rejected += rejected
+            self.overwritten += overwritten
+        self.start()
+        return {"accepted": int(len(ts)), "rejected": rejected, "assets": int(len(ids)), "overwritten": overwritten}
+
+    def _take(self):
+        """Unstored readings of every asset, plus where each buffer is stored up to once they commit."""
+        with self._lock:
+            parts, marks = [], {}
+            for equipment_id, buffer in self.buffers.items():
+                (ts, vib, temp), marks[equipment_id] = buffer.unflushed()
+                if len(ts):
+                    parts.append((np.full(len(ts), equipment_id, dtype=np.int64), ts, vib, temp))
+        if not parts:
+            return None, marks
+        return tuple(np.concatenate(column) for column in zip(*parts)), marks
+
+    def flush(self):
+        """Writes everything buffered since the last flush; safe to call from any thread."""
+        with self._flush_lock:
+            taken, marks = self._take()
+            if taken is None:
+                return
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                # Raw rows and rollups commit together, so they can never disagree
+                self._write_readings(db, *taken)
+                self._write_rollups(db, *taken)
+                self._write_last_readings(db, *taken)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.failed_flushes += 1
+                # Nothing is marked stored; the next flush retries these readings
+                print(f"⚠️ Telemetry flush of {len(taken[0])} readings failed: {e}")
+                return
+            finally:
+                db.close()
+            with self._lock:
+                for equipment_id, stop in marks.items():
+                    self.buffers[equipment_id].mark_flushed(stop)
+            self.flushes += 1
+            self.written += len(taken[0])
+            self.flush_seconds += time.perf_counter() - started
+
+    def _write_readings(self, db: Session, equipment_ids, ts, vibration, temperature):
+        for lo in range(0, len(ts), TELEMETRY_INSERT_CHUNK):
+            hi = lo + TELEMETRY_INSERT_CHUNK
+            rows = [
+                {"equipment_id": e, "ts": _utc(t), "vibration": v, "temperature": c}
+                for e, t, v, c in zip(equipment_ids[lo:hi].tolist(), ts[lo:hi].tolist(),
+                                      vibration[lo:hi].tolist(), temperature[lo:hi].tolist())
+            ]
+            # Compiled once and run as executemany, which the MySQL driver sends as
+            # one multi-row INSERT ... VALUES; an inline .values(rows) would be
+            # recompiled for every chunk
+            db.execute(insert(TelemetryReading.__table__), rows)
+
+    def _write_rollups(self, db: Session, equipment_ids, ts, vibration, temperature):
+        bind = db.get_bind()
+        # Merged in SQL, so workers flushing into the same bucket add up instead of overwriting
+        merge = upsert(bind, TelemetryRollup, ["equipment_id", "resolution", "bucket"], lambda current, incoming: {
+            "count": current["count"] + incoming["count"],
+            "vibration_sum": current["vibration_sum"] + incoming["vibration_sum"],
+            "vibration_min": least(bind, current["vibration_min"], incoming["vibration_min"]),
+            "vibration_max": greatest(bind, current["vibration_max"], incoming["vibration_max"]),
+            "temperature_sum": current["temperature_sum"] + incoming["temperature_sum"],
+            "temperature_min": least(bind, current["temperature_min"], incoming["temperature_min"]),
+            "temperature_max": greatest(bind, current["temperature_max"], incoming["temperature_max"]),
+        })
+        for resolution in ROLLUP_RESOLUTIONS:
+            agg = _aggregate(equipment_ids, ts, vibration, temperature, resolution)
+            columns = {name: values.tolist() for name, values in agg.items()}
+            rows = [
+                {**{name: values[i] for name, values in columns.items()}, "resolution": resolution, "bucket": _utc(bucket)}
+                for i, bucket in enumerate(columns["bucket"])
+            ]
+            for lo in range(0, len(rows), TELEMETRY_INSERT_CHUNK):
+                db.execute(merge, rows[lo:lo + TELEMETRY_INSERT_CHUNK])
+
+    def _write_last_readings(self, db: Session, equipment_ids, ts, vibration, temperature):
+        # Newest reading per asset: sort by (asset, ts) and take each group's last row
+        order = np.lexsort((ts, equipment_ids))
+        eq = equipment_ids[order]
+        last = order[np.flatnonzero(np.r_[eq[1:] != eq[:-1], True])]
+        db.execute(update(Equipment), [
+            {"id": e, "last_vibration_reading": v, "last_temp_reading": c}
+            for e, v, c in zip(equipment_ids[last].tolist(), vibration[last].tolist(), temperature[last].tolist())
+        ])
+
+    def load_history(self, readings: int = None) -> int:
+        """
+        Refills each asset's empty ring with its newest stored readings
+        (readings per asset, the whole ring by default), marked as already
+        stored. Assets with no raw rows left in retention get their newest
+        1-minute rollup means, one reading per bucket. Returns readings loaded.
+        """
+        readings = min(readings or self.capacity, self.capacity)
+        loaded = 0
+        db = SessionLocal()
+        try:
+            for (equipment_id,) in db.query(Equipment.id).all():
+                with self._lock:
+                    if equipment_id in self.buffers:
+                        continue
+                # Newest first along ix_equipment_telemetry_equipment_ts, then put back in time order
+                rows = db.query(TelemetryReading.ts, TelemetryReading.vibration, TelemetryReading.temperature).filter(
+                    TelemetryReading.equipment_id == equipment_id
+                ).order_by(TelemetryReading.ts.desc()).limit(readings).all()[::-1]
+                if not rows:
+                    rows = [
+                        (bucket, vib / count, temp / count) for bucket, count, vib, temp in db.query(
+                            TelemetryRollup.bucket, TelemetryRollup.count,
+                            TelemetryRollup.vibration_sum, TelemetryRollup.temperature_sum
+                        ).filter(
+                            TelemetryRollup.equipment_id == equipment_id, TelemetryRollup.resolution == 60,
+                        ).order_by(TelemetryRollup.bucket.desc()).limit(readings).all()[::-1] if count
+                    ]
+                if not rows:
+                    continue
+                ts = np.array([_epoch(r[0]) for r in rows])
+                vibration = np.array([r[1] for r in rows], dtype=float)
+                temperature = np.array([r[2] for r in rows], dtype=float)
+                with self._lock:
+                    if equipment_id in self.buffers:
+                        continue   # readings arrived meanwhile; they are newer
+                    buffer = self.buffers[equipment_id] = RingBuffer(self.capacity)
+                    buffer.extend(ts, vibration, temperature)
+                    buffer.mark_flushed(buffer.end)
+                    self._known = self._known | {equipment_id}
+                loaded += len(rows)
+        finally:
+            db.close()
+        return loaded
+
+    def prune(self):
+        """Deletes raw rows and 1-minute buckets past their retention."""
+        self._pruned_at = time.monotonic()
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.execute(delete(TelemetryReading).where(
+                TelemetryReading.ts < now - timedelta(days=TELEMETRY_RAW_RETENTION_DAYS)))
+            db.execute(delete(TelemetryRollup).where(
+                TelemetryRollup.resolution == 60,
+                TelemetryRollup.bucket < now - timedelta(days=TELEMETRY_MINUTE_RETENTION_DAYS)))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Telemetry prune failed: {e}")
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stops the writer and flushes what is still buffered."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(self.interval * 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(b.end - b.flushed for b in self.buffers.values())
+            return {
+                "assets": len(self.buffers),
+                "ring_size": self.capacity,
+                "ingested": self.ingested,
+                "rejected": self.rejected,
+                "overwritten_before_flush": self.overwritten,
+                "pending": pending,
+                "written": self.written,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "avg_flush_ms": round(self.flush_seconds / self.flushes * 1000, 2) if self.flushes else 0,
+            }
+
+
+telemetry_store = TelemetryStore()
+
+
+def pick_resolution(start: datetime, end: datetime, resolution: str) -> int:
+    """Seconds per point (0 = raw). 'auto' keeps a range to roughly a few thousand points."""
+    if resolution == "raw":
+        return 0
+    if resolution in RESOLUTION_NAMES:
+        return RESOLUTION_NAMES[resolution]
+    span = (end - start).total_seconds()
+    if span <= 2 * 3600:
+        return 0
+    if span <= 3 * 86400:
+        return 60
+    return 3600
+
+
+def series(db: Session, equipment_id: int, start: datetime, end: datetime, resolution: str = "auto") -> dict:
+    """
+    Columnar readings for one asset over [start, end): raw rows for short
+    ranges, rollup buckets (mean/min/max) for longer ones.
+    """
+    seconds = pick_resolution(start, end, resolution)
+    if seconds == 0:
+        rows = db.query(TelemetryReading.ts, TelemetryReading.vibration, TelemetryReading.temperature).filter(
+            TelemetryReading.equipment_id == equipment_id,
+            TelemetryReading.ts >= start, TelemetryReading.ts < end,
+        ).order_by(TelemetryReading.ts).all()
+        return {
+            "equipment_id": equipment_id,
+            "resolution": "raw",
+            "ts": [r[0] for r in rows],
+            "vibration": [r[1] for r in rows],
+            "temperature": [r[2] for r in rows],
+        }
+
+    rows = db.query(TelemetryRollup).filter(
+        TelemetryRollup.equipment_id == equipment_id,
+        TelemetryRollup.resolution == seconds,
+        TelemetryRollup.bucket >= start, TelemetryRollup.bucket < end,
+    ).order_by(TelemetryRollup.bucket).all()
+    return {
+        "equipment_id": equipment_id,
+        "resolution": next(name for name, s in RESOLUTION_NAMES.items() if s == seconds),
+        "ts": [r.bucket for r in rows],
+        "count": [r.count for r in rows],
+        "vibration_mean": [r.vibration_sum / r.count for r in rows],
+        "vibration_min": [r.vibration_min for r in rows],
+        "vibration_max": [r.vibration_max for r in rows],
+        "temperature_mean": [r.temperature_sum / r.count for r in rows],
+        "temperature_min": [r.temperature_min for r in rows],
+        "temperature_max": [r.temperature_max for r in rows],
+    }
@@ -0,0 +1,105 @@
+"""
+Login throughput, and the latency other endpoints see while a login storm
+is in flight. Runs the full app in-process on one event loop, against the
+database configured by DATABASE_URL (a scratch SQLite file works):
+
+    cd backend && DATABASE_URL=sqlite:///./bench.db python -m benchmarks.bench_login --logins 200
+
+--inline hashes on a 40-thread pool instead of the bcrypt process pool,
+which approximates the old in-request-thread behaviour for comparison.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import numpy as np
+from app.main import app, dispose_async_engines
+from app.database import SessionLocal
+from app.hashing import password_hasher, pwd_context
+from app import migrations, models
+
+PASSWORD = "bench-password"
+PROBES = ["/dashboard/summary", "/dashboard/pool-stats"]
+
+
+def seed_users(n: int):
+    migrations.upgrade()
+    db = SessionLocal()
+    try:
+        existing = {e for (e,) in db.query(models.User.email).filter(models.User.email.like("bench%")).all()}
+        hashed = pwd_context.hash(PASSWORD)
+        for i in range(n):
+            email = f"bench{i}@example.com"
+            if email not in existing:
+                db.add(models.User(username=f"bench{i}", email=email, hashed_password=hashed, role="Operator"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    a = np.array(samples) * 1000
+    return f"p50 {np.percentile(a, 50):7.1f}ms  p99 {np.percentile(a, 99):7.1f}ms  max {a.max():7.1f}ms"
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        login_times, probe_times, statuses = [], [], {}
+        done = asyncio.Event()
+
+        async def one_login(i):
+            started = time.perf_counter()
+            r = await client.post("/auth/login", data={"username": f"bench{i % args.users}@example.com", "password": PASSWORD})
+            login_times.append(time.perf_counter() - started)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                for path in PROBES:
+                    started = time.perf_counter()
+                    await client.get(path)
+                    probe_times.append(time.perf_counter() - started)
+                await asyncio.sleep(args.probe_interval)
+
+        # Warm the pool (process start-up is not what we are measuring)
+        await client.post("/auth/login", data={"username": "bench0@example.com", "password": PASSWORD})
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+    await dispose_async_engines()
+
+    print(f"mode: {'inline threads' if args.inline else 'process pool'}  "
+          f"bcrypt rounds {password_hasher.stats()['bcrypt_rounds']}  workers {password_hasher.workers}")
+    print(f"logins: {args.logins} in {elapsed:.2f}s  ({args.logins / elapsed:.1f}/s)  statuses {statuses}")
+    print(f"login latency   {percentiles(login_times)}")
+    print(f"other endpoints {percentiles(probe_times)}  ({len(probe_times)} requests)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--inline", action="store_true")
+    args = parser.parse_args()
+
+    seed_users(args.users)
+    if args.inline:
+        password_hasher.max_pending = 10 ** 9
+        password_hasher._pool = ThreadPoolExecutor(max_workers=40)
+    try:
+        asyncio.run(run(args))
+    finally:
+        password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Rows/sec of the per-row /ml/predict-quality endpoint versus the batch
+endpoints, measured in-process through the full FastAPI stack.
+
+    cd backend && python -m benchmarks.bench_predict --rows 5000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import ml
+
+
+def make_rows(n: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(30, 100, n),
+        rng.uniform(1000, 2200, n),
+        rng.uniform(2.0, 4.5, n),
+    ]).round(2)
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n:>7} rows  {elapsed:8.3f}s  {n / elapsed:12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--single-rows", type=int, default=200,
+                        help="rows sent through the per-row endpoint (it is slow)")
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(ml.router)
+    client = TestClient(app)
+
+    matrix = make_rows(args.rows)
+    objects = [dict(zip(ml.FEATURES, row)) for row in matrix.tolist()]
+    columns = {f: matrix[:, i].tolist() for i, f in enumerate(ml.FEATURES)}
+    ndjson = "\n".join(json.dumps(o) for o in objects)
+
+    def single():
+        for obj in objects[:args.single_rows]:
+            client.post("/ml/predict-quality", json=obj)
+
+    timed("per-row /predict-quality", args.single_rows, single)
+    timed("batch (JSON rows)", args.rows, lambda: client.post("/ml/predict-quality/batch", json=objects))
+    timed("columnar", args.rows, lambda: client.post("/ml/predict-quality/columnar", json=columns))
+    timed("ndjson", args.rows, lambda: client.post(
+        "/ml/predict-quality/ndjson", content=ndjson, headers={"Content-Type": "application/x-ndjson"}))
+
+    # Same answers in the same order as the per-row path
+    batch = client.post("/ml/predict-quality/batch", json=objects[:20]).json()["results"]
+    single_scores = [client.post("/ml/predict-quality", json=o).json()["quality_score"] for o in objects[:20]]
+    assert [r["quality_score"] for r in batch] == single_scores
+
+
+if __name__ == "__main__":
+    main()
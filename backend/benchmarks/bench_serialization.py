@@ -0,0 +1,92 @@
+"""
+Serialization cost of a large list response, before and after the fast path:
+
+  before: ORM entities -> jsonable_encoder -> stdlib json (FastAPI defaults)
+  after:  column-level Row tuples -> compiled TypeAdapter -> orjson
+
+Runs against an in-memory SQLite copy of the Inventory table.
+
+    cd backend && python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.inventory import Inventory
+from app.schemas import InventoryOut
+
+
+def seed(session, n: int):
+    now = datetime.now()
+    session.execute(Inventory.__table__.insert(), [
+        {
+            "batch_no": f"B-{i:06d}",
+            "product_name": "Microcrystalline Cellulose (MCC)",
+            "quantity_kg": 100 + i % 400,
+            "storage_location": f"Warehouse {'ABC'[i % 3]}",
+            "status": "In Stock",
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(n)
+    ])
+    session.commit()
+
+
+def best_of(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Inventory.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        seed(session, args.rows)
+
+    adapter = TypeAdapter(List[InventoryOut])
+
+    def before():
+        with Session() as session:
+            items = session.query(Inventory).all()
+            return json.dumps(jsonable_encoder(items)).encode()
+
+    def after():
+        with Session() as session:
+            rows = session.query(*Inventory.__table__.columns).all()
+            return orjson.dumps(adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json"))
+
+    with Session() as session:
+        entities = session.query(Inventory).all()
+        rows = session.query(*Inventory.__table__.columns).all()
+
+    results = [
+        ("query + serialize (before)", *best_of(before, args.repeat)),
+        ("query + serialize (after)", *best_of(after, args.repeat)),
+        ("serialize only (before)", *best_of(lambda: json.dumps(jsonable_encoder(entities)).encode(), args.repeat)),
+        ("serialize only (after)", *best_of(lambda: orjson.dumps(adapter.dump_python(
+            adapter.validate_python(rows, from_attributes=True), mode="json")), args.repeat)),
+    ]
+    for label, seconds, size in results:
+        print(f"{label:<28} {args.rows:>7} rows  {seconds * 1000:9.1f} ms  "
+              f"{args.rows / seconds:12,.0f} rows/sec  {size / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Query-plan regression check. Seeds a scratch database, drives every router
+endpoint through the full app, captures the SELECT / UPDATE / DELETE
+statements each request issues and EXPLAINs them. Exits non-zero when a
+statement reads a table with a full scan that ALLOWED_SCANS does not list,
+or when a router endpoint is missing from requests_for.
+
+    cd backend && DATABASE_URL=sqlite:///./explain.db python -m benchmarks.explain_queries --rows 20000
+
+The test suite runs it against a scratch SQLite file (tests/test_migrations.py).
+
+SQLite (EXPLAIN QUERY PLAN) and MySQL (EXPLAIN) are supported. It inserts
+rows, so point DATABASE_URL at a scratch database. SQLite plans without
+table statistics, so its verdict does not depend on --rows; MySQL plans
+from ANALYZE TABLE statistics, so give it a realistic --rows.
+
+A scan is accepted without an allowlist entry only when it is an ordered
+walk that stops early: the statement has ORDER BY and LIMIT and the plan
+needs no separate sort (keyset pages on an index or the primary key).
+"""
+import argparse
+import contextvars
+import io
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.database import engine, get_async_engine, SessionLocal
+from app.hashing import pwd_context
+from app import migrations, models
+from app.models.maintenance import Equipment, MaintenanceRecord, TelemetryReading
+from app.risk import RISK_RECORD_DESCRIPTION
+from app.routers import intelligence
+
+PASSWORD = "explain-password"
+
+# (endpoint, table) -> why a full read of that table is intended
+ALLOWED_SCANS = {
+    ("GET /dashboard/summary", "production_batches"): "status counts without DASHBOARD_COUNTERS read every row",
+    ("GET /dashboard/summary", "qc_records"): "status counts without DASHBOARD_COUNTERS read every row",
+    ("GET /dashboard/summary", "Inventory"): "over/under-stock counts without DASHBOARD_COUNTERS read every row",
+    ("GET /dashboard/overview", "production_batches"): "embeds /dashboard/summary",
+    ("GET /dashboard/overview", "qc_records"): "embeds /dashboard/summary",
+    ("GET /dashboard/overview", "Inventory"): "embeds /dashboard/summary",
+    ("GET /inventory/summary", "Inventory"): "grouped totals without INVENTORY_ROLLUP read every row",
+    ("GET /maintenance/risk-report", "equipment"): "reports on every asset",
+    ("GET /materials/search", "raw_material_batches"): "first search loads every id and name into the in-memory index",
+}
+
+# Routes whose queries are not request-scoped, with the reason
+SKIPPED_ROUTES = {
+    "GET /dashboard/stream": "server-sent events; the response never ends",
+    "POST /ml/retrain": "trains in a background thread and writes model files",
+}
+
+
+def seed(n: int, rng):
+    """n rows per hot table, with the skewed status mix production sees."""
+    migrations.upgrade()
+    db = SessionLocal()
+    try:
+        if db.query(models.ProductionBatch.id).first() is not None:
+            return
+        now = datetime.now()
+        ago = lambda i: now - timedelta(minutes=int(i) * 7)
+        hashed = pwd_context.hash(PASSWORD)
+        db.bulk_insert_mappings(models.User, [
+            dict(username=f"user{i}", email=f"user{i}@example.com", hashed_password=hashed, role="Operator", shift="A")
+            for i in range(n)
+        ])
+        db.bulk_insert_mappings(models.RawMaterialBatch, [
+            dict(material_id=f"RM-{i}", material_name=f"Material {i}", quantity_kg=1e6, supplier_name="Supplier", received_date=ago(i))
+            for i in range(n)
+        ])
+        statuses = rng.choice(["COMPLETED", "ACTIVE", "PENDING_QC"], n, p=[0.9, 0.05, 0.05])
+        db.bulk_insert_mappings(models.ProductionBatch, [
+            dict(batch_number=f"B-{i}", phase=["Hydrolysis", "Milling", "Drying"][i % 3], material_used=f"Material {i % 50}",
+                 quantity_used=float(rng.uniform(50, 500)), shift="ABC"[i % 3], status=status, authorized_by="seed", created_at=ago(i))
+            for i, status in enumerate(statuses)
+        ])
+        db.bulk_insert_mappings(models.QCRecord, [
+            dict(batch_id=str(i + 1), moisture=float(rng.normal(5, 0.3)), purity=float(rng.normal(98, 0.5)),
+                 status="PASS" if i % 10 else "FAIL", created_at=ago(i))
+            for i in range(n)
+        ])
+        stock = rng.choice(["Dispatched", "In Stock", "In Dispatch Area"], n, p=[0.8, 0.15, 0.05])
+        db.bulk_insert_mappings(models.Inventory, [
+            dict(batch_no=f"INV-{i}", quantity_kg=float(rng.uniform(20, 200)), storage_location=f"Rack {i % 40}", status=status,
+                 dispatched_at=ago(i) if status == "Dispatched" else None, created_at=ago(i))
+            for i, status in enumerate(stock)
+        ])
+        db.bulk_insert_mappings(models.ActivityLog, [
+            dict(message=f"Seed event {i}", user="seed", type="info", created_at=ago(i)) for i in range(n)
+        ])
+        db.bulk_insert_mappings(models.Anomaly, [
+            dict(batch_id=i + 1, description="Seed anomaly", severity=models.intelligence.SeverityLevel.LOW, detected_at=ago(i))
+            for i in range(n)
+        ])
+        db.bulk_insert_mappings(models.Notification, [
+            dict(user_id=i % max(1, n // 10) + 1, message=f"Seed notification {i}", is_read=bool(i % 4), created_at=ago(i))
+            for i in range(n)
+        ])
+        assets = max(10, n // 1000)
+        db.bulk_insert_mappings(Equipment, [dict(name=f"Asset {i}", type="Mill", created_at=ago(i)) for i in range(assets)])
+        db.bulk_insert_mappings(MaintenanceRecord, [
+            dict(equipment_id=i + 1, description=RISK_RECORD_DESCRIPTION, failure_risk_score=0.1) for i in range(assets)
+        ])
+        db.bulk_insert_mappings(TelemetryReading, [
+            dict(equipment_id=i % assets + 1, ts=now - timedelta(seconds=i), vibration=float(rng.normal(2, 0.2)),
+                 temperature=float(rng.normal(60, 2)))
+            for i in range(n)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def planner_statistics():
+    """
+    Fresh ANALYZE TABLE statistics on MySQL, so it picks plans as it would on
+    a real table. None at all on SQLite: with sqlite_stat1 a few thousand
+    rows make a scan the cheaper plan, and the check would pass or fail with
+    --rows. Without it the planner's choice depends only on schema and SQL.
+    """
+    with engine.connect() as conn:
+        if conn.dialect.name == "mysql":
+            for table in migrations.Base.metadata.tables:
+                conn.exec_driver_sql(f"ANALYZE TABLE `{table}`")
+        elif conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first():
+            conn.exec_driver_sql("DELETE FROM sqlite_stat1")
+        conn.commit()
+    # Open connections keep the statistics they loaded; plan on new ones
+    engine.dispose()
+
+
+def requests_for(token: str):
+    """(route, path, request kwargs) for every endpoint; route is 'METHOD /template'."""
+    auth = {"Authorization": f"Bearer {token}"}
+    quality = {"drying_time": 60, "milling_speed": 1500, "acid_ph": 3.0}
+    material = {"material_id": "RM-NEW", "name": "Material New", "kg": 100, "supplier": "Supplier"}
+    batch = {"batch_number": "B-EXPLAIN", "phase": "Hydrolysis", "raw_material_name": "Material 3", "quantity_to_use": 10,
+             "authorized_by": "explain", "shift": "A", **quality}
+    telemetry = {"equipment_id": [1, 2], "ts": [datetime.now().timestamp()] * 2, "vibration": [2.0, 2.1], "temperature": [60.0, 61.0]}
+    axis = lambda lo, hi: {"min": lo, "max": hi}
+    return [
+        ("GET /", "/", {}),
+        ("POST /auth/register", "/auth/register", {"json": {"username": "explain", "email": "explain@example.com", "password": PASSWORD}}),
+        ("POST /auth/login", "/auth/login", {"data": {"username": "user1@example.com", "password": PASSWORD}}),
+        ("GET /auth/users", "/auth/users", {}),
+        ("DELETE /auth/users/{user_id}", "/auth/users/5", {"headers": auth}),
+        ("GET /auth/principal-cache-stats", "/auth/principal-cache-stats", {}),
+        ("GET /auth/hash-stats", "/auth/hash-stats", {}),
+        ("GET /materials/search", "/materials/search?query=Material 12", {}),
+        ("GET /materials/search", "/materials/search", {}),
+        ("GET /materials/autocomplete", "/materials/autocomplete?q=Mat", {}),
+        ("POST /materials/add", "/materials/add", {"json": material}),
+        ("POST /materials/import-bulk", "/materials/import-bulk", {"json": [material, {**material, "material_id": "RM-NEW2", "name": "Material New 2"}]}),
+        ("POST /materials/import-stream", "/materials/import-stream",
+         {"files": {"file": ("m.csv", io.BytesIO(b"RM-7,Material 7,5,Supplier\nRM-NEW3,Material New 3,5,Supplier\n"), "text/csv")}}),
+        ("PUT /materials/update/{m_id}", "/materials/update/RM-8", {"json": {**material, "material_id": "RM-8", "name": "Material 8"}}),
+        ("DELETE /materials/delete/{m_id}", "/materials/delete/RM-9", {}),
+        ("GET /production/active-batches", "/production/active-batches", {}),
+        ("POST /production/start-batch", "/production/start-batch", {"json": batch}),
+        ("POST /production/end-batch/{batch_id}", "/production/end-batch/{active}", {}),
+        ("GET /qc/pending-approval", "/qc/pending-approval", {}),
+        ("POST /qc/approve-batch/{batch_id}", "/qc/approve-batch/{pending}", {"json": {"moisture": 5, "purity": 98, "particle_size": 50}}),
+        ("GET /inventory/finished-goods", "/inventory/finished-goods", {}),
+        ("GET /inventory/summary", "/inventory/summary", {}),
+        ("POST /inventory/move-to-dispatch/{batch_no}", "/inventory/move-to-dispatch/{in_stock}", {}),
+        ("POST /inventory/final-dispatch/{batch_no}", "/inventory/final-dispatch/{dispatch_area}", {}),
+        ("GET /inventory/dispatch-history", "/inventory/dispatch-history", {}),
+        ("GET /dashboard/summary", "/dashboard/summary", {}),
+        ("GET /dashboard/analytics", "/dashboard/analytics?granularity=hour&group_by=material,shift", {}),
+        ("GET /dashboard/notifications", "/dashboard/notifications", {}),
+        ("GET /dashboard/overview", "/dashboard/overview", {}),
+        ("GET /dashboard/stream-stats", "/dashboard/stream-stats", {}),
+        ("GET /dashboard/audit-stats", "/dashboard/audit-stats", {}),
+        ("GET /dashboard/pool-stats", "/dashboard/pool-stats", {}),
+        ("GET /dashboard/cache-stats", "/dashboard/cache-stats", {}),
+        ("GET /dashboard/anomalies", "/dashboard/anomalies", {}),
+        ("GET /dashboard/anomaly-stats", "/dashboard/anomaly-stats", {}),
+        ("POST /ml/predict-quality", "/ml/predict-quality", {"json": quality}),
+        ("GET /ml/inference-stats", "/ml/inference-stats", {}),
+        ("GET /ml/models", "/ml/models", {}),
+        ("POST /ml/models/{version}/activate", "/ml/models/no-such-version/activate", {}),
+        ("GET /ml/retrain/status", "/ml/retrain/status", {}),
+        ("POST /ml/what-if", "/ml/what-if", {"json": {"drying_time": axis(30, 100), "milling_speed": axis(1000, 2200), "acid_ph": axis(2, 4.5)}}),
+        ("POST /ml/predict-quality/batch", "/ml/predict-quality/batch", {"json": [quality] * 3}),
+        ("POST /ml/predict-quality/columnar", "/ml/predict-quality/columnar", {"json": {k: [v] * 3 for k, v in quality.items()}}),
+        ("POST /ml/predict-quality/ndjson", "/ml/predict-quality/ndjson",
+         {"content": "\n".join([json.dumps(quality)] * 3), "headers": {"Content-Type": "application/x-ndjson"}}),
+        ("GET /maintenance/assets", "/maintenance/assets", {}),
+        ("POST /maintenance/register", "/maintenance/register", {"json": {"name": "Asset Explain", "type": "Mill"}}),
+        ("GET /maintenance/risk-report", "/maintenance/risk-report", {}),
+        ("GET /maintenance/risk-stats", "/maintenance/risk-stats", {}),
+        ("POST /maintenance/telemetry/columnar", "/maintenance/telemetry/columnar", {"json": telemetry}),
+        ("POST /maintenance/telemetry/ndjson", "/maintenance/telemetry/ndjson",
+         {"content": json.dumps({k: v[0] for k, v in telemetry.items()}), "headers": {"Content-Type": "application/x-ndjson"}}),
+        ("GET /maintenance/telemetry/{equipment_id}", "/maintenance/telemetry/1", {}),
+        ("GET /maintenance/telemetry-stats", "/maintenance/telemetry-stats", {}),
+        ("POST /ai/ask", "/ai/ask", {"json": {"question": "Which batches of Material 3 are pending QC?"}}),
+        ("POST /ai/ask/stream", "/ai/ask/stream", {"json": {"question": "Status of batch B-12?"}}),
+        ("GET /ai/stats", "/ai/stats", {}),
+        ("GET /intelligence/notifications/{user_id}", "/intelligence/notifications/3", {}),
+        ("POST /intelligence/ml/predict-quality", "/intelligence/ml/predict-quality", {"json": quality}),
+    ]
+
+
+class StatementCapture:
+    """Statements issued while serving a request, tagged with the route being exercised."""
+
+    def __init__(self, *engines):
+        self.route = None
+        self.statements = {}   # (route, sql) -> parameters of the first occurrence
+        self._in_request = contextvars.ContextVar("in_request", default=False)
+        for eng in engines:
+            event.listen(eng, "before_cursor_execute", self._record)
+
+    def middleware(self):
+        async def mark(request, call_next):
+            token = self._in_request.set(True)
+            try:
+                return await call_next(request)
+            finally:
+                self._in_request.reset(token)
+        return mark
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not self._in_request.get() or executemany or self.route is None:
+            return
+        if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", statement, re.I):
+            self.statements.setdefault((self.route, statement), parameters)
+
+
+def explain(conn, sql: str, parameters) -> list:
+    """(table, access, scan, sorts) per table the plan reads."""
+    rows = []
+    if conn.dialect.name == "mysql":
+        for row in conn.exec_driver_sql(f"EXPLAIN {sql}", parameters).mappings():
+            if row["table"] is None or row["table"].startswith("<"):
+                continue
+            extra = row["Extra"] or ""
+            access = f"{row['type']} key={row['key']} rows~{row['rows']}"
+            rows.append((row["table"], access, row["type"] in ("ALL", "index"), "filesort" in extra))
+        return rows
+    plan = [detail for *_, detail in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()]
+    sorts = any("TEMP B-TREE" in detail for detail in plan)
+    for detail in plan:
+        match = re.match(r"(SCAN|SEARCH) (?:TABLE )?(\w+)", detail)
+        if match and not detail.startswith(("SCAN CONSTANT", "SCAN SUBQUERY")):
+            # An AUTOMATIC index is built per query from a full read of the table
+            rows.append((match.group(2), detail, match.group(1) == "SCAN" or "AUTOMATIC" in detail, sorts))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000, help="rows per seeded table")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not just failures")
+    args = parser.parse_args()
+
+    seed(args.rows, np.random.default_rng(11))
+    planner_statistics()
+    db = SessionLocal()
+    try:
+        ids = {
+            "active": db.query(models.ProductionBatch.id).filter(models.ProductionBatch.status == "ACTIVE").first()[0],
+            "pending": db.query(models.ProductionBatch.id).filter(models.ProductionBatch.status == "PENDING_QC").first()[0],
+            "in_stock": db.query(models.Inventory.batch_no).filter(models.Inventory.status == "In Stock").first()[0],
+            "dispatch_area": db.query(models.Inventory.batch_no).filter(models.Inventory.status == "In Dispatch Area").first()[0],
+        }
+    finally:
+        db.close()
+
+    # Not mounted by main (its /ml/predict-quality predates the ml router), but it ships
+    app.include_router(intelligence.router, prefix="/intelligence")
+    engines = {engine, get_async_engine().sync_engine, get_async_engine(replica=True).sync_engine}
+    capture = StatementCapture(*engines)
+    app.middleware("http")(capture.middleware())
+
+    routes = {f"{method} {route.path}" for route in app.routes
+              if getattr(route.endpoint, "__module__", "").startswith("app.routers") or route.path == "/"
+              for method in route.methods}
+    with TestClient(app) as client:
+        token = client.post("/auth/login", data={"username": "user0@example.com", "password": PASSWORD}).json()["access_token"]
+        exercised = set()
+        for route, path, kwargs in requests_for(token):
+            capture.route = route
+            method = route.split(" ", 1)[0]
+            response = client.request(method, path.format(**ids), **kwargs)
+            exercised.add(route)
+            if response.status_code >= 500:
+                print(f"!! {route} -> {response.status_code} {response.text[:200]}")
+            # Keyset pages filter differently once a cursor is passed; plan the second page too
+            cursor = response.headers.get("X-Next-Cursor")
+            if method == "GET" and cursor:
+                client.get(path.format(**ids), params={"cursor": cursor})
+            capture.route = None
+
+    missing = sorted(routes - exercised - set(SKIPPED_ROUTES))
+    failures = []
+    with engine.connect() as conn:
+        for (route, sql), parameters in sorted(capture.statements.items()):
+            has_limit = re.search(r"\bORDER BY\b.*\bLIMIT\b", sql, re.I | re.S) is not None
+            for table, access, scan, sorts in explain(conn, sql, parameters):
+                ordered_walk = scan and has_limit and not sorts
+                allowed = ALLOWED_SCANS.get((route, table))
+                bad = scan and not ordered_walk and allowed is None
+                if bad:
+                    failures.append((route, table, access, sql))
+                if bad or args.verbose:
+                    note = "FULL SCAN" if bad else (f"allowed: {allowed}" if scan and allowed else "ok")
+                    print(f"{route:<48} {table:<22} {access:<70} {note}")
+
+    print(f"\n{len(capture.statements)} statements from {len(exercised)} endpoints planned; "
+          f"{len(failures)} full scans, {len(missing)} endpoints not exercised")
+    for route in missing:
+        print(f"  not exercised: {route} (add it to requests_for or SKIPPED_ROUTES)")
+    for route, table, access, sql in failures:
+        print(f"\n{route}: {table} ({access})\n  {' '.join(sql.split())}")
+    sys.exit(1 if failures or missing else 0)
+
+
+if __name__ == "__main__":
+    main()
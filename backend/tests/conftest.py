@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+# The app reads its settings at import time, so point it at a throwaway SQLite
+# database and model store before anything under app/ is imported.
+_tmp = tempfile.mkdtemp(prefix="pdms-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'pdms.db')}"
+os.environ["MODEL_DIR"] = os.path.join(_tmp, "model_store")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the startup hooks: migrations, counter rebuilds, model load
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
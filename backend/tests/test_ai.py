@@ -0,0 +1,44 @@
+import json
+
+from app.models.materials import RawMaterialBatch
+from app.retrieval import RetrievalIndex
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_retrieval_finds_committed_rows_and_status_changes(client, db):
+    index = RetrievalIndex()
+    db.add(RawMaterialBatch(material_id="RET-RM", material_name="Retrieval Bagasse", quantity_kg=1000, supplier_name="Zephyr Mills"))
+    db.commit()
+    index.ensure_fresh()
+    assert index.search("zephyr bagasse")[0][1:3] == ("material", db.query(RawMaterialBatch.id).filter_by(material_id="RET-RM").scalar())
+
+    assert client.post("/production/start-batch", json={
+        "batch_number": "RET-B1", "phase": "Milling", "raw_material_name": "Retrieval Bagasse",
+        "quantity_to_use": 50, "authorized_by": "tests", "shift": "Shift A",
+    }).status_code == 200
+    index.refresh()
+    (_, source, _, text), *_ = index.search("RET-B1 bagasse")
+    assert source == "batch" and "status ACTIVE" in text
+    # Records that do not fit the prompt budget are left out rather than cut off
+    assert index.context("bagasse", token_budget=5) == []
+
+
+def test_stream_relays_tokens_then_serves_the_cached_answer(client):
+    question = {"question": "How many batches are waiting for QC?"}
+    first = _events(client.post("/ai/ask/stream", json=question).text)
+    assert [name for name, _ in first[-1:]] == ["done"]
+    assert first[-1][1]["cached"] is False and first[-1][1]["ttft_ms"] is not None
+    answer = "".join(data["text"] for name, data in first if name == "token")
+    assert answer.startswith("[stub] You asked: How many batches are waiting for QC?")
+
+    # Same question, differently spelled, same plant state: one cached token, no model call
+    again = _events(client.post("/ai/ask/stream", json={"question": "  how many batches are waiting for qc "}).text)
+    assert again == [("token", {"text": answer}), ("done", {"cached": True})]
+    assert client.post("/ai/ask", json=question).json() == {"answer": answer, "cached": True}
@@ -0,0 +1,57 @@
+import math
+
+from app.anomaly import ANOMALY_MIN_SAMPLES, Baseline, anomaly_detector
+from app.models.intelligence import SeverityLevel
+
+
+def _warm(values):
+    baseline = Baseline()
+    for x in values:
+        findings, chart, absorb = baseline.check(x)
+        baseline.update(x, chart, absorb)
+    return baseline
+
+
+def test_cold_baseline_raises_nothing():
+    baseline = _warm([5.0, 5.1, 4.9])
+    assert baseline.n < ANOMALY_MIN_SAMPLES
+    assert baseline.check(50.0)[0] == []
+
+
+def test_spike_is_high_and_kept_out_of_the_baseline():
+    baseline = _warm([5 + 0.1 * math.sin(i) for i in range(40)])
+    findings, chart, absorb = baseline.check(9.0)
+    assert findings[0][0] == SeverityLevel.HIGH
+    assert not absorb
+
+
+def test_slow_drift_trips_cusum_before_any_single_value_alarm():
+    baseline = _warm([5 + 0.1 * math.sin(i) for i in range(40)])
+    severities = []
+    for _ in range(30):
+        # Each value is well inside the single-value limits
+        x = baseline.mean + 1.5 * baseline.std
+        findings, chart, absorb = baseline.check(x)
+        baseline.update(x, chart, absorb)
+        severities.extend(severity for severity, _ in findings)
+    assert SeverityLevel.HIGH not in severities
+    assert SeverityLevel.LOW in severities or SeverityLevel.MEDIUM in severities
+
+
+def test_baselines_learn_only_from_committed_values(db):
+    key = ("acid_ph", "material", "Anomaly Linter")
+    for i in range(30):
+        anomaly_detector.observe(db, None, "Anomaly Linter", None, {"acid_ph": 4 + 0.05 * math.sin(i)})
+        db.commit()
+    learned = anomaly_detector.baselines[key].n
+
+    anomalies = anomaly_detector.observe(db, None, "Anomaly Linter", None, {"acid_ph": 4.03})
+    db.rollback()
+    assert anomalies == []
+    assert anomaly_detector.baselines[key].n == learned
+
+    anomalies = anomaly_detector.observe(db, None, "Anomaly Linter", None, {"acid_ph": 7.5})
+    db.commit()
+    assert [a.severity for a in anomalies] == [SeverityLevel.HIGH]
+    assert "acid_ph = 7.5" in anomalies[0].description
+    assert anomaly_detector.baselines[key].n == learned   # outliers never enter the baseline
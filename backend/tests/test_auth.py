@@ -0,0 +1,36 @@
+def _register(client, email, username, role="Operator"):
+    response = client.post("/auth/register", json={
+        "username": username, "email": email, "password": "pass-1234", "role": role,
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _token(client, email):
+    response = client.post("/auth/login", data={"username": email, "password": "pass-1234"})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+def test_login_rejects_a_wrong_password(client):
+    _register(client, "wrong-pw@example.com", "wrongpw")
+    response = client.post("/auth/login", data={"username": "wrong-pw@example.com", "password": "nope"})
+    assert response.status_code == 403
+
+
+def test_delete_user_needs_a_valid_token(client):
+    victim = _register(client, "victim@example.com", "victim")
+    assert client.delete(f"/auth/users/{victim}").status_code == 401
+    assert client.delete(f"/auth/users/{victim}", headers={"Authorization": "Bearer junk"}).status_code == 401
+
+
+def test_deleted_user_loses_access_at_once(client):
+    admin = _register(client, "admin@example.com", "admin", role="Admin")
+    doomed = _register(client, "doomed@example.com", "doomed")
+    admin_auth = {"Authorization": f"Bearer {_token(client, 'admin@example.com')}"}
+    doomed_auth = {"Authorization": f"Bearer {_token(client, 'doomed@example.com')}"}
+
+    # Caches doomed's principal, then deletes doomed; the cached entry must not outlive the row
+    assert client.delete("/auth/users/999999", headers=doomed_auth).status_code == 404
+    assert client.delete(f"/auth/users/{doomed}", headers=admin_auth).status_code == 200
+    assert client.delete(f"/auth/users/{admin}", headers=doomed_auth).status_code == 401
@@ -0,0 +1,55 @@
+import time
+
+from app.cache import TTLCache
+from app.models.materials import RawMaterialBatch
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=60, settle=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1   # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("short", 4, ttl=0)
+    assert cache.get("short") is None
+
+
+def test_invalidate_drops_every_entry_with_the_tag():
+    cache = TTLCache(ttl=60, settle=0)
+    cache.set("summary", 1, tags=("production", "qc"))
+    cache.set("qc-list", 2, tags=("qc",))
+    cache.set("stock", 3, tags=("inventory",))
+    cache.invalidate("qc")
+    assert cache.get("summary") is None
+    assert cache.get("qc-list") is None
+    assert cache.get("stock") == 3
+
+
+def test_reads_overlapping_an_invalidation_are_not_settled():
+    cache = TTLCache(ttl=60, settle=5)
+    started = time.monotonic()
+    cache.invalidate("production")
+    # Began before the write: may hold the old value
+    assert not cache.settled(("production",), started)
+    # Began within the replica lag after it: the replica may not have the write yet
+    assert not cache.settled(("production",), time.monotonic())
+    assert cache.settled(("inventory",), time.monotonic())
+
+
+def test_summary_reflects_a_new_batch_at_once(client, db):
+    db.add(RawMaterialBatch(material_id="CACHE-RM", material_name="Cache Linter", quantity_kg=500, supplier_name="Acme"))
+    db.commit()
+    before = client.get("/dashboard/summary").json()
+    assert client.get("/dashboard/summary").json() == before   # served from the cache
+
+    response = client.post("/production/start-batch", json={
+        "batch_number": "CACHE-B1", "phase": "Milling", "raw_material_name": "Cache Linter",
+        "quantity_to_use": 100, "authorized_by": "tests", "shift": "Shift A",
+    })
+    assert response.status_code == 200
+    after = client.get("/dashboard/summary").json()
+    assert after != before
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine, event, select, update
+
+from app.database import Base, RoutingSession, make_engine, upsert
+from app.models.dashboard import DashboardMetrics
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for bind in (primary, replica):
+        Base.metadata.create_all(bind, tables=[DashboardMetrics.__table__])
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def _statements(bind):
+    seen = []
+    event.listen(bind, "before_cursor_execute", lambda conn, cursor, sql, *args: seen.append(sql.split()[0]))
+    return seen
+
+
+def test_read_only_session_sends_only_reads_to_the_replica(engines):
+    primary, replica = engines
+
+    class Routed(RoutingSession):
+        pass
+
+    Routed.primary, Routed.replica = primary, replica
+    on_primary, on_replica = _statements(primary), _statements(replica)
+
+    session = Routed(info={"read_only": True})
+    try:
+        session.execute(select(DashboardMetrics))
+        session.add(DashboardMetrics(key="routed", value=1))
+        session.flush()
+        session.execute(update(DashboardMetrics).values(value=2))
+        session.commit()
+    finally:
+        session.close()
+
+    assert on_replica == ["SELECT"]
+    assert on_primary == ["INSERT", "UPDATE"]
+
+
+def test_upsert_adds_on_conflict(engines):
+    primary, _ = engines
+    stmt = upsert(primary, DashboardMetrics, ["key"],
+                  lambda current, incoming: {"value": current["value"] + incoming["value"]})
+    with primary.begin() as conn:
+        conn.execute(stmt, [{"key": "k", "value": 2}, {"key": "k", "value": 3}])
+        assert conn.execute(select(DashboardMetrics.value).where(DashboardMetrics.key == "k")).scalar() == 5
+
+
+def test_unsupported_database_is_rejected_at_engine_setup():
+    with pytest.raises(ValueError, match="supported: mysql, sqlite"):
+        make_engine("postgresql://user@localhost/pdms", "primary")
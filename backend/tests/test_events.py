@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from app import audit
+from app.events import ActivityBroker
+from app.models.activity import ActivityLog
+from app.routers import dashboard
+
+BASE_ID = 10_000_000
+
+
+def _event(event_id):
+    return {"id": event_id, "message": f"event {event_id}", "user": "tests", "type": "info", "created_at": None}
+
+
+class _Connected:
+    async def is_disconnected(self):
+        return False
+
+
+async def _read(response, count):
+    body = response.body_iterator
+    try:
+        chunks = []
+        while len(chunks) < count:
+            chunk = await asyncio.wait_for(body.__anext__(), 5)
+            if not chunk.startswith(("retry:", ":")):
+                chunks.append(json.loads(chunk.split("data: ", 1)[1]))
+        return [event["id"] for event in chunks]
+    finally:
+        await body.aclose()
+
+
+def test_replay_since_needs_the_buffer_to_reach_back():
+    broker = ActivityBroker(history=3)
+    for i in range(1, 6):
+        broker.publish(_event(i))
+    assert [e["id"] for e in broker.replay_since(3)] == [4, 5]
+    assert broker.replay_since(5) == []
+    assert broker.replay_since(1) is None   # event 2 has left the buffer
+
+
+def test_stream_replays_the_gap_and_skips_only_replayed_duplicates(monkeypatch):
+    broker = ActivityBroker()
+    monkeypatch.setattr(dashboard, "activity_broker", broker)
+    for i in (1, 2, 3):
+        broker.publish(_event(BASE_ID + i))
+
+    async def scenario():
+        response = await dashboard.stream_activity(_Connected(), last_event_id=BASE_ID + 1, last_event_id_header=None)
+        # Committed out of id order: 3 again is a duplicate of the replay, 0 is new
+        for i in (3, 4, 0):
+            broker.publish(_event(BASE_ID + i))
+        return await _read(response, 4)
+
+    assert asyncio.run(scenario()) == [BASE_ID + 2, BASE_ID + 3, BASE_ID + 4, BASE_ID]
+
+
+def test_stream_reads_a_gap_older_than_the_buffer_from_the_db(client, db, monkeypatch):
+    monkeypatch.setattr(dashboard, "activity_broker", ActivityBroker(history=1))
+    logs = [ActivityLog(message=f"replayed {i}", user="tests", type="info") for i in range(3)]
+    db.add_all(logs)
+    db.commit()
+    ids = [log.id for log in logs]
+
+    async def scenario():
+        response = await dashboard.stream_activity(_Connected(), last_event_id=None, last_event_id_header=str(ids[0]))
+        return await _read(response, 2)
+
+    assert asyncio.run(scenario()) == ids[1:]
+
+
+def test_activity_reaches_the_broker_only_on_commit(db, monkeypatch):
+    broker = ActivityBroker()
+    monkeypatch.setattr(audit, "activity_broker", broker)
+
+    audit.record_in_transaction(db, "rolled back", "tests", "info")
+    db.rollback()
+    assert broker.published == 0
+
+    audit.record_in_transaction(db, "committed", "tests", "info")
+    db.commit()
+    assert broker.published == 1
@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+
+from app.hashing import PasswordHasher
+
+
+def test_dead_worker_is_counted_and_its_pool_replaced():
+    hasher = PasswordHasher(workers=1)
+
+    async def scenario():
+        broken = hasher._process_pool()
+        with pytest.raises(BrokenProcessPool):
+            await hasher._run(os._exit, 1)   # kills the worker mid-job
+        # The dead pool was shut down and dropped, not just forgotten
+        assert hasher._pool is None
+        assert broken._shutdown_thread
+        hashed = await hasher.hash("secret")
+        matches, _ = await hasher.verify("secret", hashed)
+        return matches
+
+    try:
+        assert asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    stats = hasher.stats()
+    assert stats["failed"] == 1
+    assert stats["completed"] == 2
+    assert stats["pending"] == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+
+from app.inference import MicroBatcher
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def predict(matrix):
+        calls.append(len(matrix))
+        return matrix.sum(axis=1)
+
+    batcher = MicroBatcher(predict, window_ms=50, max_batch=64)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit([i, 1.0]) for i in range(10)))
+
+    assert asyncio.run(scenario()) == [i + 1.0 for i in range(10)]
+    assert calls == [10]
+    assert batcher.stats()["batch_size_histogram"]["le_16"] == 1
+
+
+def test_max_batch_splits_a_burst():
+    calls = []
+
+    def predict(matrix):
+        calls.append(len(matrix))
+        return matrix[:, 0]
+
+    batcher = MicroBatcher(predict, window_ms=50, max_batch=4)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit([i]) for i in range(10)))
+
+    assert asyncio.run(scenario()) == list(range(10))
+    assert calls == [4, 4, 2]
+
+
+def test_a_bad_row_only_fails_its_own_caller():
+    def predict(matrix):
+        if not np.isfinite(matrix).all():
+            raise ValueError("non-finite input")
+        return matrix[:, 0] * 2
+
+    batcher = MicroBatcher(predict, window_ms=50)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.submit([1.0]), batcher.submit([float("inf")]), batcher.submit([3.0]),
+            return_exceptions=True,
+        )
+
+    good, bad, other = asyncio.run(scenario())
+    assert (good, other) == (2.0, 6.0)
+    assert isinstance(bad, ValueError)
+    assert batcher.stats()["retried_rows"] == 3
@@ -0,0 +1,46 @@
+from app.models.materials import RawMaterialBatch
+
+
+def _stock(db, material_id):
+    db.expire_all()
+    return db.query(RawMaterialBatch.quantity_kg).filter(RawMaterialBatch.material_id == material_id).scalar()
+
+
+def test_import_bulk_adds_to_existing_stock(client, db):
+    rows = [
+        {"material_id": "IMP-1", "name": "Import Pulp 1", "kg": 10, "supplier": "Acme"},
+        {"material_id": "IMP-2", "name": "Import Pulp 2", "kg": 5, "supplier": "Acme"},
+        # Repeated ID in the same chunk adds up
+        {"material_id": "IMP-1", "name": "Import Pulp 1", "kg": 2.5, "supplier": "Acme"},
+    ]
+    response = client.post("/materials/import-bulk", json=rows)
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+    assert _stock(db, "IMP-1") == 12.5
+
+    response = client.post("/materials/import-bulk", json=rows[:1])
+    assert response.status_code == 200
+    assert _stock(db, "IMP-1") == 22.5
+    assert _stock(db, "IMP-2") == 5
+
+
+def test_import_stream_reports_bad_lines(client, db):
+    body = "material_id,name,kg,supplier\nIMP-3,Import Pulp 3,4,\nIMP-4,Import Pulp 4,lots,Acme\n"
+    response = client.post("/materials/import-stream", files={"file": ("stock.csv", body, "text/csv")})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 1
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 3
+    assert _stock(db, "IMP-3") == 4
+
+
+def test_imported_material_is_searchable(client):
+    # Build the index first so the import has to fold the new row in
+    client.get("/materials/search", params={"query": "pulp"})
+    client.post("/materials/import-bulk", json=[
+        {"material_id": "IMP-5", "name": "Bleached Kraft Sheet", "kg": 1, "supplier": "Acme"},
+    ])
+    response = client.get("/materials/search", params={"query": "kraft"})
+    assert response.status_code == 200
+    assert [m["material_id"] for m in response.json()] == ["IMP-5"]
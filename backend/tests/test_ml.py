@@ -0,0 +1,58 @@
+import json
+import os
+
+from app.routers import ml
+
+
+def test_startup_loads_the_seed_model(client):
+    # Startup trained the seed version into the (empty) test store before any request
+    assert str(ml.registry.root) == os.environ["MODEL_DIR"]
+    assert ml.registry.active_version() == "v0001"
+    assert ml.registry._bundle is not None
+
+    response = client.get("/ml/models")
+    assert response.json()["active"] == "v0001"
+
+
+def test_predict_quality_reports_the_serving_version(client):
+    response = client.post("/ml/predict-quality", json={"drying_time": 45, "milling_speed": 1200, "acid_ph": 4.0})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["model_version"] == ml.registry.active_version()
+    assert body["status"] in ("PASS", "FAIL")
+
+
+def test_predict_quality_rejects_non_finite_input(client):
+    response = client.post("/ml/predict-quality/batch", json=[{"drying_time": 45, "milling_speed": "NaN", "acid_ph": 4.0}])
+    assert response.status_code == 422
+
+
+def test_batch_formats_score_the_same_rows_in_order(client):
+    rows = [[45, 1200, 4.0], [30, 900, 2.0], [60, 1500, 6.5]]
+    names = ("drying_time", "milling_speed", "acid_ph")
+    as_json = client.post("/ml/predict-quality/batch", json=[dict(zip(names, r)) for r in rows]).json()
+    columnar = client.post("/ml/predict-quality/columnar", json={n: [r[i] for r in rows] for i, n in enumerate(names)}).json()
+    ndjson = client.post("/ml/predict-quality/ndjson", content="\n".join(json.dumps(r) for r in rows)).json()
+    assert as_json["count"] == 3
+    assert as_json == columnar == ndjson
+
+    single = client.post("/ml/predict-quality", json=dict(zip(names, rows[1]))).json()
+    assert single["quality_score"] == as_json["results"][1]["quality_score"]
+
+
+def test_what_if_surface_is_cached_per_grid(client):
+    grid = {"drying_time": {"min": 30, "max": 60, "steps": 4},
+            "milling_speed": {"min": 900, "max": 1500, "steps": 3},
+            "acid_ph": {"min": 2, "max": 6, "steps": 2}}
+    first = client.post("/ml/what-if", json=grid)
+    assert first.headers["X-Cache"] == "MISS"
+    body = first.json()
+    assert body["shape"] == [4, 3, 2]
+    assert body["optimum"]["quality_score"] == max(max(max(r) for r in plane) for plane in body["surface"])
+
+    again = client.post("/ml/what-if", json=grid)
+    assert again.headers["X-Cache"] == "HIT" and again.content == first.content
+
+    grid["acid_ph"]["steps"] = 500
+    grid["drying_time"]["steps"] = 500
+    assert client.post("/ml/what-if", json=grid).status_code == 413
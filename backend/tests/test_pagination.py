@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from app.models.inventory import Inventory
+
+
+def _walk(client, path, limit, **params):
+    """Every page of a list endpoint, following X-Next-Cursor; returns the rows and the page count."""
+    rows, pages, cursor = [], 0, None
+    while True:
+        response = client.get(path, params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        rows.extend(response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows, pages
+
+
+def test_keyset_pages_cover_ties_and_null_sort_keys_once(client, db):
+    shipped = datetime(2026, 10, 1, 8, 0)
+    # Ties on dispatched_at, and NULLs that sort after every timestamp
+    times = [shipped, shipped, shipped + timedelta(hours=1), None, None, shipped - timedelta(days=1), shipped]
+    for i, dispatched_at in enumerate(times):
+        db.add(Inventory(batch_no=f"PAGE-{i}", quantity_kg=10, status="Dispatched", dispatched_at=dispatched_at))
+    db.commit()
+
+    rows, pages = _walk(client, "/inventory/dispatch-history", limit=2)
+    mine = [r for r in rows if r["batch_no"].startswith("PAGE-")]
+    assert sorted(r["batch_no"] for r in mine) == sorted(f"PAGE-{i}" for i in range(len(times)))
+    assert len({r["id"] for r in rows}) == len(rows)
+    assert pages >= 4
+
+    # Newest first, ties broken by id descending, NULLs last
+    dated = sorted((r for r in mine if r["dispatched_at"]), key=lambda r: (r["dispatched_at"], r["id"]), reverse=True)
+    undated = sorted((r for r in mine if not r["dispatched_at"]), key=lambda r: r["id"], reverse=True)
+    assert mine == dated + undated
+
+
+def test_fields_limit_the_columns(client):
+    response = client.get("/inventory/dispatch-history", params={"fields": "id,batch_no", "limit": 1})
+    assert response.status_code == 200
+    assert all(set(row) == {"id", "batch_no"} for row in response.json())
+    assert client.get("/inventory/dispatch-history", params={"fields": "id,secret"}).status_code == 400
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get("/inventory/dispatch-history", params={"cursor": "not-a-cursor"}).status_code == 400
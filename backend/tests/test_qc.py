@@ -0,0 +1,26 @@
+import pytest
+
+from app.models.production import ProductionBatch
+from app.models.qc import QCRecord
+
+
+def _pending_batch(db, number):
+    batch = ProductionBatch(batch_number=number, phase="Packaging", material_used="Cotton Linter",
+                            quantity_used=250, shift="Shift A", status="PENDING_QC", authorized_by="tests")
+    db.add(batch)
+    db.commit()
+    return batch.id
+
+
+@pytest.mark.parametrize("number, moisture, purity, expected", [
+    ("QC-PASS-1", 3.5, 98.5, "PASS"),
+    ("QC-WET-1", 8.2, 98.5, "FAIL"),
+    ("QC-IMPURE-1", 3.5, 95.0, "FAIL"),
+])
+def test_qc_status_follows_the_release_limits(client, db, number, moisture, purity, expected):
+    batch_id = _pending_batch(db, number)
+    response = client.post(f"/qc/approve-batch/{batch_id}",
+                           json={"moisture": moisture, "purity": purity, "particle_size": 150})
+    assert response.status_code == 200
+    assert response.json()["qc_status"] == expected
+    assert db.query(QCRecord.status).filter(QCRecord.batch_id == number).scalar() == expected
@@ -0,0 +1,22 @@
+from sqlalchemy import create_engine
+
+from app.retraining import SchedulerLease
+
+
+def test_one_scheduler_holds_the_lease(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+    path = str(tmp_path / "store" / ".scheduler.lock")
+    first, second = SchedulerLease(path, bind), SchedulerLease(path, bind)
+    try:
+        assert first.held()
+        assert first.held()   # still ours on the next tick
+        assert not second.held()
+
+        # The leader exiting frees the lease for a standby worker
+        first.release()
+        assert second.held()
+        assert not first.held()
+    finally:
+        first.release()
+        second.release()
+        bind.dispose()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.search_index import MaterialSearchIndex
+
+T0 = datetime(2026, 10, 18, 8, 0)
+
+
+class _Table:
+    """Stands in for raw_material_batches: rows of (material_id, name, updated_at)."""
+
+    def __init__(self, rows):
+        self.rows = {mid: (mid, name, T0) for mid, name in rows}
+        self.loads = []
+
+    def put(self, material_id, name, updated_at):
+        self.rows[material_id] = (material_id, name, updated_at)
+
+    def __call__(self, since):
+        self.loads.append(since)
+        return [r for r in self.rows.values() if since is None or r[2] >= since]
+
+
+@pytest.fixture
+def table():
+    return _Table([
+        ("RM-001", "Cotton Linter"),
+        ("RM-002", "Wood Pulp Hardwood"),
+        ("RM-003", "Wood Pulp Softwood"),
+        ("RM-004", "Hydrochloric Acid"),
+        ("LIN-9", "Linter Grade B"),
+    ])
+
+
+def test_exact_and_prefix_matches_rank_first(table):
+    index = MaterialSearchIndex(table)
+    ids = [mid for _, _, mid in index.ranked("linter")]
+    # Name starts with the query before a later word does
+    assert ids[:2] == ["LIN-9", "RM-001"]
+    assert index.ranked("rm-004")[0][2] == "RM-004"
+    # Misspelt, still found through trigram overlap
+    assert "RM-004" in [mid for _, _, mid in index.ranked("hydrochlric")]
+
+
+def test_pages_follow_the_cursor_without_gaps(table):
+    index = MaterialSearchIndex(table)
+    seen, cursor = [], None
+    while True:
+        page, cursor = index.page("", 2, cursor)
+        seen.extend(mid for _, _, mid in page)
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(table.rows)
+    assert len(seen) == len(set(seen))
+    with pytest.raises(ValueError):
+        index.page("", 2, "bm90LWEtY3Vyc29y")
+
+
+def test_refresh_picks_up_other_workers_changes(table):
+    index = MaterialSearchIndex(table)
+    index.ranked("pulp")
+    assert table.loads == [None]
+
+    table.put("RM-002", "Eucalyptus Kraft", T0 + timedelta(minutes=1))
+    table.put("RM-010", "Kraft Sheet", T0 + timedelta(minutes=1))
+    index.refresh()
+
+    # Only rows changed since the watermark (less the overlap) are read again
+    assert table.loads[-1] is not None
+    assert {mid for _, _, mid in index.ranked("kraft")} == {"RM-002", "RM-010"}
+    assert [mid for _, _, mid in index.ranked("pulp")] == ["RM-003"]
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.maintenance import Equipment, TelemetryReading
+from app.risk import RiskEngine, risk_engine
+from app.telemetry import telemetry_store
+
+
+def _asset(db, name):
+    equipment = Equipment(name=name, type="Spray Dryer")
+    db.add(equipment)
+    db.commit()
+    return equipment.id
+
+
+def test_offset_aware_start_without_end(client, db):
+    equipment_id = _asset(db, "Dryer TZ-1")
+    db.add(TelemetryReading(equipment_id=equipment_id, ts=datetime.utcnow(), vibration=1.5, temperature=60.0))
+    db.commit()
+
+    # Aware start, no end: the default end is naive utcnow(), so the bounds must agree
+    start = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    response = client.get(f"/maintenance/telemetry/{equipment_id}", params={"start": start})
+    assert response.status_code == 200
+    assert response.json()["vibration"] == [1.5]
+
+
+def test_offset_aware_bounds_are_compared_in_utc(client, db):
+    equipment_id = _asset(db, "Dryer TZ-2")
+    db.add(TelemetryReading(equipment_id=equipment_id, ts=datetime(2026, 10, 18, 9, 30), vibration=2.0, temperature=61.0))
+    db.commit()
+
+    # 11:00-12:00 at +02:00 is 09:00-10:00 UTC
+    response = client.get(f"/maintenance/telemetry/{equipment_id}", params={
+        "start": "2026-10-18T11:00:00+02:00", "end": "2026-10-18T12:00:00+02:00",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["resolution"] == "raw"
+    assert body["vibration"] == [2.0]
+
+
+def test_risk_report_scores_ingested_telemetry(client, db):
+    steady, rising, quiet = (_asset(db, f"Mill RISK-{i}") for i in range(3))
+    now = time.time()
+    n = 40
+    readings = {
+        "equipment_id": [steady] * n + [rising] * n,
+        "ts": [now - (n - i) * 30 for i in range(n)] * 2,
+        "vibration": [0.5] * n + [0.5 + 0.02 * i for i in range(n)],
+        "temperature": [60.0] * n + [60.0 + 0.5 * i for i in range(n)],
+    }
+    assert client.post("/maintenance/telemetry/columnar", json=readings).status_code == 200
+
+    report = {row["id"]: row for row in client.get("/maintenance/risk-report").json()}
+    assert report[steady]["source"] == report[rising]["source"] == "telemetry"
+    assert report[steady]["readings"] == n
+    assert report[rising]["risk_score"] > report[steady]["risk_score"]
+    assert report[quiet]["source"] == "last_reading"
+
+    # The incrementally maintained sums score the same as a fresh pass over the rings
+    assert RiskEngine(telemetry_store).scores() == pytest.approx(risk_engine.scores())
@@ -14,4 +14,11 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// List endpoints return one page at a time and put the next page's cursor in
+// the X-Next-Cursor header; pass it back as cursor to get the page after
+export async function getPage(url, params = {}, cursor = null) {
+  const res = await api.get(url, { params: cursor ? { ...params, cursor } : params });
+  return { items: res.data, nextCursor: res.headers['x-next-cursor'] || null };
+}
+
 export default api;
\ No newline at end of file
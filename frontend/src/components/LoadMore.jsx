@@ -0,0 +1,16 @@
+import React from 'react';
+import { Box, Button } from '@mui/material';
+
+// "Load more" under a paged table; hidden once the last page is in
+function LoadMore({ list }) {
+  if (!list.hasMore) return null;
+  return (
+    <Box sx={{ display: 'flex', justifyContent: 'center', py: 2 }}>
+      <Button variant="outlined" size="small" disabled={list.loading} onClick={list.loadMore}>
+        {list.loading ? 'Loading...' : 'Load more'}
+      </Button>
+    </Box>
+  );
+}
+
+export default LoadMore;
@@ -0,0 +1,34 @@
+import { useState, useEffect, useCallback } from 'react';
+import { getPage } from '../api';
+
+// First page of a keyset-paginated list, plus loadMore() for the next one.
+// Nothing past the first page is downloaded until the user asks for it.
+export default function usePagedList(url, params = {}) {
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const paramsKey = JSON.stringify(params);
+
+  const load = useCallback(async (cursor = null) => {
+    setLoading(true);
+    try {
+      const page = await getPage(url, JSON.parse(paramsKey), cursor);
+      setItems(prev => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Fetch failed", err);
+    } finally {
+      setLoading(false);
+    }
+  }, [url, paramsKey]);
+
+  useEffect(() => { load(); }, [load]);
+
+  return {
+    items,
+    hasMore: Boolean(nextCursor),
+    loading,
+    loadMore: () => load(nextCursor),
+    reload: () => load(),
+  };
+}
@@ -30,8 +30,42 @@ function AIChat() {
     setLoading(true);
 
     try {
-      const res = await api.post('/ai/ask', { question: query });
-      setMessages(prev => [...prev, { role: 'bot', text: res.data.answer }]);
+      // Stream the answer: tokens are appended to the bot bubble as they arrive
+      const token = localStorage.getItem('token');
+      const res = await fetch(`${api.defaults.baseURL}/ai/ask/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          ...(token ? { Authorization: `Bearer ${token}` } : {})
+        },
+        body: JSON.stringify({ question: userMsg.text })
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      setMessages(prev => [...prev, { role: 'bot', text: '' }]);
+      setLoading(false);
+      const appendText = (text) => setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, text: last.text + text }];
+      });
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = frame.match(/^data: (.*)$/m)?.[1];
+          if (!data) continue;
+          if (event === 'token') appendText(JSON.parse(data).text);
+          if (event === 'error') appendText(`\n[Error: ${JSON.parse(data).detail}]`);
+        }
+      }
     } catch (err) {
       setMessages(prev => [...prev, { role: 'bot', text: 'Error: Unable to reach the AI Core. Check backend connection.' }]);
     } finally {
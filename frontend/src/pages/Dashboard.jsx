@@ -34,16 +34,13 @@ function Dashboard() {
   useEffect(() => {
     const fetchAll = async () => {
       try {
-        const [summaryRes, analyticsRes, logsRes] = await Promise.all([
-          api.get('/dashboard/summary'),
-          api.get('/dashboard/analytics'),
-          api.get('/dashboard/notifications') // Fetching real logs
-        ]);
+        // Summary, analytics and real logs in one request; the server runs the queries concurrently
+        const res = await api.get('/dashboard/overview');
         
         setData({ 
-          summary: summaryRes.data, 
-          analytics: analyticsRes.data, 
-          logs: logsRes.data || [], 
+          summary: res.data.summary, 
+          analytics: res.data.analytics, 
+          logs: res.data.notifications || [], 
           loading: false 
         });
       } catch (err) {
@@ -52,6 +49,17 @@ function Dashboard() {
       }
     };
     fetchAll();
+
+    // Live activity feed: the server pushes new logs instead of us re-polling
+    const stream = new EventSource(`${api.defaults.baseURL}/dashboard/stream`);
+    stream.addEventListener('activity', (e) => {
+      const log = JSON.parse(e.data);
+      setData(prev => ({
+        ...prev,
+        logs: [log, ...prev.logs.filter(l => l.id !== log.id)].slice(0, 15)
+      }));
+    });
+    return () => stream.close();
   }, []);
 
   return (
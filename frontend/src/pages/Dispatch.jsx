@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, Paper, Table, TableBody, TableCell, 
   TableContainer, TableHead, TableRow, Button, Chip, Divider 
@@ -12,22 +14,15 @@ import 'jspdf-autotable';
 import autoTable from 'jspdf-autotable';
 
 function Dispatch() {
-  const [stagedItems, setStagedItems] = useState([]);
-  const [historyItems, setHistoryItems] = useState([]);
+  // Only items ready for final truck loading
+  const staged = usePagedList('/inventory/finished-goods', { status: 'In Dispatch Area', limit: 100 });
+  const history = usePagedList('/inventory/dispatch-history', { limit: 50 });
+  const stagedItems = staged.items;
+  const historyItems = history.items;
 
-  useEffect(() => {
-    fetchData();
-  }, []);
-
-  const fetchData = async () => {
-    try {
-      const res = await api.get('/inventory/finished-goods');
-      // Only items ready for final truck loading
-      setStagedItems(res.data.filter(i => i.status === "In Dispatch Area"));
-      
-      const historyRes = await api.get('/inventory/dispatch-history'); 
-      setHistoryItems(historyRes.data);
-    } catch (err) { console.error("Fetch failed", err); }
+  const fetchData = () => {
+    staged.reload();
+    history.reload();
   };
   const downloadInvoice = (item) => {
   console.log("Generating PDF for batch:", item.batch_no);
@@ -109,6 +104,7 @@ function Dispatch() {
               </TableBody>
             </Table>
           </TableContainer>
+          <LoadMore list={staged} />
         </Paper>
 
         <Divider sx={{ mb: 4 }} />
@@ -139,6 +135,7 @@ function Dispatch() {
             </TableBody>
           </Table>
         </TableContainer>
+        <LoadMore list={history} />
       </Box>
     </Box>
   );
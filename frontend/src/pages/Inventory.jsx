@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, Paper, Table, TableBody, TableCell, 
   TableContainer, TableHead, TableRow, Chip, Grid, Button, Tooltip 
@@ -8,25 +10,29 @@ import {
 import { Boxes, MapPin, Scale, Send, History, Truck } from 'lucide-react';
 
 function Inventory() {
-  const [items, setItems] = useState([]);
+  // Returns items that are "In Stock" or "In Dispatch Area"
+  const stock = usePagedList('/inventory/finished-goods', { limit: 100 });
+  const items = stock.items;
   const [summary, setSummary] = useState({ total_kg: 0, batch_count: 0 });
 
   useEffect(() => {
-    fetchData();
+    fetchSummary();
   }, []);
 
-  const fetchData = async () => {
+  const fetchSummary = async () => {
     try {
-      // Returns items that are "In Stock" or "In Dispatch Area"
-      const res = await api.get('/inventory/finished-goods');
       const sumRes = await api.get('/inventory/summary');
-      setItems(res.data);
       setSummary(sumRes.data);
     } catch (err) {
       console.error("Inventory fetch failed", err);
     }
   };
 
+  const fetchData = () => {
+    stock.reload();
+    fetchSummary();
+  };
+
   // UPDATED: Now moves item to Dispatch Area instead of final dispatch
   const handleMoveToStaging = async (batchNo) => {
     if (window.confirm(`Move Batch ${batchNo} to the Dispatch Staging Area?`)) {
@@ -139,6 +145,7 @@ function Inventory() {
             </TableBody>
           </Table>
         </TableContainer>
+        <LoadMore list={stock} />
       </Box>
     </Box>
   );
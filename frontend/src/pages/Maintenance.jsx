@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, Paper, Table, TableBody, TableCell, TableContainer, 
   TableHead, TableRow, Button, Chip, Grid, TextField, LinearProgress, Alert, Tooltip
@@ -8,21 +10,25 @@ import {
 import { Settings, Plus, Activity, AlertTriangle, ShieldCheck, Wrench, RefreshCcw } from 'lucide-react';
 
 function Maintenance() {
-  const [assets, setAssets] = useState([]);
+  const assetList = usePagedList('/maintenance/assets', { limit: 100 });
+  const assets = assetList.items;
   const [riskData, setRiskData] = useState([]);
   const [newAsset, setNewAsset] = useState({ name: '', type: '' });
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
-    fetchMaintenanceData();
+    fetchRiskData();
   }, []);
 
-  const fetchMaintenanceData = async () => {
+  const fetchMaintenanceData = () => {
+    assetList.reload();
+    fetchRiskData();
+  };
+
+  const fetchRiskData = async () => {
     setLoading(true);
     try {
-      const assetRes = await api.get('/maintenance/assets');
       const riskRes = await api.get('/maintenance/risk-report');
-      setAssets(assetRes.data);
       setRiskData(riskRes.data);
     } catch (err) { 
       console.error("Maintenance sync failed", err); 
@@ -158,6 +164,7 @@ function Maintenance() {
             </TableBody>
           </Table>
         </TableContainer>
+        <LoadMore list={assetList} />
       </Box>
     </Box>
   );
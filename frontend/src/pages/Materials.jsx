@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, Button, Table, TableBody, TableCell, TableContainer, 
   TableHead, TableRow, Paper, Grid, TextField, Divider, Tooltip, Alert
@@ -13,8 +15,10 @@ import autoTable from 'jspdf-autotable';
 const LOW_STOCK_THRESHOLD = 100;
 
 function Materials() {
-  const [stock, setStock] = useState([]);
   const [search, setSearch] = useState("");
+  // Ranked matches for the search box, a page at a time
+  const results = usePagedList('/materials/search', { query: search, limit: 100 });
+  const stock = results.items;
   const [isEditing, setIsEditing] = useState(false);
   const [status, setStatus] = useState({ type: '', msg: '' });
   const [form, setForm] = useState({ material_id: '', name: '', kg: '', supplier: '' });
@@ -22,16 +26,7 @@ function Materials() {
   // Get logged in user name (Ganesh from your Sidebar)
   const adminName = "GANESH (Admin)"; 
 
-  useEffect(() => {
-    fetchData();
-  }, [search]);
-
-  const fetchData = async () => {
-    try {
-      const res = await api.get(`/materials/search?query=${search}`);
-      setStock(res.data);
-    } catch (err) { console.error("Fetch failed", err); }
-  };
+  const fetchData = () => results.reload();
 
   // 2. PDF Generator Function
   const generateMaterialPDF = (item) => {
@@ -87,35 +82,26 @@ function Materials() {
     } catch (err) { setStatus({ type: 'error', msg: 'Action failed.' }); }
   };
 
-  const handleFileUpload = (event) => {
+  const handleFileUpload = async (event) => {
     const file = event.target.files[0];
     if (!file) return;
 
-    const reader = new FileReader();
-    reader.onload = async (e) => {
-      try {
-        const text = e.target.result;
-        const lines = text.split(/\r?\n/).filter(line => line.trim().length > 0);
-        
-        const payload = lines.map(line => {
-          const parts = line.split(',');
-          if (parts.length < 3) return null;
-          return {
-            material_id: parts[0]?.trim(),
-            name: parts[1]?.trim(),
-            kg: parseFloat(parts[2]?.trim()) || 0,
-            supplier: parts[3]?.trim() || 'General'
-          };
-        }).filter(item => item !== null);
-
-        await api.post('/materials/import-bulk', payload);
-        setStatus({ type: 'success', msg: `Successfully imported ${payload.length} items.` });
-        fetchData();
-      } catch (err) { 
-        setStatus({ type: 'error', msg: 'Import failed. Check file format.' });
+    // Upload the file as-is; the server parses it incrementally and reports bad rows
+    const formData = new FormData();
+    formData.append('file', file);
+    try {
+      const res = await api.post('/materials/import-stream', formData);
+      const { imported, failed, errors } = res.data;
+      if (failed > 0) {
+        const first = errors[0];
+        setStatus({ type: 'error', msg: `Imported ${imported} items, ${failed} rows rejected (line ${first.line}: ${first.error}).` });
+      } else {
+        setStatus({ type: 'success', msg: `Successfully imported ${imported} items.` });
       }
-    };
-    reader.readAsText(file);
+      fetchData();
+    } catch (err) { 
+      setStatus({ type: 'error', msg: 'Import failed. Check file format.' });
+    }
   };
 
   const handleDelete = async (mId) => {
@@ -217,6 +203,7 @@ function Materials() {
             </TableBody>
           </Table>
         </TableContainer>
+        <LoadMore list={results} />
       </Box>
     </Box>
   );
@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
-import api from '../api';
+import api, { getPage } from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, TextField, Button, Card, CardContent, Grid, 
   MenuItem, Chip, Alert, Table, TableBody, TableCell, 
@@ -10,8 +12,10 @@ import { Factory, Play, Clock, ShieldCheck, CheckCircle, User, Zap } from 'lucid
 
 function Production() {
   const username = localStorage.getItem('username') || 'GANESH';
-  const [activeBatches, setActiveBatches] = useState([]);
+  const batches = usePagedList('/production/active-batches', { limit: 100 });
+  const activeBatches = batches.items;
   const [materials, setMaterials] = useState([]);
+  const [materialQuery, setMaterialQuery] = useState('');
   const [statusMsg, setStatusMsg] = useState({ type: '', text: '' });
   
   const [form, setForm] = useState({
@@ -24,18 +28,18 @@ function Production() {
 
   const stages = ['Pre-treatment', 'Acid Hydrolysis', 'Washing & Neutralization', 'Spray Drying', 'Milling', 'Packaging'];
 
-  useEffect(() => { fetchInitialData(); }, []);
-
-  const fetchInitialData = async () => {
-    try {
-      const matRes = await api.get('/materials/search?query=');
-      setMaterials(matRes.data);
-      const batchRes = await api.get('/production/active-batches');
-      setActiveBatches(batchRes.data);
-    } catch (err) { 
-      setStatusMsg({ type: 'error', text: 'Failed to sync with system.' });
-    }
-  };
+  // Material picker: the first page of ranked matches for what has been typed so far
+  useEffect(() => {
+    const timer = setTimeout(async () => {
+      try {
+        const page = await getPage('/materials/search', { query: materialQuery, limit: 20 });
+        setMaterials(page.items);
+      } catch (err) {
+        setStatusMsg({ type: 'error', text: 'Failed to sync with system.' });
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [materialQuery]);
 
   // NEW: HANDLE END BATCH & MOVE TO QC
   const handleEndBatch = async (batchId, batchNumber) => {
@@ -48,7 +52,7 @@ function Production() {
         type: 'success', 
         text: `Batch ${batchNumber} production complete. Moved to QC Lab.` 
       });
-      fetchInitialData(); // Refresh list
+      batches.reload(); // Refresh list
     } catch (err) {
       setStatusMsg({ type: 'error', text: 'Error closing batch.' });
     }
@@ -64,7 +68,7 @@ function Production() {
       await api.post('/production/start-batch', payload);
       setStatusMsg({ type: 'success', text: `Batch ${form.batch_number} started.` });
       setForm({ ...form, batch_number: '', quantity_to_use: '', raw_material_name: '' });
-      fetchInitialData(); 
+      batches.reload();
     } catch (err) {
       setStatusMsg({ type: 'error', text: 'Execution Error' });
     }
@@ -98,6 +102,9 @@ function Production() {
                 <Typography variant="caption" color="primary" fontWeight="bold" sx={{ mb: 1, display: 'block' }}>SELECT RAW MATERIAL</Typography>
                 <Autocomplete
                   options={materials}
+                  filterOptions={(options) => options}
+                  onInputChange={(e, text, reason) => { if (reason !== 'reset') setMaterialQuery(text); }}
+                  isOptionEqualToValue={(option, value) => option.material_id === value.material_id}
                   getOptionLabel={(option) => `${option.material_name} (${option.quantity_kg} kg available)`}
                   onChange={(e, val) => setForm({...form, raw_material_name: val?.material_name || ''})}
                   renderInput={(params) => (
@@ -193,6 +200,7 @@ function Production() {
                   </TableBody>
                 </Table>
               </TableContainer>
+              <LoadMore list={batches} />
             </Card>
           </Grid>
         </Grid>
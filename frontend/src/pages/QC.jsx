@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, TextField, Button, Card, CardContent, Grid, 
   Chip, Alert, Table, TableBody, TableCell, TableContainer, 
@@ -9,19 +11,13 @@ import {
 import { Beaker, CheckCircle, Clock } from 'lucide-react';
 
 function QC() {
-  const [pendingBatches, setPendingBatches] = useState([]);
+  const pending = usePagedList('/qc/pending-approval', { limit: 100 });
+  const pendingBatches = pending.items;
   const [selectedBatch, setSelectedBatch] = useState(null);
   const [results, setResults] = useState({ moisture: 3.5, purity: 98.5, particle_size: 150 });
   const [statusMsg, setStatusMsg] = useState({ type: '', text: '' });
 
-  useEffect(() => { fetchPending(); }, []);
-
-  const fetchPending = async () => {
-    try {
-      const res = await api.get('/qc/pending-approval'); 
-      setPendingBatches(res.data);
-    } catch (err) { console.error("Fetch failed", err); }
-  };
+  const fetchPending = () => pending.reload();
 
   const handleApprove = async () => {
     if (!selectedBatch) return alert("Select a batch from the queue first.");
@@ -71,6 +67,7 @@ function QC() {
                   </TableBody>
                 </Table>
               </TableContainer>
+              <LoadMore list={pending} />
             </Card>
           </Grid>
 
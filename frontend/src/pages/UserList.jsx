@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React from 'react';
 import api from '../api';
+import usePagedList from '../hooks/usePagedList';
 import Sidebar from '../components/Sidebar';
+import LoadMore from '../components/LoadMore';
 import { 
   Box, Typography, Table, TableBody, TableCell, TableContainer, 
   TableHead, TableRow, Paper, Chip, IconButton, Avatar 
@@ -8,21 +10,11 @@ import {
 import { Trash2, Users, ShieldAlert, UserCog, Clock } from 'lucide-react';
 
 function UserList() {
-  const [users, setUsers] = useState([]);
+  // NOTE: Ensure your backend matches this exact string
+  const userList = usePagedList('/auth/users', { limit: 100 });
+  const users = userList.items;
 
-  useEffect(() => {
-    fetchUsers();
-  }, []);
-
-  const fetchUsers = async () => {
-    try {
-      // NOTE: Ensure your backend matches this exact string
-      const res = await api.get('/auth/users'); 
-      setUsers(res.data);
-    } catch (err) {
-      console.error("Failed to fetch users", err);
-    }
-  };
+  const fetchUsers = () => userList.reload();
 
   const deleteUser = async (id) => {
     if (window.confirm("Terminate user access permanently?")) {
@@ -113,6 +105,7 @@ function UserList() {
             </TableBody>
           </Table>
         </TableContainer>
+        <LoadMore list={userList} />
       </Box>
     </Box>
   );